@@ -1,38 +1,30 @@
 #!/usr/bin/env python
-"""创建默认管理员账号"""
+"""创建默认管理员账号
+
+容器启动时由 bootstrap 命令完成（见 wxcloudrun/startup.py），本脚本用于手动创建。
+"""
 import os
 import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wxcloudrun.settings')
 django.setup()
 
-from wxcloudrun.models import Employee
+from wxcloudrun.startup import ensure_admin
+
 
 def create_admin():
     """创建默认管理员账号"""
     admin_code = os.environ.get('ADMIN_CODE', 'admin')
     admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
-    
-    try:
-        admin = Employee.objects.get(employee_code=admin_code)
+
+    admin, created = ensure_admin(admin_code, admin_password)
+    if not created:
         print(f'管理员 {admin_code} 已存在，跳过创建')
         return admin
-    except Employee.DoesNotExist:
-        admin = Employee(
-            employee_code=admin_code,
-            name='管理员',
-            department='管理部',
-            position='管理员',
-            role='admin',
-            is_staff=True,
-            is_superuser=True,
-        )
-        admin.set_password(admin_password)
-        admin.save()
-        print(f'默认管理员账号创建成功！')
-        print(f'工号: {admin_code}')
-        print(f'密码: {admin_password}')
-        return admin
+    print(f'默认管理员账号创建成功！')
+    print(f'工号: {admin_code}')
+    print(f'密码: {admin_password}')
+    return admin
 
 if __name__ == '__main__':
-    create_admin()
\ No newline at end of file
+    create_admin()
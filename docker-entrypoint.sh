@@ -1,16 +1,8 @@
 #!/bin/sh
 set -e
 
+# 启动入口（见 wxcloudrun/management/commands/bootstrap.py）：
+# 有未执行的迁移时才执行 migrate，确保默认管理员账号存在，然后在同一进程中启动
+# gunicorn（gthread workers，配置见 gunicorn.conf.py）
 echo "Starting Django application..."
-
-# 执行数据库迁移
-echo "Running database migrations..."
-python3 manage.py migrate --noinput || true
-
-# 创建默认管理员账号
-echo "Creating default admin account..."
-python3 create_admin.py || echo "Admin creation skipped"
-
-# 启动Django服务器
-echo "Starting Django server on 0.0.0.0:80..."
-exec python3 manage.py runserver 0.0.0.0:80
\ No newline at end of file
+exec python3 manage.py bootstrap
@@ -0,0 +1,43 @@
+"""gunicorn 生产配置
+
+使用 gthread worker 运行 WSGI 应用：每个 worker 进程内 GUNICORN_THREADS 个线程
+并发处理请求，keep-alive 的空闲连接由 worker 的事件循环保持，不占用线程。
+
+不使用 ASGI：Django 3.2 没有 ThreadSensitiveContext，ASGI 下同一进程的所有同步视图和
+中间件串行地在同一个线程中执行，慢请求会阻塞其他请求；流式响应的生成器也在事件循环中
+迭代，其中的 ORM 查询会抛出 SynchronousOnlyOperation。
+
+容量估算：
+- worker 数取 CPU 核数（云托管 1 核实例建议 1~2 个），通过 WEB_CONCURRENCY 调整；
+- 单个 worker 同时处理的请求数为 GUNICORN_THREADS，数据库连接由连接池复用，最多
+  DB_POOL_MAX_SIZE 个（应不小于 GUNICORN_THREADS），
+  总连接数上限 = worker 数 × 实例数 × DB_POOL_MAX_SIZE，需低于数据库 max_connections。
+"""
+import multiprocessing
+import os
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '80')
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# 长于云托管负载均衡的空闲超时，避免复用连接时被服务端提前关闭
+keepalive = int(os.environ.get('KEEPALIVE', 75))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+accesslog = '-'
+errorlog = '-'
+
+# 多 worker 指标快照目录（见 wxcloudrun/metrics.py）：启动时清空，worker 退出后其 gauge 不再计入
+metrics_dir = os.environ.get('METRICS_MULTIPROC_DIR', '')
+
+
+def on_starting(server):
+    if metrics_dir:
+        from wxcloudrun.metrics import clear_snapshots
+        clear_snapshots(metrics_dir)
+
+
+def child_exit(server, worker):
+    if metrics_dir:
+        from wxcloudrun.metrics import mark_process_dead
+        mark_process_dead(metrics_dir, worker.pid)
@@ -0,0 +1,195 @@
+"""工资汇总表维护
+
+payroll_aggregates 按 (月份, 部门) 保存工资单数量和金额合计，
+department_headcounts 保存各部门人数。单条写入由信号增量更新，
+批量导入和月度核算在同一事务内按批更新，全局统计只需读取汇总表，
+与 salaries 表的数据量无关。汇总数据出现偏差时可执行
+rebuild_payroll_aggregates 命令从明细重建。
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import DepartmentHeadcount, Employee, PayrollAggregate, Salary
+from .versioning import bump_versions, period_scope
+
+# 汇总表中按金额累加的字段，与工资单合计字段同名
+SUM_FIELDS = ('total_income', 'total_deduction', 'net_salary')
+
+
+def _apply(model, lookup, deltas):
+    """按增量更新一行汇总数据，不存在时创建"""
+    deltas = {f: v for f, v in deltas.items() if v}
+    if not deltas:
+        return
+    changes = {f: F(f) + v for f, v in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # 并发创建，对方已插入
+        model.objects.filter(**lookup).update(**changes)
+
+
+def salary_delta(salary, sign=1):
+    """单张工资单对汇总表的增量"""
+    delta = {'slip_count': sign}
+    delta.update((f, Salary._meta.get_field(f).to_python(getattr(salary, f)) * sign) for f in SUM_FIELDS)
+    return delta
+
+
+def apply_salary_deltas(items):
+    """items 为 (月份, 部门, 增量) 的迭代，相同键先在内存中合并再写入"""
+    merged = defaultdict(lambda: defaultdict(int))
+    for period, department, delta in items:
+        for field, value in delta.items():
+            merged[(period, department or '')][field] += value
+    for (period, department), delta in merged.items():
+        _apply(PayrollAggregate, {'period': period, 'department': department}, delta)
+
+
+def apply_headcount_delta(department, delta):
+    _apply(DepartmentHeadcount, {'department': department or ''}, {'headcount': delta})
+
+
+def get_department(employee_id):
+    return Employee.objects.filter(pk=employee_id).values_list('department', flat=True).first() or ''
+
+
+def move_employee_salaries(employee_id, old_department, new_department):
+    """员工调整部门后，将其历史工资单的汇总从原部门转到新部门，返回涉及的月份"""
+    rows = Salary.objects.filter(employee_id=employee_id).values('period').annotate(
+        slip_count=Count('id'), **{f: Sum(f) for f in SUM_FIELDS}
+    )
+    items = []
+    for row in rows:
+        delta = {f: row[f] for f in ('slip_count',) + SUM_FIELDS}
+        items.append((row['period'], old_department, {f: -v for f, v in delta.items()}))
+        items.append((row['period'], new_department, delta))
+    apply_salary_deltas(items)
+    return [row['period'] for row in rows]
+
+
+def _grouped_salaries(queryset):
+    return queryset.values('period', 'employee__department').annotate(
+        slip_count=Count('id'), **{f: Sum(f) for f in SUM_FIELDS}
+    ).order_by()
+
+
+@transaction.atomic
+def rebuild_aggregates(periods=None):
+    """从明细表重建汇总数据；指定 periods 时只重建这些月份，不重建部门人数"""
+    aggregates = PayrollAggregate.objects.all()
+    salaries = Salary.objects.all()
+    if periods is not None:
+        aggregates = aggregates.filter(period__in=periods)
+        salaries = salaries.filter(period__in=periods)
+    aggregates.delete()
+    PayrollAggregate.objects.bulk_create([
+        PayrollAggregate(
+            period=row['period'], department=row['employee__department'] or '',
+            slip_count=row['slip_count'], **{f: row[f] for f in SUM_FIELDS}
+        )
+        for row in _grouped_salaries(salaries)
+    ])
+
+    if periods is None:
+        DepartmentHeadcount.objects.all().delete()
+        DepartmentHeadcount.objects.bulk_create([
+            DepartmentHeadcount(department=row['department'] or '', headcount=row['headcount'])
+            for row in Employee.objects.values('department').annotate(headcount=Count('id')).order_by()
+        ])
+
+
+def recent_periods(months, today=None):
+    """截至当月的最近 months 个月份，按时间正序"""
+    today = today or date.today()
+    year, month = today.year, today.month
+    periods = []
+    for _ in range(months):
+        periods.append('%04d-%02d' % (year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return periods[::-1]
+
+
+def total_headcount(department=None):
+    queryset = DepartmentHeadcount.objects.all()
+    if department is not None:
+        queryset = queryset.filter(department=department)
+    return queryset.aggregate(total=Sum('headcount'))['total'] or 0
+
+
+def period_totals(periods, department=None):
+    """返回 {月份: {slip_count, total_income, total_deduction, net_salary}}"""
+    queryset = PayrollAggregate.objects.filter(period__in=periods)
+    if department is not None:
+        queryset = queryset.filter(department=department)
+    rows = queryset.values('period').annotate(
+        slip_count=Sum('slip_count'), **{f: Sum(f) for f in SUM_FIELDS}
+    ).order_by()
+    return {row.pop('period'): row for row in rows}
+
+
+# 单条写入的增量维护（信号在 AppConfig.ready 中连接）
+
+def remember_employee_department(sender, instance, update_fields=None, **kwargs):
+    """记录保存前的部门，调岗时迁移汇总数据"""
+    instance._previous_department = None
+    if instance.pk and (update_fields is None or 'department' in update_fields):
+        instance._previous_department = sender.objects.filter(pk=instance.pk).values_list(
+            'department', flat=True).first()
+
+
+def update_employee_aggregates(sender, instance, created, **kwargs):
+    department = instance.department or ''
+    if created:
+        apply_headcount_delta(department, 1)
+        return
+    previous = getattr(instance, '_previous_department', None)
+    if previous is not None and previous != department:
+        apply_headcount_delta(previous, -1)
+        apply_headcount_delta(department, 1)
+        periods = move_employee_salaries(instance.pk, previous, department)
+        bump_versions(*(period_scope(p) for p in periods))
+
+
+def remove_employee_aggregates(sender, instance, **kwargs):
+    # 员工的工资单已在级联删除时逐条从汇总中扣除
+    apply_headcount_delta(instance.department, -1)
+
+
+def remember_salary_totals(sender, instance, **kwargs):
+    """记录保存前的月份和金额，保存后按差额更新汇总（versioning 也据此递增原月份的版本）"""
+    instance._previous_totals = None
+    if instance.pk:
+        instance._previous_totals = sender.objects.filter(pk=instance.pk).values(
+            'period', 'employee_id', *SUM_FIELDS).first()
+
+
+def update_salary_aggregates(sender, instance, **kwargs):
+    items = []
+    previous = getattr(instance, '_previous_totals', None)
+    if previous is not None:
+        delta = {'slip_count': -1}
+        delta.update((f, -previous[f]) for f in SUM_FIELDS)
+        items.append((previous['period'], get_department(previous['employee_id']), delta))
+    items.append((instance.period, get_department(instance.employee_id), salary_delta(instance)))
+    apply_salary_deltas(items)
+
+
+def remove_salary_aggregates(sender, instance, **kwargs):
+    apply_salary_deltas([(instance.period, get_department(instance.employee_id), salary_delta(instance, -1))])
+
+
+def connect_signals():
+    pre_save.connect(remember_employee_department, sender=Employee, dispatch_uid='aggregates_employee_pre_save')
+    post_save.connect(update_employee_aggregates, sender=Employee, dispatch_uid='aggregates_employee_save')
+    post_delete.connect(remove_employee_aggregates, sender=Employee, dispatch_uid='aggregates_employee_delete')
+    pre_save.connect(remember_salary_totals, sender=Salary, dispatch_uid='aggregates_salary_pre_save')
+    post_save.connect(update_salary_aggregates, sender=Salary, dispatch_uid='aggregates_salary_save')
+    post_delete.connect(remove_salary_aggregates, sender=Salary, dispatch_uid='aggregates_salary_delete')
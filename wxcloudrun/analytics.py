@@ -0,0 +1,365 @@
+"""工资分析快照
+
+按月份把工资单（连同员工部门）导出为列式快照文件，分析接口在快照上按列
+计算百分位、直方图和按部门分组的统计，不再通过 ORM 扫描 salaries 表。
+
+文件格式（ANALYTICS_SNAPSHOT_DIR/<月份>.v<版本>.col）：8字节魔数、4字节头部
+长度、JSON 头部（行数、部门字典、各列偏移），之后是按8字节对齐的各列数据，
+金额为 int64 整数分，部门为 int32 编码。文件以 mmap 只读映射，安装 numpy
+时零拷贝转为数组按列计算，否则退化为纯 Python。
+
+快照与月份的版本号（salaries:period:<月份>）绑定：单条写入、批量导入、月度
+核算和员工调岗都会递增版本号，读取时发现版本变化即重建。多个进程共享同一
+目录，先建好快照的进程写入的文件，其他进程直接映射使用。
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from django.conf import settings
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+from .aggregates import SUM_FIELDS
+from .cache import LRUCache
+from .models import PayrollAggregate, Salary
+from .payroll import AMOUNT_FIELDS, is_valid_period, load_numpy
+from .versioning import get_versions, period_scope
+
+MAGIC = b'PAYSNAP1'
+_PREFIX = struct.Struct('<8sI')
+
+# 可分析的金额列
+AMOUNT_COLUMNS = AMOUNT_FIELDS + SUM_FIELDS
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+MAX_PERCENTILES = 10
+
+# 版本号每次读取都会校验，ttl 只用于释放长时间不用的映射
+_snapshots = LRUCache(settings.ANALYTICS_CACHE_SIZE, 3600)
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def _align(n):
+    return (n + 7) // 8 * 8
+
+
+class Snapshot:
+    """单个月份的只读列式快照
+
+    columns 中每列为 numpy 数组（未安装 numpy 时为 memoryview），
+    department 列为 departments 列表中的下标。
+    """
+
+    def __init__(self, period, version, departments, columns):
+        self.period = period
+        self.version = version
+        self.departments = departments
+        self.columns = columns
+        self.rows = len(columns['employee_id'])
+
+
+def snapshot_path(period, version):
+    return os.path.join(settings.ANALYTICS_SNAPSHOT_DIR, '%s.v%s.col' % (period, version))
+
+
+def read_period(period):
+    """从数据库按列读取一个月份的工资单，金额在 SQL 中转换为整数分"""
+    departments = {}
+    employee_ids = array('q')
+    department_codes = array('i')
+    amounts = {f: array('q') for f in AMOUNT_COLUMNS}
+    cents = {f: Cast(Round(F(f) * 100), BigIntegerField()) for f in AMOUNT_COLUMNS}
+    rows = Salary.objects.filter(period=period).order_by('id').annotate(
+        **{'%s_cents' % f: expr for f, expr in cents.items()}
+    ).values_list('employee_id', 'employee__department', *('%s_cents' % f for f in AMOUNT_COLUMNS))
+    appends = [amounts[f].append for f in AMOUNT_COLUMNS]
+    for row in rows.iterator(chunk_size=5000):
+        employee_ids.append(row[0])
+        department_codes.append(departments.setdefault(row[1] or '', len(departments)))
+        for append, value in zip(appends, row[2:]):
+            append(value)
+    columns = [('employee_id', employee_ids), ('department', department_codes)]
+    columns += [(f, amounts[f]) for f in AMOUNT_COLUMNS]
+    return list(departments), columns
+
+
+def write_snapshot(path, period, version, departments, columns):
+    """写入快照文件（先写临时文件再替换，读取方不会看到半个文件）"""
+    layout = []
+    offset = 0
+    for name, values in columns:
+        layout.append({'name': name, 'type': values.typecode, 'offset': offset})
+        offset += _align(len(values) * values.itemsize)
+    header = json.dumps({
+        'period': period,
+        'version': version,
+        'rows': len(columns[0][1]),
+        'byteorder': sys.byteorder,
+        'departments': departments,
+        'columns': layout,
+    }, ensure_ascii=False).encode('utf-8')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\0' * (_align(f.tell()) - f.tell()))
+        for _, values in columns:
+            data = values.tobytes()
+            f.write(data)
+            f.write(b'\0' * (_align(len(data)) - len(data)))
+    os.replace(tmp, path)
+
+
+def load_snapshot(path):
+    """映射快照文件，格式不符时返回 None"""
+    np = load_numpy()
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, header_size = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        return None
+    header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_size].decode('utf-8'))
+    if header['byteorder'] != sys.byteorder:
+        return None
+    base = _align(_PREFIX.size + header_size)
+    rows = header['rows']
+    columns = {}
+    for column in header['columns']:
+        start = base + column['offset']
+        if np is not None:
+            columns[column['name']] = np.frombuffer(mm, dtype=np.dtype(column['type']), count=rows, offset=start)
+        else:
+            size = array(column['type']).itemsize
+            columns[column['name']] = memoryview(mm)[start:start + rows * size].cast(column['type'])
+    return Snapshot(header['period'], header['version'], header['departments'], columns)
+
+
+def _remove_stale(period, version):
+    for path in glob.glob(os.path.join(settings.ANALYTICS_SNAPSHOT_DIR, '%s.v*.col' % period)):
+        if path != snapshot_path(period, version):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _build_lock(period):
+    with _build_locks_guard:
+        return _build_locks.setdefault(period, threading.Lock())
+
+
+def get_snapshot(period, version):
+    """返回指定版本的快照，内存和磁盘上都没有时从数据库重建"""
+    snapshot = _snapshots.get(period)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _build_lock(period):
+        snapshot = _snapshots.get(period)
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        path = snapshot_path(period, version)
+        snapshot = load_snapshot(path) if os.path.exists(path) else None
+        if snapshot is None:
+            departments, columns = read_period(period)
+            write_snapshot(path, period, version, departments, columns)
+            _remove_stale(period, version)
+            snapshot = load_snapshot(path)
+        _snapshots.set(period, snapshot)
+        return snapshot
+
+
+def get_snapshots(periods):
+    """按当前版本号返回各月份的快照，版本号只需一次查询"""
+    scopes = {period: period_scope(period) for period in periods}
+    versions = get_versions(list(scopes.values()))
+    return [get_snapshot(period, versions.get(scope, (0, None))[0]) for period, scope in scopes.items()]
+
+
+def build_snapshots(periods=None):
+    """预先生成快照，未指定月份时处理所有有工资单的月份"""
+    if periods is None:
+        periods = sorted(set(PayrollAggregate.objects.values_list('period', flat=True)))
+    return get_snapshots(periods)
+
+
+# ---- 按列计算 ----
+
+def select_values(snapshots, field, department=None):
+    """取出各快照中某一金额列（整数分），可只取指定部门"""
+    np = load_numpy()
+    parts = []
+    for snapshot in snapshots:
+        values = snapshot.columns[field]
+        if department is not None:
+            if department not in snapshot.departments:
+                continue
+            code = snapshot.departments.index(department)
+            codes = snapshot.columns['department']
+            if np is not None:
+                values = values[codes == code]
+            else:
+                values = [v for v, c in zip(values, codes) if c == code]
+        parts.append(values)
+    if np is not None:
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    return [v for part in parts for v in part]
+
+
+def _percentiles_sorted(ordered, percentiles):
+    """已排序数据的百分位（线性插值，与 numpy.percentile 默认方法一致）"""
+    n = len(ordered)
+    result = []
+    for q in percentiles:
+        position = (n - 1) * q / 100.0
+        low = int(math.floor(position))
+        high = min(low + 1, n - 1)
+        result.append(ordered[low] + (ordered[high] - ordered[low]) * (position - low))
+    return result
+
+
+def _yuan(cents):
+    return round(float(cents) / 100, 2)
+
+
+def summarize(values, percentiles=DEFAULT_PERCENTILES):
+    """数量、合计、均值、最值和百分位（金额单位为元）"""
+    np = load_numpy()
+    count = len(values)
+    if not count:
+        return {'count': 0, 'sum': 0, 'mean': None, 'min': None, 'max': None,
+                'percentiles': {'p%g' % q: None for q in percentiles}}
+    if np is not None:
+        total = int(values.sum())
+        points = np.percentile(values, percentiles).tolist() if percentiles else []
+        low, high = int(values.min()), int(values.max())
+    else:
+        ordered = sorted(values)
+        total = sum(ordered)
+        points = _percentiles_sorted(ordered, percentiles)
+        low, high = ordered[0], ordered[-1]
+    return {
+        'count': count,
+        'sum': _yuan(total),
+        'mean': _yuan(total / count),
+        'min': _yuan(low),
+        'max': _yuan(high),
+        'percentiles': {'p%g' % q: _yuan(p) for q, p in zip(percentiles, points)},
+    }
+
+
+def histogram(values, bins):
+    """等宽直方图，返回各区间的上下界（元）和数量"""
+    np = load_numpy()
+    if not len(values):
+        return []
+    if np is not None:
+        low, high = int(values.min()), int(values.max())
+    else:
+        low, high = min(values), max(values)
+    span = high - low
+    if span == 0:
+        return [{'min': _yuan(low), 'max': _yuan(high), 'count': len(values)}]
+    # 整数运算分桶，最大值落入最后一个区间
+    if np is not None:
+        index = np.minimum((values - low) * bins // span, bins - 1)
+        counts = np.bincount(index, minlength=bins).tolist()
+    else:
+        counts = [0] * bins
+        for v in values:
+            counts[min((v - low) * bins // span, bins - 1)] += 1
+    edges = [low + span * i / bins for i in range(bins + 1)]
+    return [
+        {'min': _yuan(edges[i]), 'max': _yuan(edges[i + 1]), 'count': counts[i]}
+        for i in range(bins)
+    ]
+
+
+def group_by_department(snapshots, field, percentiles=DEFAULT_PERCENTILES):
+    """按部门分组统计，部门按名称排序"""
+    np = load_numpy()
+    names = sorted({name for snapshot in snapshots for name in snapshot.departments})
+    if np is not None:
+        global_codes = {name: i for i, name in enumerate(names)}
+        codes = []
+        values = []
+        for snapshot in snapshots:
+            mapping = np.array([global_codes[name] for name in snapshot.departments], dtype=np.int32)
+            if len(mapping):
+                codes.append(mapping[snapshot.columns['department']])
+                values.append(snapshot.columns[field])
+        if not codes:
+            return []
+        codes = np.concatenate(codes)
+        values = np.concatenate(values)
+        # 按 (部门, 金额) 排序后每个部门是连续且有序的一段
+        order = np.lexsort((values, codes))
+        codes = codes[order]
+        values = values[order]
+        starts = np.searchsorted(codes, np.arange(len(names)), side='left')
+        ends = np.searchsorted(codes, np.arange(len(names)), side='right')
+        groups = [(name, values[start:end]) for name, start, end in zip(names, starts, ends) if end > start]
+    else:
+        grouped = {}
+        for snapshot in snapshots:
+            for code, value in zip(snapshot.columns['department'], snapshot.columns[field]):
+                grouped.setdefault(snapshot.departments[code], []).append(value)
+        groups = [(name, sorted(grouped[name])) for name in names if name in grouped]
+
+    result = []
+    for name, ordered in groups:
+        count = len(ordered)
+        total = int(ordered.sum()) if np is not None else sum(ordered)
+        points = _percentiles_sorted(ordered, percentiles)
+        result.append({
+            'department': name,
+            'count': count,
+            'sum': _yuan(total),
+            'mean': _yuan(total / count),
+            'percentiles': {'p%g' % q: _yuan(p) for q, p in zip(percentiles, points)},
+        })
+    return result
+
+
+# ---- 请求参数 ----
+
+def parse_periods(query_params, today):
+    """period=YYYY-MM 或 year=YYYY（该年有工资单的月份），都未指定时为当月"""
+    year = query_params.get('year')
+    if year:
+        if not (len(year) == 4 and year.isdigit()):
+            raise ValueError('year 参数格式应为YYYY')
+        return sorted(set(PayrollAggregate.objects.filter(
+            period__startswith=year + '-').values_list('period', flat=True)))
+    period = query_params.get('period') or today.strftime('%Y-%m')
+    if not is_valid_period(period):
+        raise ValueError('月份格式应为YYYY-MM')
+    return [period]
+
+
+def parse_field(query_params):
+    field = query_params.get('field') or 'net_salary'
+    if field not in AMOUNT_COLUMNS:
+        raise ValueError('field 可选: %s' % ', '.join(AMOUNT_COLUMNS))
+    return field
+
+
+def parse_percentiles(query_params):
+    raw = query_params.get('percentiles')
+    if not raw:
+        return DEFAULT_PERCENTILES
+    try:
+        percentiles = tuple(float(q) for q in raw.split(','))
+    except ValueError:
+        raise ValueError('percentiles 参数应为逗号分隔的数字')
+    if len(percentiles) > MAX_PERCENTILES or any(not 0 <= q <= 100 for q in percentiles):
+        raise ValueError('percentiles 最多%d个，取值范围0-100' % MAX_PERCENTILES)
+    return percentiles
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AppNameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wxcloudrun'
+
+    def ready(self):
+        # 各功能模块在 connect_signals() 中连接自己的信号处理函数
+        from . import aggregates, authentication, dashboard, metrics, search, versioning, wechat
+
+        for module in (aggregates, versioning, authentication, dashboard, search, wechat, metrics):
+            module.connect_signals()
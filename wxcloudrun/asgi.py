@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wxcloudrun.settings')
 
 application = get_asgi_application()
+
+# 每个 worker 进程启动后在后台构建员工搜索索引
+from django.conf import settings  # noqa: E402
+
+if settings.SEARCH_INDEX_WARMUP:
+    from wxcloudrun.search import warm_up  # noqa: E402
+    warm_up()
+
+# 记录距容器启动的耗时（加载完应用、返回第一个响应），见 wxcloudrun/startup.py
+from wxcloudrun.startup import track_startup  # noqa: E402
+
+track_startup()
@@ -0,0 +1,110 @@
+"""带缓存的 JWT 认证
+
+simplejwt 默认的 JWTAuthentication 每个请求都会查询一次 employees 表。
+这里把认证所需的少量字段缓存在进程内 LRU 中（可选同时写入 Django 缓存，
+供多进程共享），员工信息变更时由信号清除对应条目。
+
+信号只能清除当前进程的 LRU，其他进程的条目要到过期才失效。为避免被停用或降级的
+管理员在这段时间内继续持有管理员权限，缓存中角色为管理员的用户每次请求都回库校验。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import LRUCache
+from .dbrouter import note_user
+from .models import Employee
+
+# 视图和权限判断用到的字段
+USER_FIELDS = ('id', 'employee_code', 'name', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+user_cache = LRUCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def _shared_key(user_id):
+    return 'auth_user:%s' % user_id
+
+
+class CachedUser:
+    """轻量用户对象，只携带认证和权限判断需要的字段
+
+    需要完整的 Employee 实例时，使用 Employee.objects.get(pk=user.id)。
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, data):
+        for field in USER_FIELDS:
+            setattr(self, field, data[field])
+        self.pk = self.id
+
+    def __str__(self):
+        return f"{self.name} ({self.employee_code})"
+
+
+def _fetch_user_data(user_id):
+    return Employee.objects.filter(pk=user_id).values(*USER_FIELDS).first()
+
+
+def load_user_data(user_id):
+    data = user_cache.get(user_id)
+    if data is None and settings.AUTH_USER_CACHE_SHARED:
+        data = cache.get(_shared_key(user_id))
+        if data is not None:
+            user_cache.set(user_id, data)
+    if data is not None:
+        if data['role'] != 'admin':
+            return data
+        # 管理员权限以数据库为准，结果有变化时刷新缓存
+        fresh = _fetch_user_data(user_id)
+        if fresh != data:
+            invalidate_user(user_id)
+            if fresh is not None:
+                _store_user_data(user_id, fresh)
+        return fresh
+    data = _fetch_user_data(user_id)
+    if data is not None:
+        _store_user_data(user_id, data)
+    return data
+
+
+def _store_user_data(user_id, data):
+    if settings.AUTH_USER_CACHE_SHARED:
+        cache.set(_shared_key(user_id), data, settings.AUTH_USER_CACHE_TTL)
+    user_cache.set(user_id, data)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(user_id)
+    if settings.AUTH_USER_CACHE_SHARED:
+        cache.delete(_shared_key(user_id))
+
+
+def _employee_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(_employee_changed, sender=Employee, dispatch_uid='authentication_employee')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """从缓存解析 JWT 对应的用户，命中时不访问数据库"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed('Token contained no recognizable user identification')
+
+        note_user(user_id)
+        data = load_user_data(user_id)
+        if data is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not data['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return CachedUser(data)
@@ -0,0 +1,348 @@
+"""接口压测工具
+
+每个场景对应 wxcloudrun/urls.py 中的一个路由，按固定并发发送请求，
+统计吞吐量和 p50/p95/p99 延迟。请求默认发往已启动的服务（--url，与生产
+环境相同的 gunicorn 配置）；也可以在进程内通过 Django 测试客户端发出，
+不经过网络和服务器，只用于快速对比应用代码本身的开销。
+
+请求不伪造 X-Forwarded-For，登录限流照常生效；压测登录接口时，被测服务应以
+LOGIN_THROTTLE_IP_PER_MINUTE=0、LOGIN_THROTTLE_CODE_PER_MINUTE=0 启动。
+
+默认只运行读接口；写接口会向数据库写入数据，需显式开启。
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Employee, Job, Notice, Salary
+
+MULTIPART_BOUNDARY = 'benchmarkboundary'
+
+
+class Scenario:
+    """压测场景
+
+    route 为路由名（未命名的路由使用路径），build(ctx, rng) 返回
+    (method, path, headers, body)。requests 指定该场景的请求数，
+    为 None 时使用全局设置。
+    """
+
+    def __init__(self, name, route, build, write=False, requests=None):
+        self.name = name
+        self.route = route
+        self.build = build
+        self.write = write
+        self.requests = requests
+
+
+def _json(method, path, data, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = 'Bearer ' + token
+    return method, path, headers, json.dumps(data).encode('utf-8')
+
+
+def _get(path, token=None):
+    return 'GET', path, {'Authorization': 'Bearer ' + token} if token else {}, b''
+
+
+def _multipart(path, filename, content_type, content, token):
+    body = (
+        '--%s\r\nContent-Disposition: form-data; name="file"; filename="%s"\r\n'
+        'Content-Type: %s\r\n\r\n%s\r\n--%s--\r\n'
+    ) % (MULTIPART_BOUNDARY, filename, content_type, content, MULTIPART_BOUNDARY)
+    headers = {
+        'Authorization': 'Bearer ' + token,
+        'Content-Type': 'multipart/form-data; boundary=%s' % MULTIPART_BOUNDARY,
+    }
+    return 'POST', path, headers, body.encode('utf-8')
+
+
+def _import_body(ctx, rng):
+    # 历史月份不会与生成的数据冲突
+    period = '19%02d-%02d' % (rng.randrange(100), rng.randint(1, 12))
+    lines = ['employee_code,period,base_salary']
+    lines += ['%s,%s,%d' % (code, period, rng.randint(3000, 30000)) for code in rng.sample(ctx.codes, 20)]
+    return _multipart('/api/salaries/import/', 'salaries.csv', 'text/csv', '\n'.join(lines), ctx.admin_token)
+
+
+def _employee_csv(ctx, rng):
+    # 新工号和已有工号各一半，覆盖校验和重复检查
+    lines = ['employee_code,name,password,department']
+    lines += ['X%s,压测,%s,压测部' % (uuid.uuid4().hex[:12], ctx.password) for _ in range(50)]
+    lines += ['%s,压测,%s,压测部' % (code, ctx.password) for code in rng.sample(ctx.codes, 50)]
+    return '\n'.join(lines)
+
+
+def _employee_import_body(ctx, rng):
+    # 试运行，不计算哈希
+    return _multipart(
+        '/api/admin/employees/import/?dryRun=true', 'employees.csv', 'text/csv', _employee_csv(ctx, rng),
+        ctx.admin_token)
+
+
+def _job_submit_body(ctx, rng):
+    # 提交试运行的员工导入任务，worker 执行时也不会写入数据
+    method, path, headers, body = _multipart(
+        '/api/jobs/', 'employees.csv', 'text/csv', _employee_csv(ctx, rng), ctx.admin_token)
+    fields = ''.join(
+        '--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n' % (MULTIPART_BOUNDARY, name, value)
+        for name, value in (('kind', 'import_employees'), ('dryRun', 'true'))
+    )
+    return method, path, headers, fields.encode('utf-8') + body
+
+
+SCENARIOS = [
+    Scenario('api-root', 'api-root', lambda ctx, rng: _get('/api/', ctx.employee_token)),
+    Scenario('employee-login', 'employee-login', lambda ctx, rng: _json(
+        'POST', '/api/employees/login/', {'employee_code': rng.choice(ctx.codes), 'password': ctx.password})),
+    Scenario('employee-wechat-login', 'employee-wechat-login', lambda ctx, rng: _json(
+        'POST', '/api/employees/wechat_login/', {'code': 'benchmark'})),
+    Scenario('token-obtain', 'token_obtain_pair', lambda ctx, rng: _json(
+        'POST', '/api/token/', {'username': rng.choice(ctx.codes), 'password': ctx.password})),
+    Scenario('token-refresh', 'token_refresh', lambda ctx, rng: _json(
+        'POST', '/api/token/refresh/', {'refresh': ctx.refresh_token})),
+    Scenario('employee-list(admin)', 'employee-list', lambda ctx, rng: _get(
+        '/api/employees/?page_size=20', ctx.admin_token)),
+    Scenario('employee-detail', 'employee-detail', lambda ctx, rng: _get(
+        '/api/employees/%s/' % ctx.employee_id, ctx.employee_token)),
+    Scenario('employee-stats', 'employee-stats', lambda ctx, rng: _get(
+        '/api/employees/stats/', ctx.employee_token)),
+    Scenario('employee-search(admin)', 'employee-search', lambda ctx, rng: _get(
+        '/api/employees/search/?q=%s' % rng.choice(ctx.codes)[-4:], ctx.admin_token)),
+    Scenario('employee-dashboard', 'employee-dashboard', lambda ctx, rng: _get(
+        '/api/employees/dashboard/', ctx.employee_token)),
+    Scenario('salary-list', 'salary-list', lambda ctx, rng: _get(
+        '/api/salaries/', ctx.employee_token)),
+    Scenario('salary-list(admin, period)', 'salary-list', lambda ctx, rng: _get(
+        '/api/salaries/?period=%s&page_size=50' % ctx.period, ctx.admin_token)),
+    Scenario('salary-detail', 'salary-detail', lambda ctx, rng: _get(
+        '/api/salaries/%s/' % ctx.salary_id, ctx.employee_token)),
+    Scenario('salary-export', 'salary-export', lambda ctx, rng: _get(
+        '/api/salaries/export/?period=%s&type=csv' % ctx.period, ctx.admin_token), requests=5),
+    Scenario('notice-list', 'notice-list', lambda ctx, rng: _get('/api/notices/')),
+    Scenario('notice-detail', 'notice-detail', lambda ctx, rng: _get('/api/notices/%s/' % ctx.notice_id)),
+    Scenario('admin-stats', 'admin-stats', lambda ctx, rng: _get('/api/admin/stats/', ctx.admin_token)),
+    Scenario('admin-stats(trend)', 'admin-stats', lambda ctx, rng: _get(
+        '/api/admin/stats/?months=12', ctx.admin_token)),
+    Scenario('admin-departments', 'admin-departments', lambda ctx, rng: _get(
+        '/api/admin/departments/?period=%s' % ctx.period, ctx.admin_token)),
+    Scenario('admin-department-members', 'admin-department-members', lambda ctx, rng: _get(
+        '/api/admin/departments/members/?period=%s&department=%s' % (ctx.period, quote(ctx.department)),
+        ctx.admin_token)),
+    Scenario('admin-analytics', 'admin-analytics', lambda ctx, rng: _get(
+        '/api/admin/analytics/?period=%s&groupBy=department' % ctx.period, ctx.admin_token)),
+    Scenario('admin-analytics-histogram', 'admin-analytics-histogram', lambda ctx, rng: _get(
+        '/api/admin/analytics/histogram/?year=%s&field=bonus' % ctx.period[:4], ctx.admin_token)),
+    Scenario('job-list', 'job-list', lambda ctx, rng: _get('/api/jobs/', ctx.admin_token)),
+    Scenario('job-detail', 'job-detail', lambda ctx, rng: _get('/api/jobs/%d/' % ctx.job_id, ctx.admin_token)),
+    Scenario('metrics', 'metrics', lambda ctx, rng: _get('/metrics', settings.METRICS_TOKEN)),
+    Scenario('health', 'health', lambda ctx, rng: _get('/health/')),
+    # 写接口
+    Scenario('employee-bind-wechat', 'employee-bind-wechat', lambda ctx, rng: _json(
+        'POST', '/api/employees/bind_wechat/', {'code': 'benchmark', 'userInfo': {}}, ctx.employee_token), write=True),
+    Scenario('salary-create', 'salary-list', lambda ctx, rng: _json(
+        'POST', '/api/salaries/', {
+            'employee': rng.choice(ctx.employee_ids),
+            'period': '18%02d-%02d' % (rng.randrange(100), rng.randint(1, 12)),
+            'base_salary': '8000.00',
+        }, ctx.admin_token), write=True),
+    Scenario('salary-import', 'salary-bulk-import', _import_body, write=True, requests=20),
+    Scenario('admin-employees', 'admin-employees', lambda ctx, rng: _json(
+        'POST', '/api/admin/employees/', {
+            'employee_code': 'X' + uuid.uuid4().hex[:12], 'username': uuid.uuid4().hex,
+            'name': '压测', 'password': ctx.password,
+        }, ctx.admin_token), write=True),
+    Scenario('admin-employees-import', 'admin-employees-import', _employee_import_body),
+    Scenario('job-submit', 'job-list', _job_submit_body, write=True, requests=20),
+    Scenario('admin-payroll', 'admin-payroll', lambda ctx, rng: _json(
+        'POST', '/api/admin/payroll/', {'period': ctx.period}, ctx.admin_token), write=True, requests=1),
+]
+
+
+class Context:
+    """压测使用的账号、令牌和样本数据，从当前数据库中选取"""
+
+    def __init__(self, password, sample_size=1000):
+        self.password = password
+        admin = Employee.objects.filter(role='admin').order_by('id').first()
+        salary = Salary.objects.order_by('-period', 'id').first()
+        if admin is None or salary is None:
+            raise ValueError('数据库中没有管理员或工资单，请先执行 generate_data')
+        employee = Employee.objects.get(pk=salary.employee_id)
+
+        self.admin_token = str(RefreshToken.for_user(admin).access_token)
+        refresh = RefreshToken.for_user(employee)
+        self.employee_token = str(refresh.access_token)
+        self.refresh_token = str(refresh)
+        self.employee_id = employee.id
+        self.salary_id = salary.id
+        self.period = salary.period
+        self.department = employee.department
+        self.notice_id = Notice.objects.values_list('id', flat=True).first() or 0
+        self.job_id = Job.objects.values_list('id', flat=True).order_by('-id').first() or 0
+
+        sample = list(Employee.objects.filter(role='employee').order_by('id').values_list(
+            'id', 'employee_code')[:sample_size])
+        self.employee_ids = [row[0] for row in sample]
+        self.codes = [row[1] for row in sample]
+
+
+class InProcessClient:
+    """通过 Django 测试客户端在进程内发送请求，每个线程一个实例"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, headers, body):
+        extra = {'HTTP_' + k.upper().replace('-', '_'): v for k, v in headers.items() if k != 'Content-Type'}
+        response = self.client.generic(
+            method, path, body, content_type=headers.get('Content-Type', 'application/octet-stream'), **extra
+        )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+
+class HttpClient:
+    """向本地服务发送请求，每个线程一个保持连接"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.conn = None
+
+    def request(self, method, path, headers, body):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, self.prefix + path, body=body or None, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                # 服务端关闭了空闲连接，重连一次
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位"""
+    if not sorted_values:
+        return None
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def run_scenario(scenario, ctx, client_factory, requests, concurrency, warmup, seed=0):
+    """按并发执行一个场景，返回统计结果"""
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = client_factory()
+        for _ in range(warmup):
+            try:
+                client.request(*scenario.build(ctx, rng))
+            except Exception:
+                pass
+        local_latencies = []
+        local_statuses = Counter()
+        local_errors = Counter()
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    break
+            spec = scenario.build(ctx, rng)
+            start = time.perf_counter()
+            try:
+                local_statuses[client.request(*spec)] += 1
+            except Exception as exc:
+                local_errors[type(exc).__name__] += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            errors.update(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'route': scenario.route,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latencyMs': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'status': {str(k): v for k, v in sorted(statuses.items())},
+        'errors': dict(errors),
+    }
+
+
+def iter_route_names(patterns=None, prefix=''):
+    """项目中所有路由的名称（未命名的使用路径），忽略格式后缀的重复路由"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_route_names(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield pattern.name or prefix + str(pattern.pattern)
+
+
+def uncovered_routes(scenarios=SCENARIOS):
+    covered = {s.route for s in scenarios}
+    return sorted({name for name in iter_route_names() if name not in covered})
+
+
+def run_benchmark(ctx, client_factory, scenarios, requests, concurrency, warmup, seed=0):
+    results = {}
+    for scenario in scenarios:
+        count = scenario.requests if scenario.requests is not None else requests
+        results[scenario.name] = run_scenario(
+            scenario, ctx, client_factory, count, min(concurrency, count), warmup, seed
+        )
+    return {
+        'startedAt': timezone.now().isoformat(),
+        'results': results,
+    }
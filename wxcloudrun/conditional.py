@@ -0,0 +1,83 @@
+"""条件请求（ETag）
+
+读接口先根据版本号（公告为最新创建时间和条数）计算 ETag，客户端携带的 If-None-Match 匹配时直接返回 304，
+不执行完整查询和序列化。
+
+不输出 Last-Modified：它只精确到秒，同一秒内的第二次修改不会改变它，客户端用
+If-Modified-Since 会得到过期的 304；员工统计还随当前月份变化，与修改时间无关。
+"""
+import functools
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .versioning import (
+    PERIOD_SCOPE_PREFIX, SALARIES_BULK, employee_salaries_scope, get_prefix_version, get_versions, notices_version
+)
+
+
+class ResourceState:
+    """资源当前状态：由版本号等组成部分计算的 ETag"""
+
+    def __init__(self, parts):
+        key = '|'.join(str(p) for p in parts)
+        self.etag = '"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def notices_state(user, query_string):
+    # 公告对所有人相同，与用户无关；查询参数（如 fields）影响输出
+    return ResourceState(['notices', *notices_version(), query_string])
+
+
+def _versions_state(name, user, scopes, *extra):
+    versions = get_versions(scopes)
+    parts = [name, user.id, user.role] + list(extra)
+    parts += [versions[s][0] if s in versions else 0 for s in scopes]
+    return ResourceState(parts)
+
+
+def salaries_state(user, query_string):
+    if user.role == 'admin':
+        # 管理员看到全部工资单，版本为各月份版本号之和，任一月份变更时改变
+        return ResourceState(['salaries', user.id, user.role, query_string, get_prefix_version(PERIOD_SCOPE_PREFIX)])
+    # 员工只看到自己的工资单
+    scopes = [SALARIES_BULK, employee_salaries_scope(user.id)]
+    return _versions_state('salaries', user, scopes, query_string)
+
+
+def employee_stats_state(user, query_string):
+    # 员工统计只依赖本人的工资单和当前月份
+    scopes = [SALARIES_BULK, employee_salaries_scope(user.id)]
+    return _versions_state('stats', user, scopes, timezone.now().strftime('%Y-%m'))
+
+
+def not_modified_response(request, state):
+    """匹配时返回 304 响应，否则返回 None"""
+    return get_conditional_response(request, etag=state.etag)
+
+
+def apply_conditional_headers(response, state):
+    response['ETag'] = state.etag
+    # 响应因用户而异，只允许客户端缓存且每次需要重新验证
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def conditional(state_func):
+    """DRF 视图方法装饰器：GET/HEAD 请求支持条件请求"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapped(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+            state = state_func(request.user, request.META.get('QUERY_STRING', ''))
+            response = not_modified_response(request, state)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return apply_conditional_headers(response, state)
+        return wrapped
+    return decorator
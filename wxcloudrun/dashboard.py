@@ -0,0 +1,112 @@
+"""员工首页数据
+
+小程序首页需要的个人信息、本月工资、最近工资单、年度累计和最新公告
+由一个接口返回，未命中缓存时固定执行 4 条查询。
+
+结果按 (员工, 最近工资单条数) 缓存在进程内 LRU 中，并记录生成时相关资源的版本号
+（本人工资单、批量写入、员工信息）和公告的最新创建时间、条数。每次请求只需一次
+版本号查询和一次公告聚合，一致即直接返回缓存，多进程部署下任一进程的写入都会使
+其他进程的缓存失效；本进程内工资单和员工的写入还会由信号立即清除对应条目。
+"""
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+
+from .cache import LRUCache
+from .models import Employee, Notice, Salary
+from .serializers import EmployeeSerializer, NoticeSerializer
+from .versioning import SALARIES_BULK, employee_salaries_scope, employee_scope, get_versions, notices_version
+
+dashboard_cache = LRUCache(settings.DASHBOARD_CACHE_SIZE, settings.DASHBOARD_CACHE_TTL)
+
+SUMMARY_FIELDS = ('total_income', 'total_deduction', 'net_salary')
+
+
+def dashboard_scopes(employee_id):
+    return [SALARIES_BULK, employee_salaries_scope(employee_id), employee_scope(employee_id)]
+
+
+def _amounts(row):
+    return {
+        'totalIncome': float(row['total_income'] or 0),
+        'totalDeduction': float(row['total_deduction'] or 0),
+        'netSalary': float(row['net_salary'] or 0),
+    }
+
+
+def build_dashboard(employee_id, current_month, recent):
+    """查询并组装首页数据，员工不存在时返回 None"""
+    employee = Employee.objects.filter(pk=employee_id).first()
+    if employee is None:
+        return None
+
+    # 按 (employee, period) 唯一索引倒序读取最近的工资单
+    recent_rows = Salary.objects.filter(employee_id=employee_id).order_by('-period').values(
+        'id', 'period', 'pay_date', *SUMMARY_FIELDS)[:recent]
+
+    # 年度累计和本月实发在同一条查询中完成
+    year = current_month[:4]
+    totals = Salary.objects.filter(
+        employee_id=employee_id, period__gte=f'{year}-01', period__lte=current_month
+    ).aggregate(
+        slip_count=Count('id'),
+        current_net=Sum('net_salary', filter=Q(period=current_month)),
+        **{f: Sum(f) for f in SUMMARY_FIELDS}
+    )
+
+    notices = Notice.objects.order_by('-created_at')[:settings.DASHBOARD_NOTICES]
+
+    return {
+        'success': True,
+        'profile': EmployeeSerializer(employee).data,
+        'currentMonth': {
+            'period': current_month,
+            'netSalary': float(totals['current_net'] or 0),
+        },
+        'recentSalaries': [
+            dict(id=row['id'], period=row['period'], payDate=row['pay_date'], **_amounts(row))
+            for row in recent_rows
+        ],
+        'yearToDate': dict(year=year, slipCount=totals['slip_count'], **_amounts(totals)),
+        'notices': NoticeSerializer(notices, many=True).data,
+    }
+
+
+def get_dashboard(employee_id, current_month, recent):
+    """带版本校验的缓存读取"""
+    scopes = dashboard_scopes(employee_id)
+    versions = get_versions(scopes)
+    stamp = (current_month,) + tuple(versions[s][0] if s in versions else 0 for s in scopes)
+    # 公告与 ETag 使用同一状态，不经过信号的插入和删除同样使缓存失效
+    stamp += notices_version()
+
+    # 不同的 recent 返回不同条数，分别缓存，交替请求时互不覆盖
+    key = (employee_id, recent)
+    cached = dashboard_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    data = build_dashboard(employee_id, current_month, recent)
+    if data is not None:
+        dashboard_cache.set(key, (stamp, data))
+    return data
+
+
+def invalidate_dashboard(employee_id=None):
+    """清除指定员工的缓存，不指定时全部清除"""
+    if employee_id is None:
+        dashboard_cache.clear()
+        return
+    for recent in range(1, settings.DASHBOARD_MAX_RECENT_SALARIES + 1):
+        dashboard_cache.delete((employee_id, recent))
+
+
+def _employee_changed(sender, instance, **kwargs):
+    # 工资单变更时 instance 为工资单，对应员工为 employee_id
+    invalidate_dashboard(instance.employee_id if sender is Salary else instance.pk)
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(_employee_changed, sender=Employee, dispatch_uid='dashboard_employee')
+        signal.connect(_employee_changed, sender=Salary, dispatch_uid='dashboard_salary')
@@ -0,0 +1,5 @@
+"""带连接池的数据库后端
+
+ENGINE 设为 wxcloudrun.dbpool（MySQL）或 wxcloudrun.dbpool.sqlite3（本地开发和测试），
+连接池参数在 DATABASES 的 POOL 中配置，见 wxcloudrun/dbpool/pool.py。
+"""
@@ -0,0 +1,11 @@
+from django.db.backends.mysql import base
+
+from .pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """使用连接池的 MySQL 后端（PyMySQL）"""
+
+    @staticmethod
+    def ping_connection(raw):
+        raw.ping(reconnect=False)
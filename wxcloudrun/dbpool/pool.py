@@ -0,0 +1,242 @@
+"""进程内数据库连接池
+
+Django 3.2 没有连接池：CONN_MAX_AGE 只能让连接跟随线程保持，每个线程各占一个
+连接，空闲线程的连接不能给其他线程使用，线程结束后连接也无法复用。这里在数据库
+后端层面接管建立和关闭连接：
+
+- connect() 从池中取出空闲连接（后进先出），没有空闲连接且未达到 MAX_SIZE 时
+  新建，否则最多等待 TIMEOUT 秒，超时抛出 PoolTimeout（OperationalError）；
+- close() 把连接放回池中而不是断开，请求结束时 Django 照常调用 close()，
+  因此 CONN_MAX_AGE 必须为 0；
+- 空闲超过 PRE_PING_AFTER 秒的连接在取出前先 ping，失败则丢弃并重新获取；
+  建立超过 MAX_LIFETIME 秒的连接在取出或放回时关闭；
+- 出错后（errors_occurred）、事务中被关闭或持有连接的线程退出而未归还的
+  连接直接关闭，不放回池中。
+
+连接池按数据库别名区分，每个进程一组；fork 出的子进程不复用父进程的连接。
+"""
+import os
+import threading
+import time
+import weakref
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import OperationalError
+
+from ..metrics import db_pool_checkouts, db_pool_closed, db_pool_timeouts, db_pool_wait_time
+
+DEFAULT_OPTIONS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'PRE_PING_AFTER': 5,
+}
+
+
+class PoolTimeout(OperationalError):
+    """等待空闲连接超时"""
+
+
+class PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used', 'initialized', 'finalizer')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = self.last_used = time.monotonic()
+        # 会话级设置（隔离级别等）只需在新建时执行一次
+        self.initialized = False
+        self.finalizer = None
+
+
+class ConnectionPool:
+
+    def __init__(self, alias, ping, max_size, timeout, max_lifetime, pre_ping_after):
+        self.alias = alias
+        self.ping = ping
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping_after = pre_ping_after
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        """fork 后子进程丢弃继承的连接（不关闭，关闭会影响父进程的会话）"""
+        if self._pid != os.getpid():
+            self._idle = []
+            self._open = 0
+            self._pid = os.getpid()
+
+    def stats(self):
+        with self._cond:
+            self._check_pid()
+            return {'open': self._open, 'idle': len(self._idle)}
+
+    def _expired(self, entry, now):
+        return self.max_lifetime and now - entry.created_at >= self.max_lifetime
+
+    def _discard(self, entry, reason):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            if self._pid == os.getpid():
+                self._open -= 1
+                self._cond.notify()
+        db_pool_closed.inc((self.alias, reason))
+
+    def acquire(self, connect):
+        """取出一个可用连接；connect() 用于新建连接"""
+        started = None
+        while True:
+            with self._cond:
+                self._check_pid()
+                if self._idle:
+                    entry = self._idle.pop()
+                elif self._open < self.max_size:
+                    entry = None
+                    self._open += 1
+                else:
+                    now = time.monotonic()
+                    if started is None:
+                        started = now
+                    remaining = started + self.timeout - now
+                    if remaining <= 0:
+                        db_pool_timeouts.inc((self.alias,))
+                        raise PoolTimeout('等待数据库连接超时（连接池上限 %d）' % self.max_size)
+                    self._cond.wait(remaining)
+                    continue
+
+            # 建立连接和 ping 都在锁外进行
+            if entry is None:
+                try:
+                    entry = PooledConnection(connect())
+                except BaseException:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                source = 'new'
+            else:
+                now = time.monotonic()
+                if self._expired(entry, now):
+                    self._discard(entry, 'lifetime')
+                    continue
+                if now - entry.last_used >= self.pre_ping_after:
+                    try:
+                        self.ping(entry.raw)
+                    except Exception:
+                        self._discard(entry, 'broken')
+                        continue
+                source = 'reused'
+
+            if started is not None:
+                db_pool_wait_time.observe((self.alias,), time.monotonic() - started)
+            db_pool_checkouts.inc((self.alias, source))
+            return entry
+
+    def release(self, entry, discard=False):
+        if entry.finalizer is not None:
+            entry.finalizer.detach()
+            entry.finalizer = None
+        now = time.monotonic()
+        if discard:
+            self._discard(entry, 'error')
+            return
+        if self._expired(entry, now):
+            self._discard(entry, 'lifetime')
+            return
+        entry.last_used = now
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def reclaim(self, entry):
+        """持有连接的数据库包装对象被回收而连接未归还（线程退出未调用 close）"""
+        entry.finalizer = None
+        self._discard(entry, 'leaked')
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry, 'shutdown')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options, ping):
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                options = dict(DEFAULT_OPTIONS, **options)
+                pool = _pools[alias] = ConnectionPool(
+                    alias, ping,
+                    max_size=int(options['MAX_SIZE']),
+                    timeout=float(options['TIMEOUT']),
+                    max_lifetime=float(options['MAX_LIFETIME']),
+                    pre_ping_after=float(options['PRE_PING_AFTER']),
+                )
+    return pool
+
+
+def pool_stats():
+    """{别名: {'open': 已建立连接数, 'idle': 空闲连接数}}"""
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+class PooledDatabaseWrapperMixin:
+    """与 Django 数据库后端的 DatabaseWrapper 组合使用，子类实现 ping_connection(raw)"""
+
+    _pool_entry = None
+
+    @staticmethod
+    def ping_connection(raw):
+        raise NotImplementedError
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL') or {}, self.ping_connection)
+
+    def check_settings(self):
+        super().check_settings()
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(
+                '数据库 %s 使用连接池时 CONN_MAX_AGE 必须为 0，连接的保持由连接池负责' % self.alias)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        entry = pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+        entry.finalizer = weakref.finalize(self, pool.reclaim, entry)
+        self._pool_entry = entry
+        return entry.raw
+
+    def init_connection_state(self):
+        entry = self._pool_entry
+        if entry is not None and entry.initialized:
+            return
+        super().init_connection_state()
+        if entry is not None:
+            entry.initialized = True
+
+    def _close(self):
+        entry, self._pool_entry = self._pool_entry, None
+        if entry is None or entry.raw is not self.connection:
+            return super()._close()
+        # 事务中被关闭时 Django 仍持有该连接，出错后连接状态不可信，都不放回池中
+        discard = self.in_atomic_block or self.errors_occurred
+        if not discard and not self.autocommit:
+            try:
+                entry.raw.rollback()
+            except Exception:
+                discard = True
+        self.pool.release(entry, discard=discard)
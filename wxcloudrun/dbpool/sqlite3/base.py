@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """使用连接池的 SQLite 后端，用于本地验证连接池行为（不支持内存数据库）"""
+
+    @staticmethod
+    def ping_connection(raw):
+        raw.execute('SELECT 1').close()
@@ -0,0 +1,161 @@
+"""读写分离
+
+DATABASES 中带 REPLICA_WEIGHT 的别名视为主库（default）的只读副本（生产环境由
+DB_REPLICAS 生成）。ReplicaRoutingMiddleware 覆盖的 GET/HEAD 请求中，读查询发往
+副本，写入和主库事务中的查询发往主库：
+
+- 其他方法的请求（登录、绑定微信、新增员工等）全部读写主库，写入前的存在性和
+  唯一性检查不受复制延迟影响；
+- 同一请求中发生写入后，后续读查询改走主库；
+- 读己之写：用户写入后 DB_REPLICA_STICKY_SECONDS 秒内，该用户（按 JWT 区分）的
+  请求只读主库，避开复制延迟。记录在进程内，可选同时写入 Django 缓存供多进程共享；
+- 副本按权重随机选择，同一请求固定使用同一个副本。选中时先建立连接（连接池
+  会 ping 空闲连接），失败的副本 DB_REPLICA_RETRY_INTERVAL 秒内不再选择，全部
+  不可用时读主库；连接池已满时本次请求读主库，不标记副本故障。
+
+请求之外（管理命令、后台任务 worker、后台线程）始终读写主库。其他用户的写入
+在复制完成前仍可能短暂读不到。
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .cache import LRUCache
+from .dbpool.pool import PoolTimeout
+from .metrics import db_replica_failures, db_replica_selected
+
+logger = logging.getLogger('log')
+
+# 进程内记录的写入用户数上限，超过时淘汰最早的
+STICKY_CACHE_SIZE = 100000
+
+
+class RoutingState:
+    """单个请求的路由状态，由 ReplicaRoutingMiddleware 设置"""
+    __slots__ = ('user_id', 'primary', 'wrote', 'replica')
+
+    def __init__(self, primary=False):
+        self.user_id = None
+        # 为 True 时读查询发往主库
+        self.primary = primary
+        self.wrote = False
+        # 本次请求选中的副本，无可用副本时为主库
+        self.replica = None
+
+
+routing_state_var = contextvars.ContextVar('db_routing_state', default=None)
+
+_sticky = LRUCache(STICKY_CACHE_SIZE, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def _sticky_key(user_id):
+    return 'db_sticky:%s' % user_id
+
+
+def _is_sticky(user_id):
+    if _sticky.get(user_id):
+        return True
+    return settings.DB_REPLICA_STICKY_SHARED and bool(cache.get(_sticky_key(user_id)))
+
+
+def mark_sticky(user_id):
+    _sticky.set(user_id, True)
+    if settings.DB_REPLICA_STICKY_SHARED:
+        cache.set(_sticky_key(user_id), 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def note_user(user_id):
+    """认证得到用户后调用：最近写入过的用户本次请求只读主库"""
+    state = routing_state_var.get()
+    if state is None or state.user_id == user_id:
+        return
+    state.user_id = user_id
+    if not state.primary and _is_sticky(user_id):
+        state.primary = True
+
+
+class ReplicaSet:
+    """按权重选择可用的副本，连接失败的副本暂停使用 retry_interval 秒"""
+
+    def __init__(self, weights, retry_interval):
+        self.aliases = list(weights)
+        self.weights = [weights[alias] for alias in self.aliases]
+        self.retry_interval = retry_interval
+        self._down_until = {}
+
+    @classmethod
+    def from_settings(cls):
+        weights = {
+            alias: int(options['REPLICA_WEIGHT'])
+            for alias, options in settings.DATABASES.items()
+            if alias != DEFAULT_DB_ALIAS and options.get('REPLICA_WEIGHT')
+        }
+        return cls(weights, settings.DB_REPLICA_RETRY_INTERVAL)
+
+    def is_up(self, alias):
+        return self._down_until.get(alias, 0) <= time.monotonic()
+
+    def mark_down(self, alias):
+        self._down_until[alias] = time.monotonic() + self.retry_interval
+        db_replica_failures.inc((alias,))
+
+    def choose(self):
+        """选择一个可用副本并建立连接，没有可用副本时返回 None"""
+        candidates = [(alias, weight) for alias, weight in zip(self.aliases, self.weights) if self.is_up(alias)]
+        while candidates:
+            index = random.choices(range(len(candidates)), weights=[weight for _, weight in candidates])[0]
+            alias = candidates.pop(index)[0]
+            try:
+                connections[alias].ensure_connection()
+            except PoolTimeout:
+                # 副本连接池已满，本次请求读主库
+                return None
+            except DatabaseError:
+                logger.warning('只读副本 %s 连接失败，%d 秒内不再使用', alias, self.retry_interval, exc_info=True)
+                self.mark_down(alias)
+                continue
+            db_replica_selected.inc((alias,))
+            return alias
+        return None
+
+
+replicas = ReplicaSet.from_settings()
+
+
+class ReplicaRouter:
+    """读查询发往副本、写入发往主库的数据库路由，见模块说明"""
+
+    def db_for_read(self, model, **hints):
+        state = routing_state_var.get()
+        if state is None or state.primary or not replicas.aliases:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # 主库事务中读到的数据要与事务内的写入一致
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = replicas.choose() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state_var.get()
+        if state is not None:
+            state.primary = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本与主库数据相同，跨别名的关联视为同一数据库
+        aliases = {DEFAULT_DB_ALIAS, *replicas.aliases}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由复制同步
+        if db in replicas.aliases:
+            return False
+        return None
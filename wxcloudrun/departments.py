@@ -0,0 +1,80 @@
+"""部门汇总
+
+按月份统计各部门的发薪人数、工资合计和人均，由一条 salaries JOIN employees
+的分组查询完成，部门取员工当前所在部门。结果按月份缓存在进程内，并记录
+月份的版本号（salaries:period:<月份>）：工资单写入、批量导入、月度核算和
+员工调岗都会递增版本号，下次访问时重新查询。
+
+下钻接口按 id 游标分页列出某个部门的员工及其当月工资。
+"""
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .aggregates import SUM_FIELDS
+from .cache import LRUCache
+from .models import Salary
+from .versioning import get_versions, period_scope
+
+# 版本号每次读取都会校验，ttl 只用于淘汰长时间不用的月份
+_rollups = LRUCache(settings.DEPARTMENT_ROLLUP_CACHE_SIZE, 3600)
+
+
+def _amount(value):
+    return float(value or 0)
+
+
+def _summary(headcount, totals):
+    income, deduction, net = (_amount(totals[f]) for f in SUM_FIELDS)
+    return {
+        'headcount': headcount,
+        'totalIncome': income,
+        'totalDeduction': deduction,
+        'totalSalary': net,
+        'avgIncome': round(income / headcount, 2) if headcount else 0,
+        'avgSalary': round(net / headcount, 2) if headcount else 0,
+    }
+
+
+def build_rollup(period):
+    """查询某个月份各部门的汇总，按部门名称排序"""
+    rows = Salary.objects.filter(period=period).values('employee__department').annotate(
+        headcount=Count('id'), **{f: Sum(f) for f in SUM_FIELDS}
+    ).order_by('employee__department')
+
+    departments = []
+    totals = dict.fromkeys(SUM_FIELDS, 0)
+    headcount = 0
+    for row in rows:
+        departments.append(dict(department=row['employee__department'] or '', **_summary(row['headcount'], row)))
+        headcount += row['headcount']
+        for f in SUM_FIELDS:
+            totals[f] += row[f] or 0
+    return {'departments': departments, 'total': _summary(headcount, totals)}
+
+
+def get_rollup(period):
+    """带版本校验的缓存读取"""
+    scope = period_scope(period)
+    versions = get_versions([scope])
+    version = versions[scope][0] if scope in versions else 0
+
+    cached = _rollups.get(period)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    # 先读版本号再查询，查询期间的写入会在下次读取时发现
+    rollup = build_rollup(period)
+    _rollups.set(period, (version, rollup))
+    return rollup
+
+
+def member_salaries(period, employee_ids):
+    """一页员工在该月的工资合计，{employee_id: {...}}"""
+    rows = Salary.objects.filter(period=period, employee_id__in=employee_ids).values('employee_id', *SUM_FIELDS)
+    return {
+        row['employee_id']: {
+            'totalIncome': _amount(row['total_income']),
+            'totalDeduction': _amount(row['total_deduction']),
+            'netSalary': _amount(row['net_salary']),
+        }
+        for row in rows
+    }
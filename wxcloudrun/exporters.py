@@ -0,0 +1,172 @@
+"""流式导出工具
+
+按主键分批读取数据并逐块输出，内存占用与导出行数无关，
+首批数据读出后即可开始返回响应。
+"""
+import csv
+import zipfile
+from decimal import Decimal
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from .models import Salary
+from .payroll import AMOUNT_FIELDS
+
+SALARY_EXPORT_FIELDS = (
+    ('id', 'ID'),
+    ('employee__employee_code', '工号'),
+    ('employee__name', '姓名'),
+    ('employee__department', '部门'),
+    ('period', '月份'),
+) + tuple(
+    (f, str(Salary._meta.get_field(f).verbose_name))
+    for f in AMOUNT_FIELDS + ('total_income', 'total_deduction', 'net_salary')
+) + (
+    ('pay_date', '发放日期'),
+)
+
+EXPORT_TYPES = ('csv', 'xlsx')
+
+# 以这些字符开头的文本会被 Excel 当作公式执行（CSV 公式注入）
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def content_disposition(filename):
+    """附件下载的 Content-Disposition，同时给出 ASCII 的 filename 和 RFC 5987 编码的 filename*"""
+    fallback = filename.encode('ascii', 'replace').decode('ascii').replace('"', '').replace('\\', '')
+    return 'attachment; filename="%s"; filename*=UTF-8\'\'%s' % (fallback, quote(filename, safe=''))
+
+
+def iter_keyset(queryset, fields, chunk_size):
+    """按主键顺序分批读取 values_list
+
+    PyMySQL 默认游标会把整个结果集读入客户端内存，queryset.iterator()
+    在 MySQL 下并不能限制内存，这里按 id 分批查询，每批只取 chunk_size 行。
+    """
+    queryset = queryset.order_by('id').values_list('id', *fields)
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            yield row[1:]
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+class _Buffer:
+    """只写缓冲区，供 csv.writer / zipfile 写入后由生成器取走"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(c.encode('utf-8') if isinstance(c, str) else c for c in self.chunks)
+        self.chunks = []
+        return data
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    # 只处理文本（姓名、部门等员工可修改的字段），负数金额照常输出
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows, flush_every=1000):
+    """逐块生成CSV，带BOM以便Excel正确识别中文；以 = + - @ 等开头的文本前加单引号，避免被当作公式"""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow([_csv_cell(v) for v in row])
+        if i % flush_every == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append('<c/>')
+        elif isinstance(value, (int, float, Decimal)):
+            cells.append('<c><v>%s</v></c>' % value)
+        else:
+            cells.append('<c t="inlineStr"><is><t>%s</t></is></c>' % escape(str(value)))
+    return '<row>%s</row>' % ''.join(cells)
+
+
+def stream_xlsx(header, rows, flush_every=1000):
+    """逐块生成XLSX
+
+    工作表直接写入不可回溯的 zip 流，单元格使用内联字符串，
+    不需要共享字符串表，因此内存占用恒定，无需第三方库。
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _XLSX_RELS)
+        zf.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+            for i, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if i % flush_every == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+        yield buffer.drain()
+    yield buffer.drain()
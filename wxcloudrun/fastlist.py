@@ -0,0 +1,141 @@
+"""列表接口的快速序列化
+
+ModelSerializer 为每一行构造模型实例，再对每一列调用一次字段对象的
+to_representation。列表接口只读，ValuesSerializer 按序列化器的字段
+直接从查询集取 values()，每种列类型预先选好转换函数，按列批量转换，
+输出与序列化器完全一致（键顺序、金额字符串、日期格式、None 的处理），
+配合 FastJSONRenderer 输出。
+
+只支持直接对应模型字段的序列化器字段；出现 SerializerMethodField、
+嵌套序列化器或带点号的 source 时在构造时报错，应继续使用序列化器。
+"""
+import copy
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# 值从数据库取出后与 to_representation 结果相同的字段类型
+_IDENTITY_FIELDS = (fields.CharField, fields.IntegerField, fields.BooleanField, fields.ReadOnlyField)
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.decimal_places is None or field.rounding is not None:
+        return field.to_representation
+    # 按当前上下文的舍入方式保留 decimal_places 位小数，与 quantize 后 '{:f}' 的结果相同
+    return ('{:.%df}' % field.decimal_places).format
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format != '%Y-%m-%d':
+        return field.to_representation
+    # 与 strftime('%Y-%m-%d') 相同，年份小于1000时 strftime 不补零
+    return lambda value: value.isoformat() if value.year >= 1000 else value.strftime(output_format)
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format != '%Y-%m-%d %H:%M:%S' or settings.USE_TZ:
+        return field.to_representation
+    return lambda value: value.isoformat(' ', 'seconds') if value.year >= 1000 else value.strftime(output_format)
+
+
+def get_converter(field):
+    """返回序列化器字段的转换函数，值不需要转换时返回 None"""
+    if isinstance(field, fields.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, fields.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, fields.DateField):
+        return _date_converter(field)
+    if isinstance(field, fields.ChoiceField):
+        # 选项值均为字符串时，to_representation 原样返回
+        return None if all(isinstance(key, str) for key in field.choices) else field.to_representation
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        # values() 取外键列即为主键
+        return None if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """按序列化器的字段定义，把 values() 的结果转换为相同的输出"""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.columns = []
+        self.converters = []
+        # 需要查询但不输出的列，见 select()
+        self.hidden = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if (
+                field.source != name or isinstance(field, (fields.SerializerMethodField, relations.ManyRelatedField))
+                or hasattr(field, 'fields')
+            ):
+                raise ImproperlyConfigured('%s.%s 不是模型字段，不能使用 ValuesSerializer' % (
+                    serializer_class.__name__, name))
+            model._meta.get_field(name)  # 不是模型字段时抛出 FieldDoesNotExist
+            self.columns.append(name)
+            converter = get_converter(field)
+            if converter is not None:
+                self.converters.append((name, converter))
+
+    def select(self, names, required=()):
+        """只输出 names 中的字段，required 中的列（如分页游标字段）一并查询但不输出"""
+        clone = copy.copy(self)
+        clone.columns = [name for name in self.columns if name in names]
+        clone.converters = [(name, convert) for name, convert in self.converters if name in names]
+        clone.hidden = [name for name in required if name not in clone.columns]
+        return clone
+
+    def values(self, queryset):
+        return queryset.values(*self.columns, *self.hidden)
+
+    def serialize(self, rows):
+        """按列转换 values() 的结果（原地修改），返回列表"""
+        rows = list(rows)
+        for name, convert in self.converters:
+            for row in rows:
+                value = row[name]
+                if value is not None:
+                    row[name] = convert(value)
+        for name in self.hidden:
+            for row in rows:
+                del row[name]
+        return rows
+
+
+_values_serializers = {}
+
+
+def get_values_serializer(serializer_class):
+    values_serializer = _values_serializers.get(serializer_class)
+    if values_serializer is None:
+        values_serializer = _values_serializers[serializer_class] = ValuesSerializer(serializer_class)
+    return values_serializer
+
+
+class FastListMixin:
+    """视图集的 list 使用 ValuesSerializer，FAST_LIST_SERIALIZATION 关闭时使用序列化器"""
+
+    def get_values_serializer(self):
+        return get_values_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        values_serializer = self.get_values_serializer()
+        queryset = values_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(queryset))
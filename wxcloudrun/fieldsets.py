@@ -0,0 +1,91 @@
+"""稀疏字段集
+
+列表和详情接口支持 ?fields=period,net_salary 只返回指定字段、?omit=content
+排除指定字段（多个字段以逗号分隔，两者可同时使用）。未选中的列不会出现在
+SQL 中：列表通过 ValuesSerializer 只取 values() 中选中的列，详情通过 only()
+只加载选中的列。分页游标依赖的排序字段会一并查询，但不输出。
+"""
+import functools
+
+from rest_framework.exceptions import ParseError
+
+
+@functools.lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """序列化器中可输出的字段名，按序列化器定义的顺序"""
+    return tuple(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def get_fieldset(query_params, available):
+    """解析 fields / omit 参数，返回要输出的字段名集合；未指定时返回 None"""
+    fields = _split(query_params.get('fields'))
+    omit = _split(query_params.get('omit'))
+    if not fields and not omit:
+        return None
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        raise ParseError('未知字段: %s，可选字段: %s' % (', '.join(sorted(unknown)), ', '.join(available)))
+    selected = (fields or set(available)) - omit
+    if not selected:
+        raise ParseError('至少需要保留一个字段')
+    return selected
+
+
+def prune_serializer(serializer, fieldset):
+    """从序列化器（many=True 时为其 child）中移除未选中的字段"""
+    target = getattr(serializer, 'child', serializer)
+    for name in list(target.fields):
+        if name not in fieldset:
+            target.fields.pop(name)
+    return serializer
+
+
+def ordering_fields(paginator):
+    """分页器排序依赖的字段名，查询时需要一并取出"""
+    return [name.lstrip('-') for name in getattr(paginator, 'ordering', ())]
+
+
+class SparseFieldsMixin:
+    """视图集的 list / retrieve 支持 fields / omit 参数，需放在 FastListMixin 之前"""
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        if self.action not in self.fieldset_actions:
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = get_fieldset(
+                self.request.query_params, readable_fields(self.get_serializer_class())
+            )
+        return self._fieldset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+        serializer_fields = self.get_serializer_class()().fields
+        columns = {serializer_fields[name].source for name in fieldset}
+        if any('.' in column or column == '*' for column in columns):
+            # 字段不直接对应模型列时只在输出中裁剪
+            return queryset
+        if self.action == 'list':
+            columns.update(ordering_fields(self.paginator))
+        return queryset.only(*columns)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            prune_serializer(serializer, fieldset)
+        return serializer
+
+    def get_values_serializer(self):
+        values_serializer = super().get_values_serializer()
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return values_serializer
+        return values_serializer.select(fieldset, ordering_fields(self.paginator))
@@ -0,0 +1,424 @@
+"""批量导入工具
+
+上传文件按行流式读取，分块校验后使用 bulk_create 批量写入，
+整个过程不会把文件一次性读入内存。
+"""
+import codecs
+import csv
+import io
+import json
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .aggregates import apply_headcount_delta, apply_salary_deltas, salary_delta
+from .models import Employee, Salary
+from .passwords import BulkHasher
+from .payroll import AMOUNT_FIELDS, compute_totals, is_valid_period, to_amount
+from .versioning import EMPLOYEES, SALARIES_BULK, bump_versions, period_scope
+
+FILE_TYPES = ('csv', 'jsonl')
+
+
+def detect_file_type(upload, file_type=None):
+    """根据参数或文件扩展名判断文件类型"""
+    if file_type:
+        file_type = file_type.lower()
+    else:
+        name = (getattr(upload, 'name', '') or '').lower()
+        file_type = 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    if file_type not in FILE_TYPES:
+        raise ValueError('不支持的文件类型: %s' % file_type)
+    return file_type
+
+
+# 按顺序尝试的文件编码：Excel 在中文 Windows 上另存的 CSV 为 GBK，用其超集 GB18030 解码
+ENCODINGS = ('utf-8-sig', 'gb18030')
+# 判断编码时读取的文件头字节数
+ENCODING_SNIFF_SIZE = 64 * 1024
+
+
+def detect_encoding(upload):
+    """根据文件开头判断编码，都无法解码时抛出 ValueError"""
+    head = upload.file.read(ENCODING_SNIFF_SIZE)
+    upload.file.seek(0)
+    final = len(head) < ENCODING_SNIFF_SIZE
+    for encoding in ENCODINGS:
+        try:
+            # 未读完时末尾可能截断在多字节字符中间，用增量解码器忽略不完整的结尾
+            codecs.getincrementaldecoder(encoding)().decode(head, final)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    raise ValueError('无法识别文件编码，请保存为UTF-8或GBK编码')
+
+
+def iter_rows(upload, file_type):
+    """逐行读取上传文件，产出 (行号, 行数据, 错误信息)
+
+    编码在调用时即判断，无法识别时抛出 ValueError；文件后部出现无法解码的内容时
+    产出一条错误并停止读取。
+    """
+    return _iter_rows(upload, file_type, detect_encoding(upload))
+
+
+def _iter_rows(upload, file_type, encoding):
+    stream = io.TextIOWrapper(upload.file, encoding=encoding, newline='')
+    line_no = 0
+    try:
+        if file_type == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                # 表头占第 1 行
+                line_no = reader.line_num
+                yield line_no, row, None
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield line_no, None, {'row': 'JSON格式错误'}
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, None, {'row': '每行必须是JSON对象'}
+                    continue
+                yield line_no, row, None
+    except UnicodeDecodeError:
+        yield line_no + 1, None, {'row': '文件中存在无法按%s解码的内容，此处之后的内容未导入' % encoding}
+    finally:
+        # 不关闭底层上传文件，交由 Django 清理
+        stream.detach()
+
+
+def iter_chunks(rows, chunk_size):
+    """将行迭代器按 chunk_size 切块"""
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """导入结果汇总，错误明细最多保留 max_errors 条"""
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.total = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_no, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_no, 'errors': errors})
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+            'errorsTruncated': self.failed > len(self.errors),
+        }
+
+
+class EmployeeImportReport(ImportReport):
+    """员工导入结果；试运行（dry_run）时只校验，valid 为可导入的行数"""
+
+    def __init__(self, max_errors, dry_run=False):
+        super().__init__(max_errors)
+        self.dry_run = dry_run
+        self.valid = 0
+
+    def to_dict(self):
+        return dict(super().to_dict(), dryRun=self.dry_run, valid=self.valid)
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def parse_salary_row(row):
+    """解析并校验单行工资数据，返回 (数据, 错误)"""
+    errors = {}
+    data = {}
+
+    employee_code = _clean(row.get('employee_code'))
+    employee_id = _clean(row.get('employee_id') or row.get('employee'))
+    if employee_code:
+        data['employee_code'] = employee_code
+    elif employee_id.isdigit():
+        data['employee_id'] = int(employee_id)
+    else:
+        errors['employee'] = '缺少工号(employee_code)或员工ID(employee_id)'
+
+    period = _clean(row.get('period'))
+    if not is_valid_period(period):
+        errors['period'] = '月份格式应为YYYY-MM'
+    data['period'] = period
+
+    amounts = {}
+    for field in AMOUNT_FIELDS:
+        try:
+            amounts[field] = to_amount(row.get(field))
+        except ValueError as e:
+            errors[field] = str(e)
+    data['amounts'] = amounts
+
+    # 发放日期可选，与单条新增接口和批量核算一致
+    pay_date = _clean(row.get('pay_date'))
+    data['pay_date'] = None
+    if pay_date:
+        try:
+            data['pay_date'] = parse_date(pay_date)
+        except ValueError:
+            pass
+        if data['pay_date'] is None:
+            errors['pay_date'] = '日期格式应为YYYY-MM-DD'
+
+    if not errors:
+        totals = compute_totals(amounts)
+        try:
+            for value in totals.values():
+                # 复用金额范围校验
+                to_amount(value)
+        except ValueError:
+            errors['net_salary'] = '合计金额超出范围'
+        data['totals'] = totals
+    return data, errors
+
+
+def _import_salary_chunk(chunk, seen, report, batch_size):
+    """校验并写入一个分块，每块只发起固定次数的查询"""
+    parsed = []
+    for row_no, row, error in chunk:
+        report.total += 1
+        if error:
+            report.add_error(row_no, error)
+            continue
+        data, errors = parse_salary_row(row)
+        if errors:
+            report.add_error(row_no, errors)
+            continue
+        parsed.append((row_no, data))
+
+    if not parsed:
+        return
+
+    codes = {d['employee_code'] for _, d in parsed if 'employee_code' in d}
+    ids = {d['employee_id'] for _, d in parsed if 'employee_id' in d}
+    code_to_id = {}
+    # 员工ID -> 部门，同时用于校验员工是否存在和更新汇总表
+    departments = {}
+    if codes:
+        for code, employee_id, department in Employee.objects.filter(
+                employee_code__in=codes).values_list('employee_code', 'id', 'department'):
+            code_to_id[code] = employee_id
+            departments[employee_id] = department
+    if ids:
+        departments.update(Employee.objects.filter(id__in=ids).values_list('id', 'department'))
+
+    resolved = []
+    for row_no, data in parsed:
+        if 'employee_code' in data:
+            employee_id = code_to_id.get(data['employee_code'])
+        else:
+            employee_id = data['employee_id'] if data['employee_id'] in departments else None
+        if employee_id is None:
+            report.add_error(row_no, {'employee': '员工不存在'})
+            continue
+        resolved.append((row_no, employee_id, data))
+
+    if not resolved:
+        return
+
+    existing = set(
+        Salary.objects.filter(
+            employee_id__in={r[1] for r in resolved},
+            period__in={r[2]['period'] for r in resolved},
+        ).values_list('employee_id', 'period')
+    )
+
+    objs = []
+    obj_rows = []
+    for row_no, employee_id, data in resolved:
+        key = (employee_id, data['period'])
+        if key in existing:
+            report.add_error(row_no, {'period': '该员工本月工资单已存在'})
+            continue
+        if key in seen:
+            report.add_error(row_no, {'period': '文件中存在重复的工资单'})
+            continue
+        seen.add(key)
+        obj_rows.append(row_no)
+        objs.append(Salary(
+            employee_id=employee_id,
+            period=data['period'],
+            pay_date=data['pay_date'],
+            **data['amounts'],
+            **data['totals']
+        ))
+
+    if not objs:
+        return
+
+    try:
+        with transaction.atomic():
+            Salary.objects.bulk_create(objs, batch_size=batch_size)
+            apply_salary_deltas((o.period, departments[o.employee_id], salary_delta(o)) for o in objs)
+    except IntegrityError:
+        # 并发写入导致唯一键冲突时，整块回滚并记录
+        for row_no in obj_rows:
+            report.add_error(row_no, {'row': '写入失败，工资单可能已存在'})
+        return
+    report.created += len(objs)
+
+
+def import_salaries(rows, chunk_size=500, batch_size=500, max_errors=1000):
+    """流式导入工资单，返回 ImportReport"""
+    report = ImportReport(max_errors)
+    seen = set()
+    for chunk in iter_chunks(rows, chunk_size):
+        _import_salary_chunk(chunk, seen, report, batch_size)
+    if report.created:
+        # bulk_create 不触发信号，统一递增批量写入的版本号
+        bump_versions(SALARIES_BULK, *{period_scope(period) for _, period in seen})
+    return report
+
+
+# 员工导入的文本字段，长度上限取自模型定义
+EMPLOYEE_TEXT_FIELDS = ('employee_code', 'name', 'department', 'position', 'phone', 'email')
+EMPLOYEE_ROLES = ('employee', 'admin')
+
+
+def parse_employee_row(row):
+    """解析并校验单行员工数据，返回 (数据, 错误)"""
+    errors = {}
+    data = {}
+
+    for field in EMPLOYEE_TEXT_FIELDS:
+        value = _clean(row.get(field))
+        max_length = Employee._meta.get_field(field).max_length
+        if len(value) > max_length:
+            errors[field] = '长度不能超过%d个字符' % max_length
+        data[field] = value
+    if not data['employee_code']:
+        errors['employee_code'] = '缺少工号(employee_code)'
+    if not data['name']:
+        errors['name'] = '缺少姓名(name)'
+    if data['email'] and 'email' not in errors:
+        try:
+            validate_email(data['email'])
+        except ValidationError:
+            errors['email'] = '邮箱格式错误'
+
+    # 密码不去除首尾空格
+    password = row.get('password')
+    password = '' if password is None else str(password)
+    if not password:
+        errors['password'] = '缺少初始密码(password)'
+    elif len(password.encode('utf-8')) > 72:
+        # bcrypt 只接受 72 字节以内的密码
+        errors['password'] = '密码不能超过72个字节'
+    data['password'] = password
+
+    role = _clean(row.get('role')) or 'employee'
+    if role not in EMPLOYEE_ROLES:
+        errors['role'] = '角色应为employee或admin'
+    data['role'] = role
+
+    hire_date = _clean(row.get('hire_date'))
+    data['hire_date'] = None
+    if hire_date:
+        try:
+            data['hire_date'] = parse_date(hire_date)
+        except ValueError:
+            pass
+        if data['hire_date'] is None:
+            errors['hire_date'] = '日期格式应为YYYY-MM-DD'
+    return data, errors
+
+
+def _import_employee_chunk(chunk, seen, report, batch_size, hasher):
+    """校验并写入一个分块：一次查询检查工号重复，密码批量哈希后一次 bulk_create"""
+    parsed = []
+    for row_no, row, error in chunk:
+        report.total += 1
+        if error:
+            report.add_error(row_no, error)
+            continue
+        data, errors = parse_employee_row(row)
+        if errors:
+            report.add_error(row_no, errors)
+            continue
+        parsed.append((row_no, data))
+
+    if not parsed:
+        return
+
+    # 工号同时作为 username，两者都不能与已有账号重复
+    codes = {d['employee_code'] for _, d in parsed}
+    existing = set()
+    for code, username in Employee.objects.filter(
+            Q(employee_code__in=codes) | Q(username__in=codes)).values_list('employee_code', 'username'):
+        existing.update((code, username))
+
+    valid = []
+    for row_no, data in parsed:
+        code = data['employee_code']
+        if code in existing:
+            report.add_error(row_no, {'employee_code': '工号已存在'})
+            continue
+        if code in seen:
+            report.add_error(row_no, {'employee_code': '文件中存在重复的工号'})
+            continue
+        seen.add(code)
+        valid.append((row_no, data))
+
+    report.valid += len(valid)
+    if report.dry_run or not valid:
+        return
+
+    passwords = hasher([data.pop('password') for _, data in valid])
+    objs = [Employee(username=data['employee_code'], password=password, **data)
+            for (_, data), password in zip(valid, passwords)]
+
+    try:
+        with transaction.atomic():
+            Employee.objects.bulk_create(objs, batch_size=batch_size)
+            # bulk_create 不触发信号，按部门汇总后更新人数
+            for department, count in Counter(o.department for o in objs).items():
+                apply_headcount_delta(department, count)
+    except IntegrityError:
+        # 并发写入导致工号冲突时，整块回滚并记录
+        for row_no, _ in valid:
+            report.add_error(row_no, {'row': '写入失败，工号可能已存在'})
+        report.valid -= len(valid)
+        return
+    report.created += len(objs)
+
+
+def import_employees(rows, dry_run=False, chunk_size=1000, batch_size=500, max_errors=1000, workers=1):
+    """流式导入员工，返回 EmployeeImportReport；workers > 1 时初始密码在进程池中并行哈希"""
+    report = EmployeeImportReport(max_errors, dry_run)
+    seen = set()
+    with BulkHasher(workers) as hasher:
+        for chunk in iter_chunks(rows, chunk_size):
+            _import_employee_chunk(chunk, seen, report, batch_size, hasher)
+    if report.created:
+        # 通知各进程的搜索索引按 updated_at 增量同步新员工
+        bump_versions(EMPLOYEES)
+    return report
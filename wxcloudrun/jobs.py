@@ -0,0 +1,327 @@
+"""后台任务队列
+
+耗时较长的管理操作（月度核算、批量导入）由接口写入 jobs 表后立即返回，
+再由 run_worker 命令在独立进程中领取执行，不受请求超时限制，也不需要额外的
+消息队列服务。
+
+- 领取：数据库支持时使用 SELECT ... FOR UPDATE SKIP LOCKED（MySQL 8、PostgreSQL），
+  多个 worker 不会互相等待；否则（SQLite、MySQL 5.7）退回为带状态条件的 UPDATE，
+  更新行数为 1 才算领取成功。
+- 心跳：worker 每 JOB_HEARTBEAT_INTERVAL 秒刷新执行中任务的 heartbeat_at；超过
+  JOB_STALE_TIMEOUT 秒没有心跳的任务视为 worker 已退出，执行次数未达
+  JOB_MAX_ATTEMPTS 时重新排队，否则标记失败。
+- 进度和结果：执行函数通过 progress(已处理数, 总数) 上报进度（每秒最多写一次），
+  返回值作为结果保存；抛出异常时记录错误信息，不自动重试。
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .importers import detect_encoding, detect_file_type, import_employees, import_salaries, iter_rows
+from .models import Job
+from .payroll import is_valid_period, run_payroll
+
+logger = logging.getLogger('log')
+
+# 进度最多每秒写一次数据库
+PROGRESS_INTERVAL = 1
+
+
+def worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+# 任务类型
+
+def _payroll_params(data, upload):
+    period = data.get('period') or timezone.now().strftime('%Y-%m')
+    if not is_valid_period(period):
+        raise ValueError('月份格式应为YYYY-MM')
+    pay_date = data.get('pay_date')
+    if pay_date and parse_date(str(pay_date)) is None:
+        raise ValueError('发放日期格式应为YYYY-MM-DD')
+    return {'period': period, 'pay_date': str(pay_date) if pay_date else None}
+
+
+def _run_payroll(job, progress):
+    pay_date = job.params['pay_date']
+    result = run_payroll(
+        job.params['period'],
+        pay_date=parse_date(pay_date) if pay_date else None,
+        batch_size=settings.PAYROLL_BATCH_SIZE,
+    )
+    progress(result.slips, result.slips)
+    return result.to_dict()
+
+
+def _import_params(data, upload):
+    if upload is None:
+        raise ValueError('请上传文件')
+    if upload.size > settings.JOB_MAX_UPLOAD_SIZE:
+        raise ValueError('文件不能超过%dMB' % (settings.JOB_MAX_UPLOAD_SIZE // (1024 * 1024)))
+    params = {'type': detect_file_type(upload, data.get('type')), 'filename': upload.name}
+    # 提交时即检查编码，无法识别的文件不进入队列
+    detect_encoding(upload)
+    if str(data.get('dryRun', '')).lower() in ('1', 'true'):
+        params['dryRun'] = True
+    return params
+
+
+def _counted(rows, progress):
+    count = 0
+    for item in rows:
+        yield item
+        count += 1
+        progress(count)
+    progress(count, count)
+
+
+def _import_rows(job, progress):
+    upload = ContentFile(bytes(job.payload), name=job.params['filename'])
+    return _counted(iter_rows(upload, job.params['type']), progress)
+
+
+def _run_import_salaries(job, progress):
+    report = import_salaries(
+        _import_rows(job, progress),
+        chunk_size=settings.SALARY_IMPORT_CHUNK_SIZE,
+        batch_size=settings.SALARY_IMPORT_BATCH_SIZE,
+        max_errors=settings.SALARY_IMPORT_MAX_ERRORS,
+    )
+    return report.to_dict()
+
+
+def _run_import_employees(job, progress):
+    report = import_employees(
+        _import_rows(job, progress),
+        dry_run=job.params.get('dryRun', False),
+        chunk_size=settings.EMPLOYEE_IMPORT_CHUNK_SIZE,
+        batch_size=settings.EMPLOYEE_IMPORT_BATCH_SIZE,
+        max_errors=settings.EMPLOYEE_IMPORT_MAX_ERRORS,
+        workers=settings.EMPLOYEE_IMPORT_WORKERS,
+    )
+    return report.to_dict()
+
+
+# 任务类型 -> (参数校验, 执行函数)。参数校验在提交时调用，返回保存到 params 的字典，
+# 不合法时抛出 ValueError；执行函数在 worker 中调用，返回值保存为结果
+JOB_KINDS = {
+    'payroll': (_payroll_params, _run_payroll),
+    'import_salaries': (_import_params, _run_import_salaries),
+    'import_employees': (_import_params, _run_import_employees),
+}
+
+
+def _datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def serialize_job(job, with_result=True):
+    """任务的接口输出；列表不返回结果（导入的错误明细可能较大）"""
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'params': job.params,
+        'progress': job.progress,
+        'total': job.total,
+        'error': job.error,
+        'attempts': job.attempts,
+        'createdBy': job.created_by_id,
+        'createdAt': _datetime(job.created_at),
+        'startedAt': _datetime(job.started_at),
+        'finishedAt': _datetime(job.finished_at),
+    }
+    if with_result:
+        data['result'] = job.result
+    return data
+
+
+# 提交与领取
+
+def submit_job(kind, data, upload=None, user=None):
+    """校验参数并写入任务，不合法时抛出 ValueError"""
+    if not kind:
+        raise ValueError('请指定任务类型(kind)')
+    if kind not in JOB_KINDS:
+        raise ValueError('不支持的任务类型: %s' % kind)
+    params = JOB_KINDS[kind][0](data, upload)
+    payload = b''.join(upload.chunks()) if upload is not None else None
+    return Job.objects.create(
+        kind=kind, params=params, payload=payload, created_by_id=user.id if user is not None else None)
+
+
+def _claim_candidate(worker):
+    """SKIP LOCKED 领取：锁住第一条未被其他 worker 锁定的待执行任务"""
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.PENDING).order_by('id').only('id').first()
+        if job is None:
+            return None
+        _mark_running(Job.objects.filter(pk=job.pk), worker)
+        return job.pk
+
+
+def _claim_conditional(worker, batch=10):
+    """不支持 SKIP LOCKED 时，依次尝试带状态条件的 UPDATE，成功即领取"""
+    ids = Job.objects.filter(status=Job.PENDING).order_by('id').values_list('id', flat=True)[:batch]
+    for pk in ids:
+        if _mark_running(Job.objects.filter(pk=pk, status=Job.PENDING), worker):
+            return pk
+    return None
+
+
+def _mark_running(queryset, worker):
+    now = timezone.now()
+    return queryset.update(
+        status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+
+
+def claim_job(worker):
+    """领取一个待执行任务，返回任务，没有时返回 None"""
+    if connection.features.has_select_for_update_skip_locked:
+        pk = _claim_candidate(worker)
+    else:
+        pk = _claim_conditional(worker)
+    return Job.objects.get(pk=pk) if pk is not None else None
+
+
+def _progress_reporter(job_id):
+    """返回 progress(done, total=None)，距上次写入不足 PROGRESS_INTERVAL 秒时跳过（total 给出时总会写入）"""
+    last = [0.0]
+
+    def progress(done, total=None):
+        now = time.monotonic()
+        if total is None and now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        fields = {'progress': done}
+        if total is not None:
+            fields['total'] = total
+        Job.objects.filter(pk=job_id, status=Job.RUNNING).update(**fields)
+
+    return progress
+
+
+def execute_job(job):
+    """执行已领取的任务并记录结果；任务已被重新排队（心跳超时）时不覆盖状态"""
+    run = JOB_KINDS[job.kind][1]
+    owned = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+    try:
+        result = run(job, _progress_reporter(job.pk))
+    except Exception as e:
+        logger.exception('后台任务 %s 执行失败', job)
+        owned.update(status=Job.FAILED, error=str(e) or e.__class__.__name__, payload=None,
+                     finished_at=timezone.now())
+        return False
+    owned.update(status=Job.SUCCEEDED, result=result, payload=None, finished_at=timezone.now())
+    return True
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """心跳超时的任务重新排队或标记失败，返回 (重新排队数, 失败数)"""
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=settings.JOB_STALE_TIMEOUT),
+    )
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED, error='执行进程已退出，超过最大执行次数', payload=None, finished_at=timezone.now())
+    requeued = stale.filter(attempts__lt=settings.JOB_MAX_ATTEMPTS).update(status=Job.PENDING, worker='')
+    if requeued or failed:
+        logger.warning('心跳超时的后台任务：重新排队 %d 个，失败 %d 个', requeued, failed)
+    return requeued, failed
+
+
+class Worker:
+    """领取并执行任务，最多同时执行 concurrency 个
+
+    每个任务在独立线程中执行，线程各自持有数据库连接，任务结束后关闭。
+    stop() 后不再领取新任务，等待执行中的任务结束后返回。
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, name=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name or worker_name()
+        self.processed = 0
+        self._stopping = threading.Event()
+        # 任务结束或 stop() 时唤醒主循环，不必等满轮询间隔
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _run(self, job):
+        try:
+            execute_job(job)
+        finally:
+            connection.close()
+            with self._lock:
+                del self._running[job.pk]
+                self.processed += 1
+            self._wakeup.set()
+
+    def _start(self, job):
+        thread = threading.Thread(target=self._run, args=(job,), name='job-%d' % job.pk, daemon=True)
+        with self._lock:
+            self._running[job.pk] = thread
+        thread.start()
+
+    def run(self, burst=False):
+        """循环领取任务；burst 为 True 时队列为空且任务全部结束后返回"""
+        last_heartbeat = last_reap = 0.0
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                now = time.monotonic()
+                with self._lock:
+                    running = list(self._running)
+                if now - last_heartbeat >= settings.JOB_HEARTBEAT_INTERVAL:
+                    heartbeat(running)
+                    last_heartbeat = now
+                if now - last_reap >= settings.JOB_HEARTBEAT_INTERVAL:
+                    requeue_stale_jobs()
+                    last_reap = now
+
+                job = None
+                if len(running) < self.concurrency:
+                    job = claim_job(self.name)
+            except DatabaseError:
+                # 数据库暂时不可用时等待后重试，不退出 worker
+                logger.exception('后台任务 worker 访问数据库失败')
+                connection.close()
+                self._wakeup.wait(self.poll_interval)
+                continue
+            if job is not None:
+                logger.info('领取后台任务 %s', job)
+                self._start(job)
+                continue
+            if burst and not running:
+                break
+            self._wakeup.wait(self.poll_interval)
+
+        with self._lock:
+            threads = list(self._running.values())
+        for thread in threads:
+            thread.join()
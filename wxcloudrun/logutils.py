@@ -0,0 +1,287 @@
+"""非阻塞日志
+
+请求线程只把日志记录放入有界队列（QueueLogHandler），由单个后台线程
+（LogListener）成批取出并写入文件和控制台，每批只 flush 一次，
+磁盘或终端变慢时不会拖慢请求。
+
+- 队列有界：超过 LOG_QUEUE_DEBUG_WATERMARK 时丢弃 DEBUG 日志，队列满时丢弃
+  INFO/WARNING 日志，ERROR 及以上最多等待 LOG_QUEUE_ERROR_TIMEOUT 秒；
+  丢弃数量见 dropped_records。
+- 文件按天切换（DailyFileHandler），文件名为 <name>-YYYY-MM-DD.log，
+  按记录产生的日期写入，不重命名文件。文件以 O_APPEND 打开，每条记录用一次
+  write() 整行写入，不经过缓冲区，多个 worker 进程写同一文件时各行不会交错。
+- JsonFormatter 每条日志输出一行 JSON，包含请求ID和 extra 中的字段（如耗时）。
+  设置 max_bytes 时超长的记录截断异常堆栈和消息，使整行不超过管道缓冲区大小
+  （PIPE_BUF，Linux 为 4096 字节），完整内容见控制台输出。
+
+通过 settings.LOGGING_CONFIG 指向 configure_logging 启用：LOGGING 按原样
+交给 dictConfig，之后将各 logger 的 handler 替换为队列。
+"""
+import atexit
+import contextvars
+import copy
+import datetime
+import glob
+import json
+import logging
+import logging.config
+import os
+import queue
+import threading
+from collections import Counter
+
+# 当前请求的ID，由 RequestLogMiddleware 设置
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# 按级别统计因队列压力丢弃的日志数
+dropped_records = Counter()
+
+# LogRecord 自带的属性，其余属性视为 extra 字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id', 'log_targets',
+}
+
+
+# 截断后追加的标记
+TRUNCATED = '...(已截断)'
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON，max_bytes 为整行（含换行符）的字节数上限"""
+
+    def __init__(self, *args, max_bytes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'location': '%s:%s' % (record.filename, record.lineno),
+            'requestId': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        text = json.dumps(data, ensure_ascii=False, default=str)
+        if self.max_bytes:
+            text = self._fit(data, text)
+        return text
+
+    def _fit(self, data, text):
+        # 依次截断堆栈和消息；每个字符至少占一个字节，截掉超出的字节数个字符即可
+        for key in ('exception', 'stack', 'message'):
+            excess = len(text.encode('utf-8')) + 1 - self.max_bytes
+            if excess <= 0:
+                return text
+            value = data.get(key)
+            if not value:
+                continue
+            data[key] = value[:max(0, len(value) - excess - len(TRUNCATED))] + TRUNCATED
+            text = json.dumps(data, ensure_ascii=False, default=str)
+        if len(text.encode('utf-8')) + 1 > self.max_bytes:
+            # extra 字段过长，只保留基本字段
+            base = ('time', 'level', 'logger', 'location', 'requestId', 'message')
+            text = json.dumps({k: data[k] for k in base}, ensure_ascii=False, default=str)
+        return text
+
+
+class DailyFileHandler(logging.Handler):
+    """按日期写入 <prefix>-YYYY-MM-DD.log，并删除超过 backup_days 天的旧文件
+
+    日期取自日志记录本身，跨过零点后的第一条记录触发切换。文件以 O_APPEND 打开，
+    每条记录编码后用一次 os.write() 写入，不使用 Python 的缓冲区。
+    """
+
+    def __init__(self, filename, backup_days=7, encoding='utf-8'):
+        super().__init__()
+        root, self.ext = os.path.splitext(os.path.abspath(filename))
+        self.prefix = root
+        self.backup_days = backup_days
+        self.encoding = encoding
+        self.current_date = datetime.date.today()
+        self.baseFilename = self._path(self.current_date)
+        self.fd = None
+
+    def _path(self, day):
+        return '%s-%s%s' % (self.prefix, day.isoformat(), self.ext)
+
+    def emit(self, record):
+        try:
+            day = datetime.date.fromtimestamp(record.created)
+            if day != self.current_date:
+                self.close_file()
+                self.current_date = day
+                self.baseFilename = self._path(day)
+                self.remove_expired()
+            data = (self.format(record) + '\n').encode(self.encoding)
+            if self.fd is None:
+                self.fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self.fd, data)
+        except Exception:
+            self.handleError(record)
+
+    def remove_expired(self):
+        if self.backup_days <= 0:
+            return
+        oldest = self._path(self.current_date - datetime.timedelta(days=self.backup_days))
+        for path in glob.glob(self.prefix + '-*' + self.ext):
+            # 日期格式固定，按字符串比较即可
+            if path < oldest:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def close_file(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def close(self):
+        self.acquire()
+        try:
+            self.close_file()
+        finally:
+            self.release()
+        super().close()
+
+
+class QueueLogHandler(logging.Handler):
+    """只把日志放入队列的 handler，记录上附带实际写入的 handler 列表"""
+
+    def __init__(self, log_queue, targets, debug_watermark, error_timeout):
+        super().__init__()
+        self.queue = log_queue
+        self.targets = tuple(targets)
+        self.debug_watermark = debug_watermark
+        self.error_timeout = error_timeout
+
+    def prepare(self, record):
+        # 在请求线程中完成格式化，参数可能在入队后被修改
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, 'request_id'):
+            # django.request 的日志在中间件之外记录，从 extra 中的 request 取请求ID
+            request = getattr(record, 'request', None)
+            record.request_id = getattr(request, 'request_id', None) or request_id_var.get()
+        record.log_targets = self.targets
+        return record
+
+    def emit(self, record):
+        if record.levelno <= logging.DEBUG and self.queue.qsize() >= self.debug_watermark:
+            dropped_records[record.levelname] += 1
+            return
+        try:
+            record = self.prepare(record)
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                if record.levelno < logging.ERROR:
+                    dropped_records[record.levelname] += 1
+                    return
+                self.queue.put(record, timeout=self.error_timeout)
+        except queue.Full:
+            dropped_records[record.levelname] += 1
+        except Exception:
+            self.handleError(record)
+
+
+class LogListener:
+    """后台写日志线程：阻塞等待第一条记录，再取出队列中已有的记录成批处理"""
+    _sentinel = None
+
+    def __init__(self, log_queue, batch_size):
+        self.queue = log_queue
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            touched = set()
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    continue
+                for handler in record.log_targets:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                        touched.add(handler)
+            for handler in touched:
+                try:
+                    getattr(handler, 'flush_batch', handler.flush)()
+                except Exception:
+                    pass
+            if stop:
+                return
+
+
+_listener = None
+
+
+def configure_logging(logging_settings):
+    """settings.LOGGING_CONFIG 的入口"""
+    global _listener
+    from django.conf import settings
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if not logging_settings:
+        return
+    logging.config.dictConfig(logging_settings)
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    listener = LogListener(log_queue, settings.LOG_BATCH_SIZE)
+    names = list(logging_settings.get('loggers', {}))
+    loggers = [logging.getLogger(name) for name in names]
+    if 'root' in logging_settings:
+        loggers.append(logging.getLogger())
+    for logger in loggers:
+        targets = [h for h in logger.handlers if not isinstance(h, QueueLogHandler)]
+        if not targets:
+            continue
+        logger.handlers = [QueueLogHandler(
+            log_queue, targets, settings.LOG_QUEUE_DEBUG_WATERMARK, settings.LOG_QUEUE_ERROR_TIMEOUT
+        )]
+    listener.start()
+    _listener = listener
+
+
+@atexit.register
+def _stop_listener():
+    # 进程退出前写完队列中剩余的日志
+    if _listener is not None:
+        _listener.stop()
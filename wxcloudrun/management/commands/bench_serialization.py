@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from wxcloudrun.fastlist import get_values_serializer
+from wxcloudrun.models import Employee, Salary
+from wxcloudrun.renderers import FastJSONRenderer
+from wxcloudrun.serializers import EmployeeSerializer, SalarySerializer
+
+MODELS = {
+    'salary': (Salary, SalarySerializer, ('-created_at', '-id')),
+    'employee': (Employee, EmployeeSerializer, ('id',)),
+}
+
+
+class Command(BaseCommand):
+    help = '对比列表接口的序列化器 + JSONRenderer 与 values() + FastJSONRenderer 的耗时，并校验输出逐字节一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='列表行数')
+        parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+        parser.add_argument('--model', choices=sorted(MODELS), default='salary')
+
+    def handle(self, *args, **options):
+        model, serializer_class, ordering = MODELS[options['model']]
+        queryset = model.objects.order_by(*ordering)[:options['rows']]
+        values_serializer = get_values_serializer(serializer_class)
+        json_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+
+        def baseline():
+            return json_renderer.render(serializer_class(list(queryset), many=True).data)
+
+        def fast():
+            return fast_renderer.render(values_serializer.serialize(values_serializer.values(queryset)))
+
+        expected = baseline()
+        if fast() != expected:
+            raise CommandError('两种方式的输出不一致')
+
+        rows = model.objects.order_by(*ordering)[:options['rows']].count()
+        self.stdout.write(f'{model.__name__} {rows} 行，输出 {len(expected)} 字节，两种方式输出一致')
+        results = {}
+        for name, fn in (('serializer + JSONRenderer', baseline), ('values() + FastJSONRenderer', fast)):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            results[name] = min(timings)
+            self.stdout.write(f'{name:<28} {results[name] * 1000:9.1f} ms')
+
+        base, new = results.values()
+        self.stdout.write(self.style.SUCCESS(f'加速 {base / new:.1f}x'))
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from wxcloudrun.startup import BOOT_ENV, boot_started_at, ensure_admin, pending_migrations
+
+
+class Command(BaseCommand):
+    help = '容器启动入口：有未执行的迁移时才执行 migrate，确保管理员账号存在，然后替换为 gunicorn'
+    # 系统检查在构建和开发时进行，启动时跳过
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-migrate', action='store_true', help='不检查迁移（由发布流程单独执行时）')
+        parser.add_argument('--no-serve', action='store_true', help='只做启动准备，不启动 gunicorn')
+
+    def handle(self, *args, **options):
+        os.environ[BOOT_ENV] = repr(boot_started_at())
+        start = time.perf_counter()
+
+        # 迁移或建账号失败时照常启动（数据库暂时不可用等），由 /health/ 报告未就绪
+        if not options['skip_migrate'] and settings.BOOTSTRAP_MIGRATE:
+            try:
+                pending = pending_migrations(connections['default'])
+                if pending:
+                    self.stdout.write(f'有 {len(pending)} 个未执行的迁移，执行 migrate...')
+                    call_command('migrate', interactive=False, verbosity=options['verbosity'])
+                else:
+                    self.stdout.write('迁移均已执行，跳过 migrate')
+            except Exception as e:
+                self.stderr.write(f'迁移失败，继续启动: {e}')
+
+        try:
+            admin, created = ensure_admin()
+            if created:
+                self.stdout.write(f'已创建默认管理员账号 {admin.employee_code}，请尽快修改密码')
+        except Exception as e:
+            self.stderr.write(f'管理员账号检查失败，继续启动: {e}')
+        connections.close_all()
+
+        self.stdout.write(f'启动准备完成，耗时 {time.perf_counter() - start:.2f} 秒')
+        if options['no_serve']:
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # exec 保持进程号不变（仍为容器的 1 号进程），gunicorn 能直接收到 SIGTERM
+        config = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        os.execv(sys.executable, [
+            sys.executable, '-m', 'gunicorn', '-c', config, 'wxcloudrun.wsgi:application',
+        ])
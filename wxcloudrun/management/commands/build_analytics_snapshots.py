@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wxcloudrun.analytics import build_snapshots
+from wxcloudrun.payroll import is_valid_period
+
+
+class Command(BaseCommand):
+    help = '预先生成工资分析快照（接口访问时也会按需生成），未指定月份时处理所有月份'
+
+    def add_arguments(self, parser):
+        parser.add_argument('periods', nargs='*', help='月份，格式YYYY-MM')
+
+    def handle(self, *args, **options):
+        periods = options['periods'] or None
+        for period in periods or []:
+            if not is_valid_period(period):
+                raise CommandError(f'月份格式应为YYYY-MM: {period}')
+
+        start = time.perf_counter()
+        snapshots = build_snapshots(periods)
+        for snapshot in snapshots:
+            self.stdout.write(f'{snapshot.period}: {snapshot.rows} 行，版本 {snapshot.version}')
+        self.stdout.write(self.style.SUCCESS(
+            f'完成 {len(snapshots)} 个月份，耗时 {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,177 @@
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from wxcloudrun.models import Employee, Job, Notice, PayrollAggregate, Salary
+from wxcloudrun.exporters import SALARY_EXPORT_FIELDS
+from wxcloudrun.pagination import SalaryPagination
+
+
+def query_shapes(employee_id, employee_code, openid, period, department):
+    """各接口实际发出的查询，键为接口名称"""
+    salary_order = ('-created_at', '-id')
+    export_fields = [f for f, _ in SALARY_EXPORT_FIELDS]
+    # 游标分页的后续页：定位到当月最新一条工资单之后
+    latest = Salary.objects.filter(period=period).order_by(*salary_order).first()
+    after_cursor = SalaryPagination().get_position_filter([latest.created_at, latest.id])
+    return {
+        'employees/login': Employee.objects.filter(employee_code=employee_code),
+        'employees/wechat_login': Employee.objects.filter(wechat_openid=openid),
+        'employees/wechat_login(cached)': Employee.objects.filter(pk=employee_id, wechat_openid=openid),
+        'employees/list(admin)': Employee.objects.order_by('id')[:21],
+        'employees/detail': Employee.objects.filter(pk=employee_id),
+        'employees/stats': Salary.objects.filter(employee_id=employee_id, period=period),
+        'salaries/list(admin)': Salary.objects.order_by(*salary_order)[:21],
+        'salaries/list(admin, period)': Salary.objects.filter(period=period).order_by(*salary_order)[:21],
+        'salaries/list(admin, period, cursor)': Salary.objects.filter(period=period).filter(
+            after_cursor).order_by(*salary_order)[:21],
+        'salaries/list(employee)': Salary.objects.filter(employee_id=employee_id).order_by(*salary_order)[:21],
+        'salaries/list(employee, period)': Salary.objects.filter(
+            employee_id=employee_id, period=period).order_by(*salary_order)[:21],
+        'salaries/export': Salary.objects.filter(period=period, id__gt=0).order_by('id').values_list(
+            'id', *export_fields)[:2000],
+        'notices/list': Notice.objects.order_by('-created_at')[:5],
+        'admin/stats': PayrollAggregate.objects.filter(period__in=[period]).values('period').annotate(
+            total=Sum('net_salary')).order_by(),
+        'admin/departments': Salary.objects.filter(period=period).values('employee__department').annotate(
+            total=Sum('net_salary')).order_by('employee__department'),
+        'admin/departments/members': Employee.objects.filter(department=department).order_by('id')[:21],
+        'admin/stats(rebuild period)': Salary.objects.filter(period=period).values(
+            'period', 'employee__department').annotate(total=Sum('net_salary')).order_by(),
+        'jobs/list(status)': Job.objects.filter(status=Job.RUNNING).order_by('-id')[:21],
+        'run_worker(claim)': Job.objects.filter(status=Job.PENDING).order_by('id').values_list('id', flat=True)[:10],
+    }
+
+
+def is_limited_pk_scan(queryset):
+    """按主键排序且带 LIMIT 的查询，顺序读取主键后即停止，不算全表扫描"""
+    query = queryset.query
+    pk_names = {'id', '-id', 'pk', '-pk'}
+    return query.high_mark is not None and bool(query.order_by) and set(query.order_by) <= pk_names
+
+
+def find_full_scans(plan):
+    """从 EXPLAIN 输出中找出全表扫描的表"""
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        scans = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get('access_type') == 'ALL':
+                    scans.append(node.get('table_name'))
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(plan))
+        return scans
+    if vendor == 'postgresql':
+        return [line.split(' on ')[1].split()[0] for line in plan.splitlines() if 'Seq Scan on' in line]
+    # SQLite: "SCAN salaries" 为全表扫描，"SCAN salaries USING INDEX ..." 为按索引顺序扫描
+    scans = []
+    for line in plan.splitlines():
+        words = line.split()
+        if 'SCAN' in words and 'USING' not in words:
+            scans.append(words[-1])
+    return scans
+
+
+def seed(employee_count, months, notice_count):
+    """生成检查用的数据并更新统计信息，返回 query_shapes 的参数"""
+    rng = random.Random(0)
+    Employee.objects.bulk_create([
+        Employee(
+            username=f'E{i:06d}', employee_code=f'E{i:06d}', name=f'员工{i}',
+            department=f'部门{i % 20}', password='!',
+            wechat_openid=f'openid_{i}' if i % 3 == 0 else None,
+        )
+        for i in range(employee_count)
+    ], batch_size=1000)
+    employee_ids = list(Employee.objects.values_list('id', flat=True))
+
+    periods = []
+    month = date(2024, 1, 1)
+    for _ in range(months):
+        periods.append(month.strftime('%Y-%m'))
+        month = (month + timedelta(days=32)).replace(day=1)
+
+    salaries = []
+    for period in periods:
+        for employee_id in employee_ids:
+            base = Decimal(rng.randint(3000, 30000))
+            salaries.append(Salary(
+                employee_id=employee_id, period=period, base_salary=base,
+                total_income=base, net_salary=base,
+            ))
+        Salary.objects.bulk_create(salaries, batch_size=1000)
+        salaries = []
+
+    Notice.objects.bulk_create([
+        Notice(title=f'公告{i}', content='', date=date(2024, 1, 1) + timedelta(days=i))
+        for i in range(notice_count)
+    ], batch_size=1000)
+
+    # 更新统计信息，让优化器基于真实数据量选择执行计划
+    with connection.cursor() as cursor:
+        tables = [Employee._meta.db_table, Salary._meta.db_table, Notice._meta.db_table]
+        if connection.vendor == 'mysql':
+            cursor.execute('ANALYZE TABLE ' + ', '.join(connection.ops.quote_name(t) for t in tables))
+        else:
+            cursor.execute('ANALYZE')
+
+    employee = Employee.objects.filter(wechat_openid__isnull=False).first()
+    return employee.id, employee.employee_code, employee.wechat_openid, periods[-1], employee.department
+
+
+def explain_full_scans(queryset):
+    """执行 EXPLAIN，返回 (全表扫描的表, 执行计划)"""
+    explain_options = {'format': 'json'} if connection.vendor == 'mysql' else {}
+    plan = queryset.explain(**explain_options)
+    return ([] if is_limited_pk_scan(queryset) else find_full_scans(plan)), plan
+
+
+class Command(BaseCommand):
+    help = '在测试库中生成数据，对各接口的查询执行 EXPLAIN，出现全表扫描时失败'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000, help='生成的员工数')
+        parser.add_argument('--months', type=int, default=12, help='每个员工生成的工资单月数')
+        parser.add_argument('--notices', type=int, default=200, help='生成的公告数')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        # 测试库按迁移建表，检查的是生产环境实际的表结构和索引
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            sample = seed(options['employees'], options['months'], options['notices'])
+            failures = self.check_plans(sample, verbosity)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError('以下查询出现全表扫描: %s' % ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('所有查询均命中索引'))
+
+    def check_plans(self, sample, verbosity):
+        failures = []
+        for name, queryset in query_shapes(*sample).items():
+            scans, plan = explain_full_scans(queryset)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'[FULL SCAN] {name}: {", ".join(scans)}'))
+            elif 'TEMP B-TREE' in plan or 'Using filesort' in plan or '"using_filesort": true' in plan:
+                self.stdout.write(self.style.WARNING(f'[SORT] {name}: 命中索引但需要额外排序'))
+            else:
+                self.stdout.write(f'[OK] {name}')
+            if verbosity > 1 or scans:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+        return failures
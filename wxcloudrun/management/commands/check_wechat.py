@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wxcloudrun.wechat import WechatError, WechatUnavailable, get_wechat_client
+
+
+class Command(BaseCommand):
+    help = '检查微信小程序配置：获取 access_token 并调用一次需要令牌的接口'
+
+    def handle(self, *args, **options):
+        client = get_wechat_client()
+        if not client.configured:
+            raise CommandError('未配置 WECHAT_APPID / WECHAT_SECRET')
+        try:
+            ip_list = client.get_api_domain_ip()
+        except (WechatError, WechatUnavailable) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'微信接口可用: access_token 有效, 接口服务器 {len(ip_list)} 个 IP'))
@@ -0,0 +1,175 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wxcloudrun.aggregates import rebuild_aggregates, recent_periods
+from wxcloudrun.models import Employee, Notice, PayProfile, Salary
+from wxcloudrun.passwords import hash_password
+from wxcloudrun.payroll import DEDUCTION_FIELDS, INCOME_FIELDS, from_cents
+from wxcloudrun.versioning import EMPLOYEES, SALARIES_BULK, bump_versions, period_scope
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈'
+GIVEN_CHARS = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华玉萍红娥玲芬燕彬鹏辉斌宇浩凯健俊帆帅旭宁'
+DEPARTMENTS = (
+    '研发部', '产品部', '设计部', '测试部', '运维部', '市场部', '销售部', '客服部', '人事部', '财务部',
+    '行政部', '法务部', '采购部', '质量部', '数据部', '安全部', '培训部', '战略部', '公关部', '物流部',
+)
+POSITIONS = ('专员', '高级专员', '主管', '经理', '高级经理', '总监')
+
+
+class Command(BaseCommand):
+    help = '使用 bulk_create 批量生成压测数据：员工、薪资档案、工资单和公告'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000, help='员工数')
+        parser.add_argument('--months', type=int, default=36, help='截至当月生成的工资单月数')
+        parser.add_argument('--notices', type=int, default=2000, help='公告数')
+        parser.add_argument('--departments', type=int, default=len(DEPARTMENTS), help='部门数')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每次 bulk_create 的行数')
+        parser.add_argument('--prefix', default='B', help='生成的工号前缀，管理员工号为 <prefix>ADMIN')
+        parser.add_argument('--password', default='bench123', help='所有生成账号的密码')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子，相同参数生成相同数据')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if Employee.objects.filter(employee_code__startswith=prefix).exists():
+            raise CommandError(f'已存在工号前缀为 {prefix} 的员工，请使用新的数据库或更换 --prefix')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        departments = [
+            DEPARTMENTS[i % len(DEPARTMENTS)] + ('' if i < len(DEPARTMENTS) else str(i // len(DEPARTMENTS)))
+            for i in range(max(options['departments'], 1))
+        ]
+        # 所有账号共用一个哈希，按当前 BCRYPT_ROUNDS 计算，登录压测的开销与线上一致
+        password = hash_password(options['password'])
+
+        start = time.perf_counter()
+        employees = self.create_employees(prefix, options['employees'], departments, password)
+        self.create_profiles(employees)
+        periods = recent_periods(options['months'])
+        slips = self.create_salaries(employees, periods)
+        self.create_notices(options['notices'])
+
+        self.stdout.write('重建汇总表...')
+        rebuild_aggregates()
+        bump_versions(EMPLOYEES, SALARIES_BULK, *(period_scope(p) for p in periods))
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'生成完成: 员工 {len(employees)}, 工资单 {slips}, 公告 {options["notices"]}, '
+            f'耗时 {elapsed:.1f}s（管理员 {prefix}ADMIN / {options["password"]}）'
+        ))
+
+    def _bulk_create(self, model, objs):
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def create_employees(self, prefix, count, departments, password):
+        rng = self.rng
+        width = max(len(str(count)), 6)
+        batch = [Employee(
+            username=f'{prefix}ADMIN', employee_code=f'{prefix}ADMIN', name='压测管理员',
+            department=departments[0], position='管理员', role='admin', password=password,
+        )]
+        for i in range(count):
+            code = f'{prefix}{i:0{width}d}'
+            batch.append(Employee(
+                username=code,
+                employee_code=code,
+                name=rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 2))),
+                department=rng.choice(departments),
+                position=POSITIONS[min(int(rng.expovariate(1.2)), len(POSITIONS) - 1)],
+                phone='1%010d' % rng.randrange(10 ** 10),
+                email=f'{code.lower()}@example.com',
+                hire_date=date(2015, 1, 1) + timedelta(days=rng.randrange(3650)),
+                wechat_openid=f'bench_openid_{code}' if i % 3 == 0 else None,
+                password=password,
+            ))
+            if len(batch) >= self.batch_size:
+                self._bulk_create(Employee, batch)
+                batch = []
+        if batch:
+            self._bulk_create(Employee, batch)
+
+        # MySQL 下 bulk_create 不回填主键，重新读取
+        employees = list(Employee.objects.filter(
+            employee_code__startswith=prefix, role='employee').order_by('id').values_list('id', 'position'))
+        self.stdout.write(f'员工: {len(employees)}')
+        return employees
+
+    def _profile_cents(self, position):
+        """按职级生成各项固定金额（分）"""
+        rng = self.rng
+        level = POSITIONS.index(position) if position in POSITIONS else 0
+        base = rng.randint(4000, 9000) * (1 + level * 0.6)
+        base = int(base) * 100
+        return {
+            'base_salary': base,
+            'performance_salary': int(base * rng.uniform(0.1, 0.4)) // 100 * 100,
+            'allowance': rng.choice((0, 30000, 50000, 80000)),
+            'social_security': base * 105 // 1000,
+            'housing_fund': base * 70 // 1000,
+            'income_tax': max(0, (base - 500000) * 10 // 100),
+            'other_deduction': 0,
+        }
+
+    def create_profiles(self, employees):
+        self.profiles = {}
+        batch = []
+        for employee_id, position in employees:
+            cents = self._profile_cents(position)
+            self.profiles[employee_id] = cents
+            batch.append(PayProfile(employee_id=employee_id, **{f: from_cents(c) for f, c in cents.items()}))
+            if len(batch) >= self.batch_size:
+                self._bulk_create(PayProfile, batch)
+                batch = []
+        if batch:
+            self._bulk_create(PayProfile, batch)
+        self.stdout.write(f'薪资档案: {len(employees)}')
+
+    def create_salaries(self, employees, periods):
+        rng = self.rng
+        total = 0
+        for period in periods:
+            year, month = map(int, period.split('-'))
+            pay_date = (date(year, month, 28) + timedelta(days=13)).replace(day=10)
+            started = time.perf_counter()
+            batch = []
+            for employee_id, _ in employees:
+                cents = dict(self.profiles[employee_id])
+                cents['overtime_pay'] = rng.choice((0, 0, 0, rng.randint(1, 40) * 5000))
+                cents['bonus'] = rng.randint(5, 30) * 100000 if month == 12 else 0
+                income = sum(cents[f] for f in INCOME_FIELDS)
+                deduction = sum(cents[f] for f in DEDUCTION_FIELDS)
+                batch.append(Salary(
+                    employee_id=employee_id, period=period, pay_date=pay_date,
+                    total_income=from_cents(income), total_deduction=from_cents(deduction),
+                    net_salary=from_cents(income - deduction),
+                    **{f: from_cents(c) for f, c in cents.items()}
+                ))
+                if len(batch) >= self.batch_size:
+                    self._bulk_create(Salary, batch)
+                    batch = []
+            if batch:
+                self._bulk_create(Salary, batch)
+            total += len(employees)
+            rate = len(employees) / (time.perf_counter() - started or 1)
+            self.stdout.write(f'工资单 {period}: {len(employees)} 行，{rate:.0f} 行/秒')
+        return total
+
+    def create_notices(self, count):
+        rng = self.rng
+        first = date.today() - timedelta(days=count)
+        self._bulk_create(Notice, [
+            Notice(
+                title=f'公告{i + 1}：{rng.choice(DEPARTMENTS)}通知',
+                content='这是一条用于压测的公告内容。' * rng.randint(1, 20),
+                date=first + timedelta(days=i),
+            )
+            for i in range(count)
+        ])
+        self.stdout.write(f'公告: {count}')
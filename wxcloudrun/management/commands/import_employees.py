@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from wxcloudrun.importers import detect_file_type, import_employees, iter_rows
+
+
+class Command(BaseCommand):
+    help = '从CSV或JSON Lines文件批量导入员工，初始密码在进程池中并行哈希'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='员工文件（.csv 或 .jsonl，每行一名员工）')
+        parser.add_argument('--type', choices=('csv', 'jsonl'), help='文件类型，默认按扩展名判断')
+        parser.add_argument('--dry-run', action='store_true', help='只校验，不写入数据库')
+        parser.add_argument('--chunk-size', type=int, default=settings.EMPLOYEE_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--batch-size', type=int, default=settings.EMPLOYEE_IMPORT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=settings.EMPLOYEE_IMPORT_WORKERS)
+        parser.add_argument('--max-errors', type=int, default=settings.EMPLOYEE_IMPORT_MAX_ERRORS)
+
+    def handle(self, *args, **options):
+        try:
+            f = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f'无法打开文件: {e}')
+
+        start = time.perf_counter()
+        with File(f) as upload:
+            try:
+                rows = iter_rows(upload, detect_file_type(upload, options['type']))
+            except ValueError as e:
+                raise CommandError(str(e))
+            report = import_employees(
+                rows,
+                dry_run=options['dry_run'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                max_errors=options['max_errors'],
+                workers=options['workers'],
+            )
+        elapsed = time.perf_counter() - start
+
+        for error in report.to_dict()['errors']:
+            self.stderr.write(f'第 {error["row"]} 行: {error["errors"]}')
+        if report.failed > len(report.errors):
+            self.stderr.write(f'另有 {report.failed - len(report.errors)} 行错误未列出')
+
+        if report.dry_run:
+            summary = f'校验完成: 共 {report.total} 行, 可导入 {report.valid}, 错误 {report.failed}, 耗时 {elapsed:.1f}s'
+        else:
+            summary = f'导入完成: 共 {report.total} 行, 新建 {report.created}, 失败 {report.failed}, 耗时 {elapsed:.1f}s'
+        self.stdout.write(self.style.SUCCESS(summary) if not report.failed else self.style.WARNING(summary))
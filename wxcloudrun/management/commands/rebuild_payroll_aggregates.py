@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wxcloudrun.aggregates import rebuild_aggregates
+from wxcloudrun.payroll import is_valid_period
+
+
+class Command(BaseCommand):
+    help = '从工资单明细重建工资汇总表和部门人数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('periods', nargs='*', help='只重建指定月份，如 2024-01；不指定时全部重建')
+
+    def handle(self, *args, **options):
+        periods = options['periods'] or None
+        for period in periods or []:
+            if not is_valid_period(period):
+                raise CommandError(f'月份格式应为YYYY-MM: {period}')
+
+        start = time.perf_counter()
+        rebuild_aggregates(periods)
+        scope = ', '.join(periods) if periods else '全部月份及部门人数'
+        self.stdout.write(self.style.SUCCESS(f'汇总表重建完成（{scope}），耗时 {time.perf_counter() - start:.3f}s'))
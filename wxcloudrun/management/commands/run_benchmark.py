@@ -0,0 +1,86 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from wxcloudrun.benchmark import (
+    SCENARIOS, Context, HttpClient, InProcessClient, run_benchmark, uncovered_routes,
+)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = '对各接口压测，输出吞吐量和 p50/p95/p99 延迟（JSON），数据请先用 generate_data 生成'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='压测已启动的服务，如 http://127.0.0.1:8000；不指定时在进程内调用（不含服务器开销）')
+        parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+        parser.add_argument('--concurrency', type=int, default=4, help='并发线程数')
+        parser.add_argument('--warmup', type=int, default=2, help='每个线程正式计时前的预热请求数')
+        parser.add_argument('--scenario', action='append', help='只运行指定场景，可重复')
+        parser.add_argument('--include-writes', action='store_true', help='同时压测写接口（会写入数据）')
+        parser.add_argument('--password', default='bench123', help='generate_data 使用的密码，用于登录场景')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+        parser.add_argument('--output', help='结果写入的文件，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        scenarios = [s for s in SCENARIOS if options['include_writes'] or not s.write]
+        skipped = [s.name for s in SCENARIOS if s not in scenarios]
+        if options['scenario']:
+            names = {s.name for s in SCENARIOS}
+            unknown = set(options['scenario']) - names
+            if unknown:
+                raise CommandError('未知场景: %s，可选: %s' % (', '.join(sorted(unknown)), ', '.join(sorted(names))))
+            scenarios = [s for s in scenarios if s.name in options['scenario']]
+
+        try:
+            ctx = Context(options['password'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['url']:
+            base_url = options['url']
+            client_factory = lambda: HttpClient(base_url)  # noqa: E731
+        else:
+            client_factory = InProcessClient
+
+        report = run_benchmark(
+            ctx, client_factory, scenarios, options['requests'], options['concurrency'],
+            options['warmup'], options['seed'],
+        )
+        report['meta'] = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'mode': options['url'] or 'in-process',
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'warmup': options['warmup'],
+        }
+        report['skipped'] = skipped
+        # 没有压测场景覆盖的路由，新增接口后应补充场景
+        report['uncovered'] = uncovered_routes()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+            for name, result in report['results'].items():
+                latency = result['latencyMs']
+                self.stdout.write(
+                    f'{name:<28} {result["throughput"]:>9} req/s  p50 {latency["p50"]}ms  '
+                    f'p95 {latency["p95"]}ms  p99 {latency["p99"]}ms  {result["status"]}'
+                )
+            self.stdout.write(self.style.SUCCESS(f'结果已写入 {options["output"]}'))
+        else:
+            self.stdout.write(output)
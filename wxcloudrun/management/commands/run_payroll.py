@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from wxcloudrun.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = '根据薪资档案批量生成指定月份的全员工资单'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', help='月份，如 2024-01')
+        parser.add_argument('--pay-date', help='发放日期，如 2024-02-10')
+        parser.add_argument('--batch-size', type=int, default=settings.PAYROLL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        pay_date = None
+        if options['pay_date']:
+            pay_date = parse_date(options['pay_date'])
+            if pay_date is None:
+                raise CommandError('发放日期格式应为YYYY-MM-DD')
+
+        try:
+            result = run_payroll(
+                options['period'],
+                pay_date=pay_date,
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.period} 工资核算完成: 新建 {result.created}, 更新 {result.updated}, '
+            f'跳过(无薪资档案) {result.skipped}, 金额超出范围 {result.rejected}, 耗时 {result.elapsed:.3f}s, '
+            f'{result.slips_per_sec:.1f} 张/秒'
+        ))
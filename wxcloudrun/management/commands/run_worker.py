@@ -0,0 +1,29 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wxcloudrun.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = '领取并执行后台任务（月度核算、批量导入），收到 SIGTERM/SIGINT 后等待执行中的任务结束再退出'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_CONCURRENCY, help='同时执行的任务数')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--burst', action='store_true', help='队列为空时退出，适合定时任务')
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=max(options['concurrency'], 1), poll_interval=options['poll_interval'])
+
+        def shutdown(signum, frame):
+            self.stdout.write('收到退出信号，等待执行中的任务结束...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(f'worker {worker.name} 已启动，并发数 {worker.concurrency}')
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f'worker {worker.name} 退出，共执行 {worker.processed} 个任务'))
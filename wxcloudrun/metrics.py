@@ -0,0 +1,326 @@
+"""进程内指标，按 Prometheus 文本格式导出
+
+记录指标只是在锁内累加几个整数，格式化输出只在 /metrics 被抓取时进行，
+没有抓取时几乎没有额外开销。
+
+gunicorn 多 worker 时每个进程各自计数。设置 METRICS_MULTIPROC_DIR 后，
+各进程每隔 METRICS_FLUSH_INTERVAL 秒把快照写入该目录，/metrics 合并
+目录中所有进程的数据后输出。worker 退出时 gunicorn 主进程调用
+mark_process_dead()：已退出进程的计数器和直方图继续计入合计（保持单调递增），
+gauge 从快照中删除，不再计入当前值；主进程启动时 clear_snapshots() 清空目录。
+"""
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+# 请求级别的数据库统计，由 MetricsMiddleware 设置
+request_stats_var = contextvars.ContextVar('request_stats', default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STARTUP_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class RequestStats:
+    """单个请求的数据库查询次数和耗时"""
+    __slots__ = ('db_queries', 'db_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: value for labels, value in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def samples(self, values):
+        for labels, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Gauge(Counter):
+    """当前值；多进程合并时对存活进程求和（如各进程的连接数之和）"""
+    type = 'gauge'
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # 每组标签对应 [各桶计数..., +Inf 桶计数, 总和]，桶计数不累加，输出时再累加
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labels)
+            if data is None:
+                data = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[index] += 1
+            data[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(data) for labels, data in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def samples(self, values):
+        for labels, data in sorted(values.items()):
+            base = dict(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data[:-1]):
+                cumulative += count
+                yield self.name + '_bucket', dict(base, le=_format_value(bound)), cumulative
+            yield self.name + '_sum', base, data[-1]
+            yield self.name + '_count', base, cumulative
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {m.name: m.snapshot() for m in self.metrics}
+
+    def render(self, snapshots):
+        """合并多个快照并输出 Prometheus 文本格式"""
+        lines = []
+        for metric in self.metrics:
+            merged = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(metric.name, {}).items():
+                    labels = tuple(labels)
+                    merged[labels] = metric.merge(merged[labels], value) if labels in merged else value
+            lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            for name, labels, value in metric.samples(merged):
+                label_text = ','.join('%s="%s"' % (k, _escape(v)) for k, v in labels.items())
+                lines.append('%s{%s} %s' % (name, label_text, _format_value(value)) if label_text
+                             else '%s %s' % (name, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', '按路由、方法和状态码统计的请求数', ('route', 'method', 'status')))
+http_latency = registry.register(Histogram(
+    'http_request_duration_seconds', '请求处理耗时', ('route', 'method')))
+db_queries = registry.register(Histogram(
+    'http_request_db_queries', '单个请求执行的SQL条数', ('route',), QUERY_COUNT_BUCKETS))
+db_time = registry.register(Histogram(
+    'http_request_db_seconds', '单个请求的SQL总耗时', ('route',)))
+password_hash_time = registry.register(Histogram(
+    'password_hash_duration_seconds', 'bcrypt 计算耗时', ('operation',), HASH_BUCKETS))
+wechat_api_time = registry.register(Histogram(
+    'wechat_api_duration_seconds', '微信接口调用耗时（含重试）', ('api', 'outcome')))
+log_dropped = registry.register(Counter(
+    'log_records_dropped_total', '因日志队列压力丢弃的日志数', ('level',)))
+db_pool_checkouts = registry.register(Counter(
+    'db_pool_checkouts_total', '从连接池取出连接的次数（source 为 reused 或 new）', ('alias', 'source')))
+db_pool_wait_time = registry.register(Histogram(
+    'db_pool_wait_seconds', '连接池已满时等待空闲连接的耗时', ('alias',), POOL_WAIT_BUCKETS))
+db_pool_timeouts = registry.register(Counter(
+    'db_pool_timeouts_total', '等待空闲连接超时的次数', ('alias',)))
+db_pool_closed = registry.register(Counter(
+    'db_pool_connections_closed_total', '连接池关闭的连接数（按原因）', ('alias', 'reason')))
+db_pool_connections = registry.register(Gauge(
+    'db_pool_connections', '连接池中的连接数（open 为已建立，idle 为空闲）', ('alias', 'state')))
+db_replica_selected = registry.register(Counter(
+    'db_replica_selected_total', '请求选中只读副本的次数', ('alias',)))
+db_replica_failures = registry.register(Counter(
+    'db_replica_failures_total', '只读副本连接失败、暂停使用的次数', ('alias',)))
+startup_time = registry.register(Histogram(
+    'startup_duration_seconds', '距容器启动的耗时（ready 为加载完应用，first_response 为返回第一个响应）',
+    ('phase',), STARTUP_BUCKETS))
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper：累计当前请求的SQL条数和耗时"""
+    stats = request_stats_var.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """connection_created 信号：为每个新建的数据库连接挂上计时包装"""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def connect_signals():
+    connection_created.connect(install_db_wrapper, dispatch_uid='metrics_db_wrapper')
+
+
+def record_request(route, method, status, latency, stats):
+    http_requests.inc((route, method, str(status)))
+    http_latency.observe((route, method), latency)
+    db_queries.observe((route,), stats.db_queries)
+    db_time.observe((route,), stats.db_time)
+
+
+def _process_snapshot():
+    from .dbpool.pool import pool_stats
+    from .logutils import dropped_records
+
+    for alias, stats in pool_stats().items():
+        for state, count in stats.items():
+            db_pool_connections.set((alias, state), count)
+    snapshot = registry.snapshot()
+    # 日志丢弃数由 logutils 自行计数，这里转换为指标
+    snapshot[log_dropped.name] = {(level,): count for level, count in dropped_records.items()}
+    return snapshot
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, 'metrics-%s.json' % pid)
+
+
+def write_snapshot(directory):
+    snapshot = {
+        name: [[list(labels), value] for labels, value in values.items()]
+        for name, values in _process_snapshot().items()
+    }
+    path = _snapshot_path(directory, os.getpid())
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def mark_process_dead(directory, pid):
+    """进程退出后从其快照中删除 gauge，计数器和直方图保留"""
+    path = _snapshot_path(directory, pid)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    gauges = {m.name for m in registry.metrics if m.type == 'gauge'}
+    data = {name: items for name, items in data.items() if name not in gauges}
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def clear_snapshots(directory):
+    """删除上次运行留下的快照，服务启动时（worker 启动前）调用"""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _read_snapshots(directory):
+    snapshots = []
+    own = _snapshot_path(directory, os.getpid())
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snapshots.append({name: {tuple(labels): value for labels, value in items} for name, items in data.items()})
+    return snapshots
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_loop(directory, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot(directory)
+        except OSError:
+            pass
+
+
+def ensure_flusher():
+    """多进程模式下启动定时写快照的线程（每个进程一个）"""
+    global _flusher
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory or (_flusher is not None and _flusher[0] == os.getpid()):
+        return
+    with _flusher_lock:
+        if _flusher is not None and _flusher[0] == os.getpid():
+            return
+        os.makedirs(directory, exist_ok=True)
+        thread = threading.Thread(
+            target=_flush_loop, args=(directory, settings.METRICS_FLUSH_INTERVAL),
+            name='metrics-flush', daemon=True,
+        )
+        thread.start()
+        _flusher = (os.getpid(), thread)
+
+
+def render_metrics():
+    snapshots = [_process_snapshot()]
+    if settings.METRICS_MULTIPROC_DIR:
+        snapshots += _read_snapshots(settings.METRICS_MULTIPROC_DIR)
+    return registry.render(snapshots)
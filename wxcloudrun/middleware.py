@@ -0,0 +1,194 @@
+import gzip
+import logging
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .dbrouter import RoutingState, mark_sticky, replicas, routing_state_var
+from .logutils import request_id_var
+from .metrics import RequestStats, ensure_flusher, record_request, request_stats_var
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只使用 gzip
+    brotli = None
+
+access_logger = logging.getLogger('access')
+
+# 只接受调用方传入的合法请求ID，避免日志注入
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class HookMiddleware:
+    """中间件基类：子类实现 start(request) 返回状态，finish(request, response, state)
+    在得到响应后调用，end(state) 无论是否出错都会调用。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(request, response, state)
+            return response
+        finally:
+            self.end(state)
+
+    def start(self, request):
+        return None
+
+    def finish(self, request, response, state):
+        pass
+
+    def end(self, state):
+        pass
+
+
+class RequestLogMiddleware(HookMiddleware):
+    """为每个请求分配请求ID，并在结束时记录一条访问日志（含耗时）"""
+
+    def start(self, request):
+        request_id = request.META.get('HTTP_X_REQUEST_ID', '')
+        if not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return request_id_var.set(request_id), time.perf_counter()
+
+    def finish(self, request, response, state):
+        latency_ms = round((time.perf_counter() - state[1]) * 1000, 2)
+        response['X-Request-ID'] = request.request_id
+        access_logger.info(
+            '%s %s %s %.2fms', request.method, request.path, response.status_code, latency_ms,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'latencyMs': latency_ms,
+            },
+        )
+
+    def end(self, state):
+        request_id_var.reset(state[0])
+
+
+class MetricsMiddleware(HookMiddleware):
+    """按路由记录请求耗时、状态码和SQL条数/耗时，见 wxcloudrun/metrics.py"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        ensure_flusher()
+
+    def start(self, request):
+        stats = RequestStats()
+        return request_stats_var.set(stats), stats, time.perf_counter()
+
+    def finish(self, request, response, state):
+        _, stats, start = state
+        match = getattr(request, 'resolver_match', None)
+        # 以视图名作为路由标签（如 salary-list），未匹配的路径归为一类，避免标签数量失控
+        route = match.view_name if match is not None else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - start, stats)
+
+    def end(self, state):
+        request_stats_var.reset(state[0])
+
+
+class ReplicaRoutingMiddleware(HookMiddleware):
+    """为每个请求设置读写分离的路由状态，写入过的用户短时间内只读主库，见 wxcloudrun/dbrouter.py"""
+
+    def __init__(self, get_response):
+        if not replicas.aliases:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def start(self, request):
+        state = RoutingState(primary=request.method not in ('GET', 'HEAD'))
+        return routing_state_var.set(state), state
+
+    def finish(self, request, response, state):
+        routing = state[1]
+        if routing.wrote and routing.user_id is not None:
+            mark_sticky(routing.user_id)
+
+    def end(self, state):
+        routing_state_var.reset(state[0])
+
+
+_COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+def parse_accept_encoding(header):
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    encodings = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def choose_encoding(header):
+    """按客户端的 q 值选择 br 或 gzip，同等时优先 br；都不接受时返回 None"""
+    accepted = parse_accept_encoding(header)
+    default = accepted.get('*', 0.0)
+    candidates = [('gzip', accepted.get('gzip', default))]
+    if brotli is not None:
+        candidates.insert(0, ('br', accepted.get('br', default)))
+    name, q = max(candidates, key=lambda item: item[1])
+    return name if q > 0 else None
+
+
+class CompressionMiddleware(HookMiddleware):
+    """对超过 COMPRESSION_MIN_SIZE 字节的文本类响应进行 br / gzip 压缩
+
+    流式响应（如工资单导出）不压缩。压缩后强 ETag 改为弱 ETag，
+    条件请求按弱比较匹配，304 仍然有效。
+    """
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def finish(self, request, response, state):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return
+        if not response.get('Content-Type', '').startswith(_COMPRESSIBLE_TYPES):
+            return
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        if len(compressed) >= len(response.content):
+            return
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='基本工资')),
+                ('performance_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='绩效工资')),
+                ('allowance', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='补贴')),
+                ('social_security', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='社保')),
+                ('housing_fund', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='公积金')),
+                ('income_tax', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='个税')),
+                ('other_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='其他扣除')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('employee', models.OneToOneField(on_delete=models.deletion.CASCADE, related_name='pay_profile', to=settings.AUTH_USER_MODEL, verbose_name='员工')),
+            ],
+            options={
+                'verbose_name': '薪资档案',
+                'verbose_name_plural': '薪资档案',
+                'db_table': 'pay_profiles',
+            },
+        ),
+    ]
@@ -0,0 +1,159 @@
+from django.conf import settings
+import django.contrib.auth.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_usernames(apps, schema_editor):
+    """已有员工以工号作为用户名（与 create_admin、批量导入一致）"""
+    Employee = apps.get_model('wxcloudrun', 'Employee')
+    Employee.objects.filter(username__isnull=True).update(username=models.F('employee_code'))
+
+
+# 先使迁移状态与 models.py 一致（0001 缺少 AbstractUser 的 username 等字段，若干字段的可空性、
+# 长度与模型不同），再按各接口的实际查询添加索引。username 先以可空列加入，用工号填充后再加
+# 唯一约束；原先可空的文本字段改为非空时，已有的 NULL 更新为空字符串。
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0002_payprofile'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notice',
+            options={'verbose_name': '公告', 'verbose_name_plural': '公告'},
+        ),
+        migrations.AlterModelOptions(
+            name='salary',
+            options={'verbose_name': '工资单', 'verbose_name_plural': '工资单'},
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='username',
+            field=models.CharField(max_length=150, null=True),
+        ),
+        migrations.RunPython(fill_usernames, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='employee',
+            name='username',
+            field=models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='first_name',
+            field=models.CharField(blank=True, max_length=150, verbose_name='first name'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='last_name',
+            field=models.CharField(blank=True, max_length=150, verbose_name='last name'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='date_joined',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='avatar_url',
+            field=models.URLField(blank=True, default='', verbose_name='头像URL'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='department',
+            field=models.CharField(blank=True, max_length=50, verbose_name='部门'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='email',
+            field=models.EmailField(blank=True, default='', max_length=254, verbose_name='邮箱'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='hire_date',
+            field=models.DateField(blank=True, null=True, verbose_name='入职日期'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='is_active',
+            field=models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='password',
+            field=models.CharField(max_length=255, verbose_name='密码'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='phone',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='联系电话'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='position',
+            field=models.CharField(blank=True, max_length=50, verbose_name='职位'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='role',
+            field=models.CharField(default='employee', max_length=20, verbose_name='角色'),
+        ),
+        migrations.AlterField(
+            model_name='notice',
+            name='content',
+            field=models.TextField(blank=True, verbose_name='内容'),
+        ),
+        migrations.AlterField(
+            model_name='notice',
+            name='date',
+            field=models.DateField(verbose_name='日期'),
+        ),
+        migrations.AlterField(
+            model_name='salary',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='员工'),
+        ),
+        migrations.AlterField(
+            model_name='salary',
+            name='pay_date',
+            field=models.DateField(blank=True, null=True, verbose_name='发放日期'),
+        ),
+        migrations.AlterField(
+            model_name='salary',
+            name='period',
+            field=models.CharField(max_length=10, verbose_name='月份'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salary',
+            unique_together={('employee', 'period')},
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['wechat_openid'], name='employees_openid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['period', '-created_at', '-id'], name='salaries_period_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['period', 'net_salary'], name='salaries_period_net_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['employee', '-created_at', '-id'], name='salaries_emp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['-created_at', '-id'], name='salaries_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['-created_at'], name='notices_created_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+SUM_FIELDS = ('total_income', 'total_deduction', 'net_salary')
+
+
+def populate_aggregates(apps, schema_editor):
+    """根据已有数据初始化汇总表"""
+    Employee = apps.get_model('wxcloudrun', 'Employee')
+    Salary = apps.get_model('wxcloudrun', 'Salary')
+    PayrollAggregate = apps.get_model('wxcloudrun', 'PayrollAggregate')
+    DepartmentHeadcount = apps.get_model('wxcloudrun', 'DepartmentHeadcount')
+
+    rows = Salary.objects.values('period', 'employee__department').annotate(
+        slip_count=Count('id'), **{f: Sum(f) for f in SUM_FIELDS}
+    ).order_by()
+    PayrollAggregate.objects.bulk_create([
+        PayrollAggregate(
+            period=row['period'], department=row['employee__department'] or '',
+            slip_count=row['slip_count'], **{f: row[f] for f in SUM_FIELDS}
+        )
+        for row in rows
+    ])
+    DepartmentHeadcount.objects.bulk_create([
+        DepartmentHeadcount(department=row['department'] or '', headcount=row['headcount'])
+        for row in Employee.objects.values('department').annotate(headcount=Count('id')).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0004_resourceversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=10, verbose_name='月份')),
+                ('department', models.CharField(blank=True, max_length=50, verbose_name='部门')),
+                ('slip_count', models.IntegerField(default=0, verbose_name='工资单数')),
+                ('total_income', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='总收入')),
+                ('total_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='总扣除')),
+                ('net_salary', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='实发工资')),
+            ],
+            options={
+                'verbose_name': '工资汇总',
+                'verbose_name_plural': '工资汇总',
+                'db_table': 'payroll_aggregates',
+                'unique_together': {('period', 'department')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DepartmentHeadcount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, max_length=50, unique=True, verbose_name='部门')),
+                ('headcount', models.IntegerField(default=0, verbose_name='人数')),
+            ],
+            options={
+                'verbose_name': '部门人数',
+                'verbose_name_plural': '部门人数',
+                'db_table': 'department_headcounts',
+            },
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
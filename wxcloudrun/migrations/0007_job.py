@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wxcloudrun', '0006_employee_department_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='任务类型')),
+                ('status', models.CharField(default='pending', max_length=20, verbose_name='状态')),
+                ('params', models.JSONField(default=dict, verbose_name='参数')),
+                ('payload', models.BinaryField(null=True, verbose_name='上传文件')),
+                ('progress', models.IntegerField(default=0, verbose_name='已处理数')),
+                ('total', models.IntegerField(null=True, verbose_name='总数')),
+                ('result', models.JSONField(null=True, verbose_name='结果')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('attempts', models.IntegerField(default=0, verbose_name='执行次数')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='执行进程')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(null=True, verbose_name='开始时间')),
+                ('heartbeat_at', models.DateTimeField(null=True, verbose_name='心跳时间')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='结束时间')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'db_table': 'jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'id'], name='jobs_status_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-import bcrypt
+
+from .passwords import hash_password, verify_password
 
 
 class Employee(AbstractUser):
@@ -24,17 +25,23 @@ class Employee(AbstractUser):
         db_table = 'employees'
         verbose_name = '员工'
         verbose_name_plural = '员工'
+        indexes = [
+            # 微信登录按 openid 查找员工
+            models.Index(fields=['wechat_openid'], name='employees_openid_idx'),
+            # 部门下钻按部门筛选，按 id 游标分页
+            models.Index(fields=['department', 'id'], name='employees_dept_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.employee_code})"
 
     def set_password(self, raw_password):
-        """设置密码（使用bcrypt加密）"""
-        self.password = bcrypt.hashpw(raw_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """设置密码（使用bcrypt加密，cost由BCRYPT_ROUNDS配置）"""
+        self.password = hash_password(raw_password)
 
     def check_password(self, raw_password):
         """验证密码"""
-        return bcrypt.checkpw(raw_password.encode('utf-8'), self.password.encode('utf-8'))
+        return verify_password(raw_password, self.password)
 
     def to_dict(self):
         """转换为字典（排除密码）"""
@@ -80,6 +87,16 @@ class Salary(models.Model):
         verbose_name = '工资单'
         verbose_name_plural = '工资单'
         unique_together = ('employee', 'period')
+        indexes = [
+            # 管理员按月份筛选工资单列表，按创建时间倒序
+            models.Index(fields=['period', '-created_at', '-id'], name='salaries_period_created_idx'),
+            # 全局统计按月份汇总实发工资（覆盖索引，无需回表）
+            models.Index(fields=['period', 'net_salary'], name='salaries_period_net_idx'),
+            # 员工查看自己的工资单，按创建时间倒序
+            models.Index(fields=['employee', '-created_at', '-id'], name='salaries_emp_created_idx'),
+            # 管理员不带筛选条件的工资单列表
+            models.Index(fields=['-created_at', '-id'], name='salaries_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.name} - {self.period}"
@@ -107,6 +124,27 @@ class Salary(models.Model):
         }
 
 
+class PayProfile(models.Model):
+    """薪资档案：员工每月固定的工资构成，用于批量生成工资单"""
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, related_name='pay_profile', verbose_name='员工')
+    base_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='基本工资')
+    performance_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='绩效工资')
+    allowance = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='补贴')
+    social_security = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='社保')
+    housing_fund = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='公积金')
+    income_tax = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='个税')
+    other_deduction = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='其他扣除')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'pay_profiles'
+        verbose_name = '薪资档案'
+        verbose_name_plural = '薪资档案'
+
+    def __str__(self):
+        return f"{self.employee_id} 薪资档案"
+
+
 class Notice(models.Model):
     """公告模型"""
     title = models.CharField(max_length=200, verbose_name='标题')
@@ -118,6 +156,10 @@ class Notice(models.Model):
         db_table = 'notices'
         verbose_name = '公告'
         verbose_name_plural = '公告'
+        indexes = [
+            # 公告列表按创建时间倒序取最新几条
+            models.Index(fields=['-created_at'], name='notices_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -131,3 +173,89 @@ class Notice(models.Model):
             'date': self.date.strftime('%Y-%m-%d'),
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
         }
+
+
+class ResourceVersion(models.Model):
+    """资源版本号，数据变更时递增，用于生成 ETag"""
+    scope = models.CharField(max_length=100, unique=True, verbose_name='资源范围')
+    version = models.BigIntegerField(default=0, verbose_name='版本号')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'resource_versions'
+        verbose_name = '资源版本'
+        verbose_name_plural = '资源版本'
+
+    def __str__(self):
+        return f"{self.scope}@{self.version}"
+
+
+class PayrollAggregate(models.Model):
+    """工资汇总表：按月份和部门汇总工资单，随工资单写入增量维护"""
+    period = models.CharField(max_length=10, verbose_name='月份')
+    department = models.CharField(max_length=50, blank=True, verbose_name='部门')
+    slip_count = models.IntegerField(default=0, verbose_name='工资单数')
+    total_income = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='总收入')
+    total_deduction = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='总扣除')
+    net_salary = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='实发工资')
+
+    class Meta:
+        db_table = 'payroll_aggregates'
+        verbose_name = '工资汇总'
+        verbose_name_plural = '工资汇总'
+        unique_together = ('period', 'department')
+
+    def __str__(self):
+        return f"{self.period} {self.department}"
+
+
+class DepartmentHeadcount(models.Model):
+    """部门人数，随员工增删和调岗增量维护"""
+    department = models.CharField(max_length=50, unique=True, blank=True, verbose_name='部门')
+    headcount = models.IntegerField(default=0, verbose_name='人数')
+
+    class Meta:
+        db_table = 'department_headcounts'
+        verbose_name = '部门人数'
+        verbose_name_plural = '部门人数'
+
+    def __str__(self):
+        return f"{self.department} {self.headcount}"
+
+
+class Job(models.Model):
+    """后台任务：由 run_worker 命令领取执行，接口提交后轮询状态"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    kind = models.CharField(max_length=50, verbose_name='任务类型')
+    status = models.CharField(max_length=20, default=PENDING, verbose_name='状态')
+    params = models.JSONField(default=dict, verbose_name='参数')
+    # 导入任务的上传文件，任务结束后清空
+    payload = models.BinaryField(null=True, verbose_name='上传文件')
+    progress = models.IntegerField(default=0, verbose_name='已处理数')
+    total = models.IntegerField(null=True, verbose_name='总数')
+    result = models.JSONField(null=True, verbose_name='结果')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    attempts = models.IntegerField(default=0, verbose_name='执行次数')
+    worker = models.CharField(max_length=100, blank=True, verbose_name='执行进程')
+    created_by = models.ForeignKey(
+        Employee, null=True, on_delete=models.SET_NULL, related_name='+', verbose_name='提交人')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, verbose_name='开始时间')
+    heartbeat_at = models.DateTimeField(null=True, verbose_name='心跳时间')
+    finished_at = models.DateTimeField(null=True, verbose_name='结束时间')
+
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        indexes = [
+            # 领取任务按状态筛选、按 id 先进先出
+            models.Index(fields=['status', 'id'], name='jobs_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}#{self.id} {self.status}"
@@ -0,0 +1,118 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """键集（游标）分页
+
+    按 ordering 中的字段组合定位上一页最后一行，下一页的条件展开为
+    WHERE a < x OR (a = x AND b < y)（Django 3.2 没有行值比较的查询表达式），
+    MySQL 按范围访问走索引定位，任意页的开销与第一页相同。
+    ordering 的最后一个字段必须唯一（通常为 id），以保证游标稳定。
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = '无效的游标'
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position = self.decode_cursor(encoded, queryset.model)
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def _fields(self):
+        return [(f.lstrip('-'), f.startswith('-')) for f in self.ordering]
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return [item[name] for name, _ in self._fields()]
+        return [getattr(item, name) for name, _ in self._fields()]
+
+    def get_position_filter(self, position):
+        """构造严格位于游标之后的条件：a < x OR (a = x AND b < y) ……（升序字段为 >）"""
+        condition = Q()
+        fields = self._fields()
+        for i, (name, descending) in enumerate(fields):
+            lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+            clause = Q(**{lookup: position[i]})
+            for j in range(i):
+                clause &= Q(**{fields[j][0]: position[j]})
+            condition |= clause
+        return condition
+
+    def encode_cursor(self, position):
+        data = json.dumps([str(v) for v in position], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, encoded, model):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            fields = self._fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, values)]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class SalaryPagination(KeysetPagination):
+    """工资单分页：按创建时间倒序"""
+    ordering = ('-created_at', '-id')
+
+
+class EmployeePagination(KeysetPagination):
+    """员工分页：按ID正序"""
+    ordering = ('id',)
@@ -0,0 +1,134 @@
+"""密码哈希工具
+
+bcrypt 计算是 CPU 密集操作。登录时的校验统一提交到有界线程池执行
+（bcrypt 计算期间会释放 GIL），同时运行和排队的数量都有上限，
+超出时快速失败，避免登录高峰把所有请求线程和 CPU 都占满。
+
+批量导入员工时需要为每人计算一次初始密码的哈希，由 BulkHasher 分发到进程池。
+进程池只在 import_employees 命令和后台任务 worker 中创建，Web 进程内的导入逐个哈希。
+"""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import bcrypt
+from django.conf import settings
+
+from .metrics import password_hash_time
+
+
+class HashingBusy(Exception):
+    """哈希线程池已满"""
+
+
+def hash_password(raw_password, rounds=None):
+    start = time.perf_counter()
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(raw_password.encode('utf-8'), salt).decode('utf-8')
+    password_hash_time.observe(('hash',), time.perf_counter() - start)
+    return hashed
+
+
+def verify_password(raw_password, hashed):
+    if not hashed:
+        return False
+    start = time.perf_counter()
+    try:
+        return bcrypt.checkpw(raw_password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        # 非 bcrypt 格式的历史密码
+        return False
+    finally:
+        password_hash_time.observe(('verify',), time.perf_counter() - start)
+
+
+def get_rounds(hashed):
+    """从 $2b$12$... 格式的哈希中取出 cost"""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return get_rounds(hashed) != settings.BCRYPT_ROUNDS
+
+
+class HashingPool:
+    """有界的哈希线程池
+
+    workers 个线程并发计算，最多再排队 max_pending 个任务；
+    获取名额超过 wait_timeout 秒即抛出 HashingBusy。
+    """
+
+    def __init__(self, workers, max_pending, wait_timeout):
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HashingBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    settings.PASSWORD_HASH_WORKERS,
+                    settings.PASSWORD_HASH_MAX_PENDING,
+                    settings.PASSWORD_HASH_WAIT_TIMEOUT,
+                )
+    return _pool
+
+
+def hash_passwords(raw_passwords, rounds):
+    """逐个计算哈希，供进程池中的子进程调用（不访问 Django 设置和指标）"""
+    return [
+        bcrypt.hashpw(raw.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        for raw in raw_passwords
+    ]
+
+
+class BulkHasher:
+    """批量哈希初始密码
+
+    workers > 1 时把每批密码平均切分给 workers 个进程，进程池在第一批
+    需要并行时创建、在 close() 时关闭，多批之间复用。
+    """
+
+    def __init__(self, workers, rounds=None):
+        self.workers = workers
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self._executor = None
+
+    def __call__(self, raw_passwords):
+        if self.workers > 1 and len(raw_passwords) > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            size = -(-len(raw_passwords) // self.workers)
+            parts = [raw_passwords[i:i + size] for i in range(0, len(raw_passwords), size)]
+            return [h for part in self._executor.map(hash_passwords, parts, repeat(self.rounds)) for h in part]
+        return hash_passwords(raw_passwords, self.rounds)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
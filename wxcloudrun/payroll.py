@@ -0,0 +1,296 @@
+"""工资计算工具
+
+所有金额统一使用 Decimal 精确计算，保留两位小数，避免浮点误差。
+批量计算时金额转换为整数"分"按列运算（安装 numpy 时使用 numpy），结果与 Decimal 完全一致。
+"""
+import functools
+import logging
+import re
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import IntegrityError, connection, transaction
+
+from .aggregates import rebuild_aggregates
+from .models import Employee, PayProfile, Salary
+from .versioning import SALARIES_BULK, bump_versions, period_scope
+
+logger = logging.getLogger('log')
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+    """首次用到时再导入 numpy（导入耗时约占 worker 启动的一成，只有核算和工资分析用到），未安装时返回 None"""
+    try:
+        import numpy
+    except ImportError:  # numpy 为可选依赖，缺失时退化为纯 Python 列运算
+        return None
+    return numpy
+
+
+# 收入项
+INCOME_FIELDS = (
+    'base_salary', 'performance_salary', 'overtime_pay', 'bonus', 'allowance',
+)
+# 扣除项
+DEDUCTION_FIELDS = (
+    'social_security', 'housing_fund', 'income_tax', 'other_deduction',
+)
+AMOUNT_FIELDS = INCOME_FIELDS + DEDUCTION_FIELDS
+
+CENT = Decimal('0.01')
+# DecimalField(max_digits=10, decimal_places=2) 可容纳的最大值
+MAX_AMOUNT = Decimal('99999999.99')
+
+# 核算期间其他写入插入了同一员工同月的工资单（唯一键冲突）时，整月重新核算的最多次数
+PAYROLL_MAX_ATTEMPTS = 3
+
+PERIOD_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def to_amount(value):
+    """将输入转换为两位小数的 Decimal，空值视为 0，非法值抛出 ValueError"""
+    if value is None or value == '':
+        return Decimal('0.00')
+    if isinstance(value, float):
+        # 先转字符串，避免 Decimal(0.1) 带出二进制误差
+        value = repr(value)
+    try:
+        amount = Decimal(str(value).strip()).quantize(CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        raise ValueError('金额格式错误')
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        raise ValueError('金额超出范围')
+    return amount
+
+
+def compute_totals(amounts):
+    """根据各收入/扣除项计算总收入、总扣除和实发工资
+
+    amounts 为 {字段名: Decimal}，缺失的字段按 0 处理。
+    """
+    total_income = sum((amounts.get(f, Decimal('0.00')) for f in INCOME_FIELDS), Decimal('0.00'))
+    total_deduction = sum((amounts.get(f, Decimal('0.00')) for f in DEDUCTION_FIELDS), Decimal('0.00'))
+    return {
+        'total_income': total_income,
+        'total_deduction': total_deduction,
+        'net_salary': total_income - total_deduction,
+    }
+
+
+def is_valid_period(period):
+    """月份格式校验，如 2024-01"""
+    return bool(period) and bool(PERIOD_RE.match(period))
+
+
+# 薪资档案中的固定项，每月从档案带入
+FIXED_FIELDS = (
+    'base_salary', 'performance_salary', 'allowance',
+    'social_security', 'housing_fund', 'income_tax', 'other_deduction',
+)
+# 浮动项，保留当月已录入的值（如已导入的加班费、奖金）
+VARIABLE_FIELDS = ('overtime_pay', 'bonus')
+TOTAL_FIELDS = ('total_income', 'total_deduction', 'net_salary')
+
+
+def to_cents(amount):
+    """Decimal 金额转换为整数分"""
+    return int(amount.scaleb(2))
+
+
+def from_cents(cents):
+    """整数分转换为两位小数的 Decimal"""
+    return Decimal(cents).scaleb(-2)
+
+
+def compute_batch(columns):
+    """按列计算一批工资单
+
+    columns 为 {字段名: [整数分, ...]}，返回 {合计字段: [整数分, ...]}。
+    """
+    np = load_numpy()
+    if np is not None:
+        arrays = {f: np.asarray(columns[f], dtype=np.int64) for f in AMOUNT_FIELDS}
+        income = sum(arrays[f] for f in INCOME_FIELDS)
+        deduction = sum(arrays[f] for f in DEDUCTION_FIELDS)
+        return {
+            'total_income': income.tolist(),
+            'total_deduction': deduction.tolist(),
+            'net_salary': (income - deduction).tolist(),
+        }
+    income = [sum(row) for row in zip(*(columns[f] for f in INCOME_FIELDS))]
+    deduction = [sum(row) for row in zip(*(columns[f] for f in DEDUCTION_FIELDS))]
+    return {
+        'total_income': income,
+        'total_deduction': deduction,
+        'net_salary': [i - d for i, d in zip(income, deduction)],
+    }
+
+
+class PayrollResult:
+    """工资核算结果"""
+
+    def __init__(self, period):
+        self.period = period
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        # 合计金额超出字段范围、未写入的员工数
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def slips(self):
+        return self.created + self.updated
+
+    @property
+    def slips_per_sec(self):
+        return self.slips / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'rejected': self.rejected,
+            'elapsed': round(self.elapsed, 3),
+            'slipsPerSec': round(self.slips_per_sec, 1),
+        }
+
+
+def _split(rows, size):
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def _columns(rows):
+    """将行记录 (employee_id, salary_id, {字段: 分}) 转换为列"""
+    return {f: [r[2][f] for r in rows] for f in AMOUNT_FIELDS}
+
+
+def update_salaries(salaries, fields, batch_size):
+    """按主键批量更新已存在的工资单，期间被删除的工资单不会被重新插入
+
+    Django 3.2 的 bulk_update 为每行每列构造 CASE WHEN 表达式对象，数万行时
+    Python 侧开销远大于数据库本身；MySQL/SQLite 下直接拼接同样的
+    UPDATE ... SET 列 = CASE id WHEN ... END WHERE id IN (...)，其他数据库退回 bulk_update。
+    """
+    if connection.vendor not in ('mysql', 'sqlite'):
+        Salary.objects.bulk_update(salaries, fields, batch_size=batch_size)
+        return
+
+    qn = connection.ops.quote_name
+    pk = qn(Salary._meta.pk.column)
+    model_fields = [Salary._meta.get_field(f) for f in fields]
+    # 每行占用 2 × 字段数 + 1 个参数
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = max(1, min(batch_size, max_params // (2 * len(model_fields) + 1)))
+
+    with connection.cursor() as cursor:
+        for batch in _split(salaries, batch_size):
+            cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+            assignments = []
+            params = []
+            for field in model_fields:
+                assignments.append('{} = CASE {} {} END'.format(qn(field.column), pk, cases))
+                for salary in batch:
+                    params.extend((salary.pk, field.get_db_prep_save(getattr(salary, field.attname), connection)))
+            params.extend(salary.pk for salary in batch)
+            cursor.execute(
+                'UPDATE {} SET {} WHERE {} IN ({})'.format(
+                    qn(Salary._meta.db_table), ', '.join(assignments), pk, ', '.join(['%s'] * len(batch))
+                ),
+                params,
+            )
+
+
+def run_payroll(period, pay_date=None, batch_size=1000):
+    """生成指定月份的全员工资单
+
+    固定项取自薪资档案，当月已存在的工资单保留浮动项并重新计算合计。
+    数据通过固定次数的批量查询读取，按批计算。计算只是整数加减，在当前进程中
+    完成（分发到进程池时序列化的开销比计算本身还大）；耗时主要在读写数据库，
+    接口通过后台任务执行，见 jobs.py。
+
+    读取已有工资单和写入在同一事务中，已有工资单加行锁，核算期间导入或修改的
+    浮动项不会被覆盖；期间新插入的工资单导致唯一键冲突时整月回滚后重新核算。
+    合计金额超出字段范围的员工不生成工资单，计入 rejected。
+    """
+    if not is_valid_period(period):
+        raise ValueError('月份格式应为YYYY-MM')
+
+    start = time.perf_counter()
+    for attempt in range(1, PAYROLL_MAX_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                result = _run_payroll(period, pay_date, batch_size)
+            break
+        except IntegrityError:
+            if attempt == PAYROLL_MAX_ATTEMPTS:
+                raise
+            logger.warning('%s 工资核算与其他写入冲突，第 %d 次重新核算', period, attempt)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _existing_slips(period):
+    """当月已有的工资单 {员工 id: (id, 员工 id, 浮动项...)}，加行锁直到事务结束"""
+    rows = Salary.objects.select_for_update().filter(period=period).values_list(
+        'id', 'employee_id', *VARIABLE_FIELDS)
+    return {row[1]: row for row in rows}
+
+
+def _run_payroll(period, pay_date, batch_size):
+    result = PayrollResult(period)
+    profiles = PayProfile.objects.filter(employee__is_active=True).values_list('employee_id', *FIXED_FIELDS)
+    existing = _existing_slips(period)
+    result.skipped = Employee.objects.filter(is_active=True, pay_profile__isnull=True).count()
+
+    rows = []
+    for profile in profiles.iterator(chunk_size=batch_size):
+        employee_id = profile[0]
+        amounts = {f: to_cents(v) for f, v in zip(FIXED_FIELDS, profile[1:])}
+        current = existing.get(employee_id)
+        if current is not None:
+            amounts.update((f, to_cents(v)) for f, v in zip(VARIABLE_FIELDS, current[2:]))
+        else:
+            amounts.update((f, 0) for f in VARIABLE_FIELDS)
+        rows.append((employee_id, current[0] if current else None, amounts))
+
+    max_cents = to_cents(MAX_AMOUNT)
+    rejected = []
+    to_create = []
+    to_update = []
+    for batch in _split(rows, batch_size):
+        batch_totals = compute_batch(_columns(batch))
+        for i, (employee_id, salary_id, amounts) in enumerate(batch):
+            if any(abs(batch_totals[f][i]) > max_cents for f in TOTAL_FIELDS):
+                rejected.append(employee_id)
+                continue
+            values = {f: from_cents(c) for f, c in amounts.items()}
+            values.update((f, from_cents(batch_totals[f][i])) for f in TOTAL_FIELDS)
+            if salary_id is None:
+                to_create.append(Salary(employee_id=employee_id, period=period, pay_date=pay_date, **values))
+            else:
+                salary = Salary(id=salary_id, employee_id=employee_id, period=period, **values)
+                if pay_date:
+                    salary.pay_date = pay_date
+                to_update.append(salary)
+    if rejected:
+        logger.warning('%s 工资核算：%d 名员工的合计金额超出范围，未生成工资单，员工ID %s',
+                       period, len(rejected), rejected[:20])
+
+    update_fields = list(AMOUNT_FIELDS + TOTAL_FIELDS) + (['pay_date'] if pay_date else [])
+    Salary.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        update_salaries(to_update, update_fields, batch_size)
+    if to_create or to_update:
+        # 整月重算后直接按该月明细重建汇总，比逐行计算差额更简单
+        rebuild_aggregates([period])
+        bump_versions(SALARIES_BULK, period_scope(period))
+
+    result.created = len(to_create)
+    result.updated = len(to_update)
+    result.rejected = len(rejected)
+    return result
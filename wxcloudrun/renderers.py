@@ -0,0 +1,37 @@
+"""JSON 渲染器
+
+安装 orjson 后用它生成 JSON，输出与 DRF 的 JSONRenderer 逐字节一致：
+紧凑分隔符、不转义中文、U+2028/U+2029 转义；datetime/date/time、Decimal
+等类型仍交给 DRF 的编码器处理。orjson 与标准库仅在 |x| < 1e-4 或
+|x| >= 1e16 的浮点数上格式不同（如 1e16 与 1e+16），本项目的金额不会出现。
+未安装 orjson、请求了缩进或遇到 orjson 不支持的数据时使用 DRF 的实现。
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+) if orjson is not None else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        encoder = self.encoder_class()
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=_ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            # 超过64位的整数等
+            return super().render(data, accepted_media_type, renderer_context)
+        # 与 JSONRenderer 一致：这两个字符在 JavaScript 中是换行符
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
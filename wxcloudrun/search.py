@@ -0,0 +1,379 @@
+"""员工搜索索引
+
+在进程内为员工的姓名、工号、部门、职位和手机号建立 n-gram 倒排索引，
+搜索接口在索引上完成前缀和子串匹配，不再对数据库执行 LIKE '%x%' 全表扫描。
+
+每个字段的值转为小写（NFKC 归一化）后首尾加上锚点字符，索引其中全部三元组；
+首字符锚定的二元组用于单字符前缀，含非 ASCII 字符（中文）的一元组和二元组
+用于一两个汉字的子串。因此：三个字符及以上的关键词支持任意子串匹配；一两个
+汉字支持子串匹配；一两个 ASCII 字符只匹配前缀。
+
+查询时取关键词各 n-gram 中倒排表最短的一个作为候选，逐个校验子串，最多校验
+SEARCH_MAX_SCAN 个；字段值与关键词完全相同的员工另有精确索引，不受该上限影响。
+结果按匹配方式（完全相同 > 前缀 > 子串）、字段优先级（工号 > 姓名 > 手机号 > 部门
+> 职位）和 id 排序。
+
+索引在进程启动后于后台构建（SEARCH_INDEX_WARMUP），或在首次搜索时构建。本进程
+的员工变更由信号即时更新索引，并递增 employees 版本号；其他进程在搜索时发现
+版本号变化，按 updated_at 增量同步变更的员工，并移除已删除的员工。构建和同步
+读取数据库期间都不持有索引锁，只在替换或应用结果时短暂加锁，搜索和信号不会被阻塞。
+"""
+import logging
+import re
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Employee
+from .versioning import EMPLOYEES, bump_versions, get_versions
+
+logger = logging.getLogger('log')
+
+# 参与搜索的字段，按排序优先级从高到低
+SEARCH_FIELDS = ('employee_code', 'name', 'phone', 'department', 'position')
+
+_START, _END = '\x02', '\x03'
+_CONTROL_CHARS = re.compile('[\x00-\x1f\x7f]')
+
+
+def normalize(value):
+    """统一全角/半角和大小写，去除控制字符（锚点字符不会出现在字段值和关键词中）"""
+    value = value or ''
+    if not value.isascii():
+        value = unicodedata.normalize('NFKC', value)
+    return _CONTROL_CHARS.sub('', value.lower())
+
+
+def value_grams(value):
+    """字段值的 n-gram 集合"""
+    if not value:
+        return set()
+    wrapped = _START + value + _END
+    grams = {wrapped[i:i + 3] for i in range(len(wrapped) - 2)}
+    grams.add(wrapped[:2])
+    if not value.isascii():
+        grams.update(value)
+        grams.update(value[i:i + 2] for i in range(len(value) - 1))
+    return grams
+
+
+def prefix_gram(query):
+    """以关键词开头的字段值一定包含的锚定 n-gram"""
+    return (_START + query)[:3]
+
+
+def substring_grams(query):
+    """包含关键词的字段值一定包含的 n-gram；一两个 ASCII 字符时无法按子串查找，返回空集"""
+    if len(query) >= 3:
+        return {query[i:i + 3] for i in range(len(query) - 2)}
+    if query.isascii():
+        return set()
+    return {query}
+
+
+def _insert(index, key, pk):
+    ids = index.get(key)
+    if ids is None:
+        index[key] = array('q', (pk,))
+    elif ids[-1] < pk:
+        ids.append(pk)
+    else:
+        insort(ids, pk)
+
+
+def _delete(index, key, pk):
+    ids = index.get(key)
+    if ids is None:
+        return
+    i = bisect_left(ids, pk)
+    if i < len(ids) and ids[i] == pk:
+        del ids[i]
+    if not ids:
+        del index[key]
+
+
+class SearchResult:
+    """ids 为排序后的员工 id，truncated 表示达到 SEARCH_MAX_RESULTS 或 SEARCH_MAX_SCAN，
+    此时 count 只是下限"""
+
+    def __init__(self, ids, truncated):
+        self.ids = ids
+        self.truncated = truncated
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+
+class EmployeeIndex:
+    """员工 n-gram 倒排索引
+
+    每个字段一组倒排表（n-gram -> 按 id 升序的 array）和一组精确索引（字段值 -> id），
+    排序时依次取各字段的完全相同、前缀、子串匹配，不需要为每个结果计算得分。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 构建和同步各自只允许一个线程执行，读取数据库时不持有 _lock
+        self._build_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.built = False
+        self.docs = {}
+        # docs 中 id 之和，与数据库的员工数、id 之和一起判断是否有删除或遗漏
+        self.id_sum = 0
+        self.postings = [{} for _ in SEARCH_FIELDS]
+        self.exact = [{} for _ in SEARCH_FIELDS]
+        self.version = None
+        self.synced_at = None
+        # 本进程信号已应用、但尚未在版本号中确认的递增次数
+        self.pending = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    # 索引维护
+
+    def _add(self, pk, values):
+        self.docs[pk] = values
+        self.id_sum += pk
+        for postings, exact, value in zip(self.postings, self.exact, values):
+            if not value:
+                continue
+            _insert(exact, value, pk)
+            for gram in value_grams(value):
+                _insert(postings, gram, pk)
+
+    def _remove(self, pk):
+        values = self.docs.pop(pk, None)
+        if values is None:
+            return
+        self.id_sum -= pk
+        for postings, exact, value in zip(self.postings, self.exact, values):
+            if not value:
+                continue
+            _delete(exact, value, pk)
+            for gram in value_grams(value):
+                _delete(postings, gram, pk)
+
+    def _put(self, pk, values):
+        values = tuple(normalize(v) for v in values)
+        if self.docs.get(pk) == values:
+            return
+        self._remove(pk)
+        self._add(pk, values)
+
+    def update(self, instance):
+        """信号调用：本进程内员工新增或修改"""
+        with self._lock:
+            if not self.built:
+                return
+            self._put(instance.pk, [getattr(instance, f) for f in SEARCH_FIELDS])
+            self.pending += 1
+
+    def remove(self, pk):
+        """信号调用：本进程内员工删除"""
+        with self._lock:
+            if not self.built:
+                return
+            self._remove(pk)
+            self.pending += 1
+
+    # 构建与同步
+
+    def _current_version(self):
+        versions = get_versions([EMPLOYEES])
+        return versions[EMPLOYEES][0] if EMPLOYEES in versions else 0
+
+    def build(self):
+        """全量构建；读取数据库期间不持有索引锁，信号和搜索不会被阻塞"""
+        # 先读版本号再读数据，构建期间的写入会在下次搜索时同步
+        version = self._current_version()
+        synced_at = timezone.now()
+        # 先按字段值归并员工，每个不同的值只切分一次 n-gram（部门、职位、姓名大量重复）
+        docs = {}
+        by_value = [defaultdict(list) for _ in SEARCH_FIELDS]
+        rows = Employee.objects.order_by('id').values_list('id', *SEARCH_FIELDS)
+        for row in rows.iterator():
+            pk = row[0]
+            values = docs[pk] = tuple(normalize(v) for v in row[1:])
+            for field, value in enumerate(values):
+                if value:
+                    by_value[field][value].append(pk)
+        postings, exact = [], []
+        for groups in by_value:
+            field_postings = defaultdict(list)
+            for value, ids in groups.items():
+                for gram in value_grams(value):
+                    field_postings[gram].extend(ids)
+            postings.append({gram: array('q', sorted(ids)) for gram, ids in field_postings.items()})
+            exact.append({value: array('q', ids) for value, ids in groups.items()})
+
+        with self._lock:
+            self._reset()
+            self.docs, self.postings, self.exact = docs, postings, exact
+            self.id_sum = sum(docs)
+            self.version, self.synced_at = version, synced_at
+            self.built = True
+        logger.info('员工搜索索引构建完成：%d 名员工，%d 个 n-gram', len(docs),
+                    sum(len(field_postings) for field_postings in postings))
+
+    def _read_rows(self, queryset):
+        return [(row[0], row[1:]) for row in queryset.values_list('id', *SEARCH_FIELDS)]
+
+    def _apply(self, rows):
+        with self._lock:
+            for pk, values in rows:
+                self._put(pk, values)
+
+    def _sync(self, version):
+        """增量同步其他进程的写入
+
+        数据库查询都在索引锁之外执行，结果分批在锁内应用。同步期间本进程的信号可能
+        先于较早读出的行应用，这些写入递增的版本号会触发下一次同步，届时按 updated_at 纠正。
+        """
+        with self._lock:
+            since = self.synced_at - timedelta(seconds=settings.SEARCH_SYNC_OVERLAP)
+        synced_at = timezone.now()
+        self._apply(self._read_rows(Employee.objects.filter(updated_at__gte=since)))
+
+        # 员工数和 id 之和都与索引一致时没有删除或遗漏，不必读出全部 id
+        totals = Employee.objects.aggregate(count=Count('id'), id_sum=Sum('id'))
+        with self._lock:
+            consistent = (len(self.docs), self.id_sum) == (totals['count'], totals['id_sum'] or 0)
+        if not consistent:
+            existing = set(Employee.objects.values_list('id', flat=True))
+            with self._lock:
+                for pk in [pk for pk in self.docs if pk not in existing]:
+                    self._remove(pk)
+                # 写入时间早于上次同步、但提交较晚的员工，按 id 补齐
+                missing = sorted(existing.difference(self.docs))
+            for start in range(0, len(missing), 1000):
+                self._apply(self._read_rows(Employee.objects.filter(pk__in=missing[start:start + 1000])))
+
+        with self._lock:
+            self.version = version
+            self.synced_at = synced_at
+            self.pending = 0
+
+    def ensure_fresh(self):
+        """搜索前调用：未构建时构建，版本号变化时同步，每次一条版本号查询"""
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    self.build()
+                    return
+        version = self._current_version()
+        with self._lock:
+            if version == self.version + self.pending:
+                # 版本变化全部来自本进程，信号已更新过索引
+                self.version, self.pending = version, 0
+                return
+            if version == self.version:
+                return
+        with self._sync_lock:
+            # 等待期间其他线程可能已同步到该版本
+            if self.version != version:
+                self._sync(version)
+
+    # 查询
+
+    def _plans(self, query):
+        """按排序优先级给出 (候选 id, 字段序号, 校验函数)；n-gram 已能确定匹配时不需要校验"""
+        fields = range(len(SEARCH_FIELDS))
+        for field in fields:
+            yield self.exact[field].get(query), field, None
+        grams = substring_grams(query)
+        # 前缀匹配同时包含锚定 n-gram 和子串的全部 n-gram，取最短的倒排表
+        prefix_grams = grams | {prefix_gram(query)}
+        check = str.startswith if len(query) > 2 else None
+        for field in fields:
+            candidates = [self.postings[field].get(g) for g in prefix_grams]
+            if all(candidates):
+                yield min(candidates, key=len), field, check
+        if not grams:
+            return
+        check = None if grams == {query} else str.__contains__
+        for field in fields:
+            candidates = [self.postings[field].get(g) for g in grams]
+            if all(candidates):
+                yield min(candidates, key=len), field, check
+
+    def search(self, query, max_scan=None, max_results=None):
+        """依次取完全相同、前缀、子串匹配，同一匹配方式按字段优先级，再按 id 排序"""
+        query = normalize(query).strip()
+        if not query:
+            return SearchResult([], False)
+        max_scan = settings.SEARCH_MAX_SCAN if max_scan is None else max_scan
+        max_results = settings.SEARCH_MAX_RESULTS if max_results is None else max_results
+
+        ids = []
+        seen = set()
+        scanned = 0
+        with self._lock:
+            docs = self.docs
+            for candidates, field, check in self._plans(query):
+                if not candidates:
+                    continue
+                for pk in candidates:
+                    if scanned >= max_scan or len(ids) >= max_results:
+                        return SearchResult(ids, True)
+                    scanned += 1
+                    if pk in seen or (check is not None and not check(docs[pk][field], query)):
+                        continue
+                    seen.add(pk)
+                    ids.append(pk)
+        return SearchResult(ids, False)
+
+
+employee_index = EmployeeIndex()
+
+
+def search_employees(query):
+    employee_index.ensure_fresh()
+    return employee_index.search(query)
+
+
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """搜索字段变更时更新本进程的索引，并递增版本号通知其他进程"""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    employee_index.update(instance)
+    bump_versions(EMPLOYEES)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    employee_index.remove(instance.pk)
+    bump_versions(EMPLOYEES)
+
+
+def connect_signals():
+    post_save.connect(update_search_index, sender=Employee, dispatch_uid='search_employee_save')
+    post_delete.connect(remove_from_search_index, sender=Employee, dispatch_uid='search_employee_delete')
+
+
+def warm_up():
+    """后台线程中构建索引，失败时留待首次搜索再构建"""
+    def run():
+        try:
+            employee_index.ensure_fresh()
+        except Exception:
+            logger.exception('员工搜索索引预热失败')
+        finally:
+            # 归还连接，线程结束后不再占用
+            connection.close()
+
+    thread = threading.Thread(target=run, name='search-warmup', daemon=True)
+    thread.start()
+    return thread
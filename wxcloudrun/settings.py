@@ -1,6 +1,5 @@
 import os
 from pathlib import Path
-import time
 
 CUR_PATH = os.path.dirname(os.path.realpath(__file__))  
 LOG_PATH = os.path.join(os.path.dirname(CUR_PATH), 'logs') # LOG_PATH是存放日志的路径
@@ -36,6 +35,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'wxcloudrun.middleware.RequestLogMiddleware',
+    'wxcloudrun.middleware.MetricsMiddleware',
+    'wxcloudrun.middleware.ReplicaRoutingMiddleware',
+    'wxcloudrun.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,22 +68,53 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'wxcloudrun.wsgi.application'
+ASGI_APPLICATION = 'wxcloudrun.asgi.application'
+
+# 列表接口直接从 values() 序列化（见 wxcloudrun/fastlist.py），输出与序列化器一致
+FAST_LIST_SERIALIZATION = os.environ.get('FAST_LIST_SERIALIZATION', 'true').lower() == 'true'
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# 数据库连接池，见 wxcloudrun/dbpool/pool.py。启用时请求之间复用连接，CONN_MAX_AGE 须为 0
+DB_POOL_ENABLED = os.environ.get('DB_POOL_ENABLED', 'true').lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'wxcloudrun.dbpool' if DB_POOL_ENABLED else 'django.db.backends.mysql',
         'NAME': os.environ.get("MYSQL_DATABASE") or os.environ.get("MYSQL_DATABASE_NAME") or 'employee_management',
         'USER': os.environ.get("MYSQL_USERNAME") or os.environ.get("MYSQL_USER", 'admin'),
         'PASSWORD': os.environ.get("MYSQL_PASSWORD") or 'admin@123',
         'HOST': os.environ.get("MYSQL_HOST") or 'sh-cynosdbmysql-grp-1k3d17lm.sql.tencentcdb.com',
         'PORT': os.environ.get("MYSQL_PORT", '29844'),
         'OPTIONS': {'charset': 'utf8mb4'},
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),  # 每个进程的连接数上限，应不小于 GUNICORN_THREADS
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # 连接全部占用时的等待上限（秒）
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),  # 连接建立后最多使用的秒数，应小于数据库的 wait_timeout
+            'PRE_PING_AFTER': float(os.environ.get('DB_POOL_PRE_PING_AFTER', 5)),  # 空闲超过该秒数的连接取出前先 ping
+        },
     }
 }
 
+# 只读副本（读写分离），见 wxcloudrun/dbrouter.py。格式为 主机:端口*权重，多个用逗号分隔，
+# 如 10.0.0.2:3306*2,10.0.0.3:3306；账号、密码和库名与主库相同，依次生成 replica1、replica2…
+DB_REPLICAS = os.environ.get('DB_REPLICAS', '')
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))  # 用户写入后只读主库的秒数，应大于复制延迟
+DB_REPLICA_STICKY_SHARED = os.environ.get('DB_REPLICA_STICKY_SHARED', 'false').lower() == 'true'  # 是否同时写入Django缓存供多进程共享
+DB_REPLICA_RETRY_INTERVAL = int(os.environ.get('DB_REPLICA_RETRY_INTERVAL', 30))  # 连接失败的副本暂停使用的秒数
+
+for _index, _replica in enumerate(filter(None, (item.strip() for item in DB_REPLICAS.split(','))), 1):
+    _address, _, _weight = _replica.partition('*')
+    _host, _, _port = _address.partition(':')
+    DATABASES['replica%d' % _index] = dict(
+        DATABASES['default'], HOST=_host, PORT=_port or DATABASES['default']['PORT'],
+        REPLICA_WEIGHT=int(_weight or 1), TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['wxcloudrun.dbrouter.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -99,42 +133,64 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# 日志：请求线程只入队，由后台线程成批写入，见 wxcloudrun/logutils.py
+LOGGING_CONFIG = 'wxcloudrun.logutils.configure_logging'
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # 日志队列长度上限
+LOG_QUEUE_DEBUG_WATERMARK = int(os.environ.get('LOG_QUEUE_DEBUG_WATERMARK', 5000))  # 队列超过该长度时丢弃DEBUG日志
+LOG_QUEUE_ERROR_TIMEOUT = float(os.environ.get('LOG_QUEUE_ERROR_TIMEOUT', 0.1))  # 队列满时ERROR日志最多等待的秒数
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 500))  # 后台线程每批写入的最大条数
+LOG_BACKUP_DAYS = int(os.environ.get('LOG_BACKUP_DAYS', 7))  # 日志文件保留天数
+LOG_MAX_RECORD_BYTES = int(os.environ.get('LOG_MAX_RECORD_BYTES', 4096))  # 单条文件日志的字节上限，超出时截断堆栈和消息，多进程追加写入时整行不交错
+
+# 请求指标，通过 /metrics 以 Prometheus 格式导出，见 wxcloudrun/metrics.py
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # 抓取需携带 Authorization: Bearer <token>，为空时 /metrics 返回404
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')  # 多 worker 时各进程写快照的目录
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))  # 写快照的间隔（秒）
+
+# 响应压缩，客户端支持时优先 br（需安装 brotli），否则 gzip，见 CompressionMiddleware
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # 小于该字节数的响应不压缩
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))  # gzip 压缩级别 1-9
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))  # brotli 质量 0-11
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': True,
     'formatters': {
         # 日志格式
         'standard': {
-            'format': '[%(asctime)s] [%(filename)s:%(lineno)d] [%(module)s:%(funcName)s] '
+            'format': '[%(asctime)s] [%(request_id)s] [%(filename)s:%(lineno)d] [%(module)s:%(funcName)s] '
                       '[%(levelname)s]- %(message)s'},
         'simple': {  # 简单格式
             'format': '%(levelname)s %(message)s'
         },
+        # 文件日志为 JSON 行，包含请求ID和耗时等字段
+        'json': {
+            '()': 'wxcloudrun.logutils.JsonFormatter',
+            'max_bytes': LOG_MAX_RECORD_BYTES,
+        },
     },
     # 过滤
     'filters': {
     },
-    # 定义具体处理日志的方式
+    # 定义具体处理日志的方式，文件按天切换：all-YYYY-MM-DD.log
     'handlers': {
         # 默认记录所有日志
         'default': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join(LOG_PATH, 'all-{}.log'.format(time.strftime('%Y-%m-%d'))),
-            'maxBytes': 1024 * 1024 * 5,  # 文件大小
-            'backupCount': 5,  # 备份数
-            'formatter': 'standard',  # 输出格式
-            'encoding': 'utf-8',  # 设置默认编码，否则打印出来汉字乱码
+            '()': 'wxcloudrun.logutils.DailyFileHandler',
+            'filename': os.path.join(LOG_PATH, 'all.log'),
+            'backup_days': LOG_BACKUP_DAYS,
+            'formatter': 'json',
         },
         # 输出错误日志
         'error': {
             'level': 'ERROR',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join(LOG_PATH, 'error-{}.log'.format(time.strftime('%Y-%m-%d'))),
-            'maxBytes': 1024 * 1024 * 5,  # 文件大小
-            'backupCount': 5,  # 备份数
-            'formatter': 'standard',  # 输出格式
-            'encoding': 'utf-8',  # 设置默认编码
+            '()': 'wxcloudrun.logutils.DailyFileHandler',
+            'filename': os.path.join(LOG_PATH, 'error.log'),
+            'backup_days': LOG_BACKUP_DAYS,
+            'formatter': 'json',
         },
         # 控制台输出
         'console': {
@@ -145,12 +201,10 @@ LOGGING = {
         # 输出info日志
         'info': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join(LOG_PATH, 'info-{}.log'.format(time.strftime('%Y-%m-%d'))),
-            'maxBytes': 1024 * 1024 * 5,
-            'backupCount': 5,
-            'formatter': 'standard',
-            'encoding': 'utf-8',  # 设置默认编码
+            '()': 'wxcloudrun.logutils.DailyFileHandler',
+            'filename': os.path.join(LOG_PATH, 'info.log'),
+            'backup_days': LOG_BACKUP_DAYS,
+            'formatter': 'json',
         },
     },
     # 配置用哪几种 handlers 来处理日志
@@ -167,6 +221,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True
         },
+        # 访问日志：每个请求一条，包含请求ID、状态码和耗时
+        'access': {
+            'handlers': ['default'],
+            'level': 'INFO',
+            'propagate': False
+        },
     }
 }
 
@@ -200,15 +260,24 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'wxcloudrun.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # 安装 orjson 时使用 orjson 生成 JSON，输出与 JSONRenderer 一致
+    'DEFAULT_RENDERER_CLASSES': (
+        'wxcloudrun.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DATE_FORMAT': '%Y-%m-%d',
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
 }
 
+# 列表分页配置（游标分页，见 wxcloudrun/pagination.py）
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 20))  # 默认每页条数，可通过 ?page_size= 调整
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))  # 每页条数上限
+
 # JWT配置
 from datetime import timedelta
 
@@ -222,6 +291,24 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# 密码哈希配置
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))  # 调整后员工下次登录时自动按新cost重新哈希
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) - 1)))  # 并发计算bcrypt的线程数
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))  # 最多排队的校验请求数
+PASSWORD_HASH_WAIT_TIMEOUT = float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 2))  # 排队超时（秒），超时返回503
+
+# 登录限流配置（令牌桶：突发上限 + 每分钟补充数，每分钟补充数为0时不限流）
+LOGIN_THROTTLE_CODE_BURST = int(os.environ.get('LOGIN_THROTTLE_CODE_BURST', 5))
+LOGIN_THROTTLE_CODE_PER_MINUTE = float(os.environ.get('LOGIN_THROTTLE_CODE_PER_MINUTE', 5))
+LOGIN_THROTTLE_IP_BURST = int(os.environ.get('LOGIN_THROTTLE_IP_BURST', 30))
+LOGIN_THROTTLE_IP_PER_MINUTE = float(os.environ.get('LOGIN_THROTTLE_IP_PER_MINUTE', 30))
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))  # 应用前的可信代理层数，按右数第N个X-Forwarded-For地址识别客户端IP
+
+# JWT认证用户缓存
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))  # 进程内缓存的用户数上限
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))  # 缓存有效期（秒）
+AUTH_USER_CACHE_SHARED = os.environ.get('AUTH_USER_CACHE_SHARED', 'false').lower() == 'true'  # 是否同时写入Django缓存供多进程共享
+
 # JWT Secret Key
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET', SECRET_KEY)
 
@@ -229,3 +316,66 @@ LOGS_DIR = '/data/logs/'
 
 # 自定义用户模型
 AUTH_USER_MODEL = 'wxcloudrun.Employee'
+
+# 工资单批量导入配置
+SALARY_IMPORT_CHUNK_SIZE = int(os.environ.get('SALARY_IMPORT_CHUNK_SIZE', 500))  # 每块校验的行数
+SALARY_IMPORT_BATCH_SIZE = int(os.environ.get('SALARY_IMPORT_BATCH_SIZE', 500))  # 每条INSERT的行数
+SALARY_IMPORT_MAX_ERRORS = int(os.environ.get('SALARY_IMPORT_MAX_ERRORS', 1000))  # 返回的错误明细上限
+
+# 员工批量导入配置
+EMPLOYEE_IMPORT_CHUNK_SIZE = int(os.environ.get('EMPLOYEE_IMPORT_CHUNK_SIZE', 1000))  # 每块校验、哈希的行数
+EMPLOYEE_IMPORT_BATCH_SIZE = int(os.environ.get('EMPLOYEE_IMPORT_BATCH_SIZE', 500))  # 每条INSERT的行数
+EMPLOYEE_IMPORT_MAX_ERRORS = int(os.environ.get('EMPLOYEE_IMPORT_MAX_ERRORS', 1000))  # 返回的错误明细上限
+EMPLOYEE_IMPORT_WORKERS = int(os.environ.get('EMPLOYEE_IMPORT_WORKERS', os.cpu_count() or 1))  # 命令和后台任务并行哈希初始密码的进程数（接口不使用进程池）
+EMPLOYEE_IMPORT_MAX_ROWS = int(os.environ.get('EMPLOYEE_IMPORT_MAX_ROWS', 30))  # 接口同步导入的人数上限（试运行不限），更多时自动提交后台任务
+
+# 月度工资核算配置
+PAYROLL_BATCH_SIZE = int(os.environ.get('PAYROLL_BATCH_SIZE', 1000))  # 每批计算/写入的工资单数
+STATS_MAX_MONTHS = int(os.environ.get('STATS_MAX_MONTHS', 36))  # 全局统计趋势最多返回的月数
+
+# 员工首页接口配置
+DASHBOARD_RECENT_SALARIES = int(os.environ.get('DASHBOARD_RECENT_SALARIES', 6))  # 默认返回的最近工资单数
+DASHBOARD_MAX_RECENT_SALARIES = int(os.environ.get('DASHBOARD_MAX_RECENT_SALARIES', 24))  # ?recent= 的上限
+DASHBOARD_NOTICES = int(os.environ.get('DASHBOARD_NOTICES', 5))  # 返回的公告数
+DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', 10000))  # 进程内缓存的条目数上限，每个员工的每种 recent 各占一条
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))  # 缓存有效期（秒）
+
+# 工资分析快照，见 wxcloudrun/analytics.py
+ANALYTICS_SNAPSHOT_DIR = os.environ.get('ANALYTICS_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))  # 快照文件目录，多进程共享
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 48))  # 每个进程保持映射的月份数
+ANALYTICS_MAX_BINS = int(os.environ.get('ANALYTICS_MAX_BINS', 100))  # 直方图最多区间数
+
+# 部门汇总，见 wxcloudrun/departments.py
+DEPARTMENT_ROLLUP_CACHE_SIZE = int(os.environ.get('DEPARTMENT_ROLLUP_CACHE_SIZE', 48))  # 每个进程缓存的月份数
+
+# 后台任务队列，见 wxcloudrun/jobs.py
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 2))  # 每个 worker 同时执行的任务数
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))  # 队列为空时的轮询间隔（秒）
+JOB_HEARTBEAT_INTERVAL = int(os.environ.get('JOB_HEARTBEAT_INTERVAL', 10))  # 刷新心跳和回收超时任务的间隔（秒）
+JOB_STALE_TIMEOUT = int(os.environ.get('JOB_STALE_TIMEOUT', 300))  # 超过该时长没有心跳的任务重新排队（秒）
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))  # 因 worker 退出重新排队的最多执行次数
+JOB_MAX_UPLOAD_SIZE = int(os.environ.get('JOB_MAX_UPLOAD_SIZE', 20 * 1024 * 1024))  # 导入任务上传文件的大小上限（字节）
+
+# 微信服务端接口，见 wxcloudrun/wechat.py
+WECHAT_APPID = os.environ.get('WECHAT_APPID', '')  # 小程序 AppID
+WECHAT_SECRET = os.environ.get('WECHAT_SECRET', '')  # 小程序 AppSecret，未配置时微信登录和绑定返回503
+WECHAT_API_BASE = os.environ.get('WECHAT_API_BASE', 'https://api.weixin.qq.com')  # 测试时可指向本地桩服务
+WECHAT_TIMEOUT = float(os.environ.get('WECHAT_TIMEOUT', 5))  # 连接和读取超时（秒）
+WECHAT_MAX_RETRIES = int(os.environ.get('WECHAT_MAX_RETRIES', 2))  # 网络错误和5xx的重试次数
+WECHAT_POOL_SIZE = int(os.environ.get('WECHAT_POOL_SIZE', 10))  # 每个进程的保持连接数上限
+WECHAT_TOKEN_REFRESH_AHEAD = int(os.environ.get('WECHAT_TOKEN_REFRESH_AHEAD', 300))  # access_token 过期前多少秒开始刷新
+WECHAT_OPENID_CACHE_SIZE = int(os.environ.get('WECHAT_OPENID_CACHE_SIZE', 10000))  # 进程内缓存的 openid 数
+WECHAT_OPENID_CACHE_TTL = int(os.environ.get('WECHAT_OPENID_CACHE_TTL', 60))  # 缓存有效期（秒），其他进程修改的员工资料在此之后生效（绑定关系每次确认）
+
+# 员工搜索索引，见 wxcloudrun/search.py
+SEARCH_INDEX_WARMUP = os.environ.get('SEARCH_INDEX_WARMUP', 'true').lower() == 'true'  # 进程启动后在后台构建索引
+SEARCH_MAX_SCAN = int(os.environ.get('SEARCH_MAX_SCAN', 20000))  # 单次搜索最多校验的候选员工数
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))  # 参与排序分页的结果上限
+SEARCH_MAX_QUERY_LENGTH = int(os.environ.get('SEARCH_MAX_QUERY_LENGTH', 50))  # 关键词最大长度
+SEARCH_SYNC_OVERLAP = int(os.environ.get('SEARCH_SYNC_OVERLAP', 60))  # 跨进程同步时向前多取的秒数，容忍时钟偏差和延迟提交
+
+# 容器启动，见 wxcloudrun/startup.py
+BOOTSTRAP_MIGRATE = os.environ.get('BOOTSTRAP_MIGRATE', 'true').lower() == 'true'  # bootstrap 时检查并执行未执行的迁移
+
+# 工资单导出配置
+SALARY_EXPORT_CHUNK_SIZE = int(os.environ.get('SALARY_EXPORT_CHUNK_SIZE', 2000))  # 每次查询读取的行数
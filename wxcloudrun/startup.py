@@ -0,0 +1,157 @@
+"""容器冷启动
+
+云托管实例数可缩到 0，冷启动耗时直接计入第一个请求。bootstrap 命令（见
+management/commands/bootstrap.py）在一个进程中完成启动前的准备，再替换为 gunicorn：
+
+- 迁移：只列出迁移文件名（不导入迁移模块、不构建迁移图），与 django_migrations
+  表中已执行的记录比较，没有未执行的迁移时跳过 migrate；迁移失败时照常启动，
+  /health/ 在迁移全部执行前返回 503（migrations_applied）；
+- 管理员账号：按工号查询一次，不存在时才创建（ADMIN_CODE / ADMIN_PASSWORD）；
+- 启动时间：容器进程的启动时间写入环境变量 BOOT_STARTED_AT，gunicorn worker
+  继承后记录加载完应用（ready）和返回第一个响应（first_response）距容器启动的
+  秒数，见 startup_duration_seconds 指标和日志。
+
+不经过 bootstrap 启动时（如直接运行 gunicorn、runserver），以当前进程的启动时间为准。
+"""
+import functools
+import logging
+import os
+import pkgutil
+import threading
+import time
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.core.signals import request_finished
+
+from .metrics import startup_time
+from .models import Employee
+
+logger = logging.getLogger('log')
+
+BOOT_ENV = 'BOOT_STARTED_AT'
+
+_imported_at = time.time()
+
+
+def process_started_at(pid='self'):
+    """进程的启动时间（Unix 时间戳），读取不到 /proc 时返回 None"""
+    try:
+        with open('/proc/%s/stat' % pid) as f:
+            # 进程名可能含空格，从最后一个右括号之后解析；启动时间是第 22 个字段
+            ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime + ticks / os.sysconf('SC_CLK_TCK')
+
+
+def boot_started_at():
+    """容器（bootstrap 进程）的启动时间，没有经过 bootstrap 时取当前进程的启动时间"""
+    try:
+        return float(os.environ[BOOT_ENV])
+    except (KeyError, ValueError):
+        return process_started_at() or _imported_at
+
+
+# 迁移
+
+@functools.lru_cache(maxsize=None)
+def migration_files():
+    """磁盘上的迁移，{(应用, 迁移名)}；与 MigrationLoader 的发现规则一致，但不导入迁移模块"""
+    from django.db.migrations.loader import MigrationLoader
+
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = find_spec(module_name)
+        except ImportError:
+            continue
+        if spec is None or spec.submodule_search_locations is None:
+            continue
+        for _, name, is_pkg in pkgutil.iter_modules(spec.submodule_search_locations):
+            if not is_pkg and name[0] not in '_~':
+                found.add((app_config.label, name))
+    return frozenset(found)
+
+
+def pending_migrations(connection):
+    """未执行的迁移，迁移记录表不存在时即全部迁移
+
+    压缩迁移（squashed）在被替换的迁移都已执行时可能没有记录，此时会多执行
+    一次 migrate，由 migrate 补上记录，之后不再重复。
+    """
+    from django.db.migrations.recorder import MigrationRecorder
+
+    files = migration_files()
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return files
+    return files - set(recorder.applied_migrations())
+
+
+_migrations_applied = False
+
+
+def migrations_applied(connection):
+    """就绪检查：没有未执行的迁移时返回 True
+
+    迁移执行后不会回退，检查通过后记住结果，之后的就绪检查不再查询迁移记录。
+    """
+    global _migrations_applied
+    if not _migrations_applied:
+        _migrations_applied = not pending_migrations(connection)
+    return _migrations_applied
+
+
+# 管理员账号
+
+def ensure_admin(code=None, password=None):
+    """确保管理员账号存在，返回 (员工, 是否新建)；已存在时只有一次查询，不计算哈希"""
+    code = code or os.environ.get('ADMIN_CODE', 'admin')
+    admin = Employee.objects.filter(employee_code=code).first()
+    if admin is not None:
+        return admin, False
+    admin = Employee(
+        employee_code=code,
+        username=code,
+        name='管理员',
+        department='管理部',
+        position='管理员',
+        role='admin',
+        is_staff=True,
+        is_superuser=True,
+    )
+    admin.set_password(password or os.environ.get('ADMIN_PASSWORD', 'admin123'))
+    admin.save()
+    return admin, True
+
+
+# 启动耗时
+
+_first_response_lock = threading.Lock()
+_first_response_done = False
+
+
+def _on_first_response(sender, **kwargs):
+    global _first_response_done
+    with _first_response_lock:
+        if _first_response_done:
+            return
+        _first_response_done = True
+    request_finished.disconnect(dispatch_uid='startup_first_response')
+    elapsed = time.time() - boot_started_at()
+    startup_time.observe(('first_response',), elapsed)
+    logger.info('进程 %d 返回第一个响应，距启动 %.2f 秒', os.getpid(), elapsed)
+
+
+def track_startup():
+    """应用加载完成时调用（asgi.py / wsgi.py）：记录 ready 耗时，并在第一个响应结束时记录 first_response"""
+    elapsed = time.time() - boot_started_at()
+    startup_time.observe(('ready',), elapsed)
+    logger.info('进程 %d 已加载应用，距启动 %.2f 秒', os.getpid(), elapsed)
+    request_finished.connect(_on_first_response, dispatch_uid='startup_first_response')
@@ -0,0 +1,22 @@
+"""测试配置：SQLite 测试库（按迁移建表），降低 bcrypt cost，不写日志文件
+
+python manage.py test --settings=wxcloudrun.tests.settings
+"""
+from wxcloudrun.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # 只读副本，与生产环境的 DB_REPLICAS 相同以主库为测试镜像（见 test_dbrouter.py）
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'REPLICA_WEIGHT': 1,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+BCRYPT_ROUNDS = 4
+SEARCH_INDEX_WARMUP = False
+LOGGING_CONFIG = None
@@ -0,0 +1,59 @@
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from wxcloudrun.models import Employee, Notice, ResourceVersion, Salary
+
+
+class SalaryListConditionalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create(
+            username='admin', employee_code='admin', name='管理员', role='admin'
+        )
+        cls.employee = Employee.objects.create(username='E001', employee_code='E001', name='张三')
+        cls.salary = Salary.objects.create(employee=cls.employee, period='2024-01', net_salary=100)
+
+    def get(self, user, **headers):
+        token = str(RefreshToken.for_user(user).access_token)
+        return self.client.get('/api/salaries/', HTTP_AUTHORIZATION='Bearer ' + token, **headers)
+
+    def test_etag_changes_within_the_same_second(self):
+        for user in (self.admin, self.employee):
+            with self.subTest(role=user.role):
+                first = self.get(user)
+                self.assertEqual(first.status_code, 200)
+                self.assertNotIn('Last-Modified', first)
+                self.assertEqual(self.get(user, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+                self.salary.net_salary += 1
+                self.salary.save()
+                second = self.get(user, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(second.status_code, 200)
+                self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_salary_save_only_bumps_scoped_versions(self):
+        Salary.objects.create(employee=self.employee, period='2024-02', net_salary=100)
+        self.assertEqual(
+            set(ResourceVersion.objects.filter(scope__startswith='salaries').values_list('scope', flat=True)),
+            {'salaries:employee:%s' % self.employee.id, 'salaries:period:2024-01', 'salaries:period:2024-02'},
+        )
+
+
+class NoticeListConditionalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Notice.objects.create(title='放假通知', date='2024-01-01')
+
+    def test_insert_without_signals_changes_etag(self):
+        first = self.client.get('/api/notices/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get('/api/notices/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # bulk_create 不发送 post_save 信号
+        Notice.objects.bulk_create([Notice(title='发薪通知', date='2024-01-02')])
+        second = self.client.get('/api/notices/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()[0]['title'], '发薪通知')
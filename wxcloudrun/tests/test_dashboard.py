@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from wxcloudrun.dashboard import dashboard_cache, get_dashboard
+from wxcloudrun.models import Employee, Notice, Salary
+
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        dashboard_cache.clear()
+        self.employee = Employee.objects.create(username='E001', employee_code='E001', name='张三')
+        Salary.objects.bulk_create(
+            Salary(employee=self.employee, period='2024-%02d' % month, net_salary=100) for month in range(1, 7)
+        )
+
+    def test_recent_values_are_cached_separately(self):
+        self.assertEqual(len(get_dashboard(self.employee.id, '2024-06', 2)['recentSalaries']), 2)
+        self.assertEqual(len(get_dashboard(self.employee.id, '2024-06', 6)['recentSalaries']), 6)
+        # 交替请求时两种条数都命中缓存，只查询版本号和公告状态
+        for recent in (2, 6):
+            with self.assertNumQueries(2):
+                data = get_dashboard(self.employee.id, '2024-06', recent)
+            self.assertEqual(len(data['recentSalaries']), recent)
+
+    def test_salary_change_invalidates_every_recent_value(self):
+        get_dashboard(self.employee.id, '2024-06', 2)
+        get_dashboard(self.employee.id, '2024-06', 6)
+        Salary.objects.create(employee=self.employee, period='2024-07', net_salary=100)
+        self.assertEqual(len(dashboard_cache), 0)
+
+    def test_notice_insert_without_signals_invalidates(self):
+        self.assertEqual(get_dashboard(self.employee.id, '2024-06', 2)['notices'], [])
+        Notice.objects.bulk_create([Notice(title='发薪通知', date='2024-06-30')])
+        notices = get_dashboard(self.employee.id, '2024-06', 2)['notices']
+        self.assertEqual([n['title'] for n in notices], ['发薪通知'])
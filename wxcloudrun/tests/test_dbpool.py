@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from wxcloudrun.dbpool import pool as dbpool
+from wxcloudrun.dbpool.pool import ConnectionPool, PoolTimeout
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, max_size=2, timeout=0.05):
+        self.connect = mock.Mock(side_effect=mock.Mock)
+        return ConnectionPool('test', ping=mock.Mock(), max_size=max_size, timeout=timeout,
+                              max_lifetime=0, pre_ping_after=60)
+
+    def test_released_connection_is_reused(self):
+        pool = self.make_pool()
+        entry = pool.acquire(self.connect)
+        pool.release(entry)
+        self.assertEqual(pool.stats(), {'open': 1, 'idle': 1})
+        self.assertIs(pool.acquire(self.connect), entry)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_discarded_connection_is_closed(self):
+        pool = self.make_pool()
+        entry = pool.acquire(self.connect)
+        pool.release(entry, discard=True)
+        entry.raw.close.assert_called_once_with()
+        self.assertEqual(pool.stats(), {'open': 0, 'idle': 0})
+        self.assertIsNot(pool.acquire(self.connect).raw, entry.raw)
+
+    def test_checkout_times_out_when_pool_is_full(self):
+        pool = self.make_pool(max_size=1)
+        entry = pool.acquire(self.connect)
+        start = time.monotonic()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(self.connect.call_count, 1)
+        # 归还后可以再次取出
+        pool.release(entry)
+        self.assertIs(pool.acquire(self.connect), entry)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        entry = pool.acquire(self.connect)
+        timer = threading.Timer(0.05, pool.release, args=(entry,))
+        timer.start()
+        try:
+            self.assertIs(pool.acquire(self.connect), entry)
+        finally:
+            timer.join()
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    """连接池后端的 close() 在请求结束时归还连接，出错的连接不放回池中"""
+    # 独立的 ConnectionHandler 要求有 default 别名
+    alias = 'default'
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        handler = ConnectionHandler({self.alias: {
+            'ENGINE': 'wxcloudrun.dbpool.sqlite3',
+            'NAME': os.path.join(directory, 'pool.sqlite3'),
+            'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+        }})
+        self.connection = handler[self.alias]
+        # 测试设置的 default 不使用连接池，这里登记的连接池在测试结束时移除
+        self.assertNotIn(self.alias, dbpool._pools)
+        self.addCleanup(dbpool._pools.pop, self.alias, None)
+        self.addCleanup(lambda: self.connection.pool.close_all())
+        self.addCleanup(self.connection.close)
+
+    def checkout(self):
+        self.connection.ensure_connection()
+        return self.connection.connection
+
+    def test_connection_is_reused_after_close(self):
+        raw = self.checkout()
+        self.connection.close()
+        self.assertEqual(self.connection.pool.stats(), {'open': 1, 'idle': 1})
+        self.assertIs(self.checkout(), raw)
+
+    def test_connection_is_discarded_after_errors(self):
+        raw = self.checkout()
+        self.connection.errors_occurred = True
+        self.connection.close()
+        self.assertEqual(self.connection.pool.stats(), {'open': 0, 'idle': 0})
+        self.assertIsNot(self.checkout(), raw)
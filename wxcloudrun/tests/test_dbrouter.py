@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase
+
+from wxcloudrun.dbrouter import ReplicaSet, _sticky, note_user
+from wxcloudrun.middleware import ReplicaRoutingMiddleware
+from wxcloudrun.models import Employee, Notice
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """TestCase 把每个测试包在主库事务中，事务内的读查询都发往主库，这里不使用"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.now = 1000.0
+        self.replicas = ReplicaSet({'replica': 1}, settings.DB_REPLICA_RETRY_INTERVAL)
+        for patcher in (
+            mock.patch('wxcloudrun.dbrouter.replicas', self.replicas),
+            mock.patch('wxcloudrun.middleware.replicas', self.replicas),
+            # 副本暂停和读己之写的记录都按 time.monotonic 计时
+            mock.patch('time.monotonic', lambda: self.now),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        _sticky.clear()
+        self.factory = RequestFactory()
+
+    def request(self, method='get', user_id=1, write=False):
+        """执行一个请求，返回请求中的读查询分别发往了哪些别名"""
+        def view(request):
+            note_user(user_id)
+            if write:
+                Notice.objects.create(title='公告', date='2024-01-01')
+            list(Employee.objects.filter(pk=user_id))
+            return HttpResponse()
+
+        aliases = set()
+
+        def recorder(alias):
+            def record(execute, sql, params, many, context):
+                if 'FROM "employees"' in sql:
+                    aliases.add(alias)
+                return execute(sql, params, many, context)
+            return record
+
+        with connections['default'].execute_wrapper(recorder('default')), \
+                connections['replica'].execute_wrapper(recorder('replica')):
+            ReplicaRoutingMiddleware(view)(getattr(self.factory, method)('/'))
+        return aliases
+
+    def test_get_reads_go_to_replica(self):
+        self.assertEqual(self.request(), {'replica'})
+
+    def test_other_methods_use_primary(self):
+        self.assertEqual(self.request('post'), {'default'})
+
+    def test_reads_after_write_use_primary(self):
+        self.assertEqual(self.request(write=True), {'default'})
+
+    def test_writer_reads_primary_for_sticky_seconds(self):
+        self.request('post', user_id=7, write=True)
+        self.assertEqual(self.request(user_id=7), {'default'})
+        # 其他用户不受影响
+        self.assertEqual(self.request(user_id=8), {'replica'})
+        self.now += settings.DB_REPLICA_STICKY_SECONDS + 1
+        self.assertEqual(self.request(user_id=7), {'replica'})
+
+    def test_failed_replica_is_skipped_for_retry_interval(self):
+        replica = connections['replica']
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError('down')) as ensure, \
+                self.assertLogs('log', 'WARNING'):
+            self.assertEqual(self.request(), {'default'})
+            self.assertEqual(self.request(), {'default'})
+        self.assertEqual(ensure.call_count, 1)
+        self.now += settings.DB_REPLICA_RETRY_INTERVAL - 1
+        self.assertEqual(self.request(), {'default'})
+        self.now += 2
+        self.assertEqual(self.request(), {'replica'})
@@ -0,0 +1,37 @@
+import csv
+import io
+
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from wxcloudrun.models import Employee, Salary
+
+
+class SalaryExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create(
+            username='admin', employee_code='admin', name='管理员', role='admin'
+        )
+        employee = Employee.objects.create(username='E001', employee_code='E001', name='=张三')
+        Salary.objects.bulk_create(
+            Salary(employee=employee, period='2024-%02d' % month, base_salary=1000 * month, net_salary=900 * month)
+            for month in range(1, 13)
+        )
+
+    def token(self):
+        return str(RefreshToken.for_user(self.admin).access_token)
+
+    def read_rows(self, body):
+        return list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+
+    def test_export_over_wsgi_streams_all_rows(self):
+        response = self.client.get(
+            '/api/salaries/export/', {'period': '2024-03'}, HTTP_AUTHORIZATION='Bearer ' + self.token()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], "'=张三")
@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import TestCase
+
+from wxcloudrun import startup
+
+
+class HealthViewTests(TestCase):
+
+    def setUp(self):
+        startup._migrations_applied = False
+        self.addCleanup(setattr, startup, '_migrations_applied', False)
+
+    def test_ready_after_migrations_checks_only_select_1(self):
+        self.assertEqual(self.client.get('/health/').status_code, 200)
+        # 迁移检查的结果已记住，之后只执行 SELECT 1
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/health/').status_code, 200)
+
+    def test_not_ready_while_migrations_pending(self):
+        pending = {('wxcloudrun', '9999_pending')}
+        with mock.patch('wxcloudrun.startup.pending_migrations', return_value=pending):
+            response = self.client.get('/health/')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['message'], '数据库迁移未完成')
+        # 迁移执行后恢复就绪
+        self.assertEqual(self.client.get('/health/').status_code, 200)
+
+    def test_not_ready_when_query_fails(self):
+        with mock.patch.object(connection, 'cursor', side_effect=OperationalError('gone away')):
+            response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['message'], '数据库不可用')
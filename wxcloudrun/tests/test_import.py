@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from wxcloudrun.models import Employee, Job
+
+
+@override_settings(EMPLOYEE_IMPORT_MAX_ROWS=3, EMPLOYEE_IMPORT_WORKERS=4)
+class EmployeeImportViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create(username='admin', employee_code='admin', name='管理员', role='admin')
+
+    def post(self, count):
+        lines = ['employee_code,name,password'] + ['E%03d,员工%d,pass%d' % (i, i, i) for i in range(count)]
+        upload = SimpleUploadedFile('employees.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        # 接口不能在 Web 进程中创建进程池
+        with mock.patch('wxcloudrun.passwords.ProcessPoolExecutor', side_effect=AssertionError):
+            return self.client.post(
+                '/api/admin/employees/import/', {'file': upload}, HTTP_AUTHORIZATION='Bearer ' + token
+            )
+
+    def test_small_file_is_imported_in_request(self):
+        response = self.post(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(Employee.objects.filter(employee_code__startswith='E').count(), 3)
+        self.assertFalse(Job.objects.exists())
+
+    def test_large_file_is_submitted_as_job(self):
+        response = self.post(4)
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job']['id'])
+        self.assertEqual(job.kind, 'import_employees')
+        self.assertEqual(job.params['type'], 'csv')
+        self.assertEqual(bytes(job.payload).decode('utf-8').count('\n'), 4)
+        self.assertFalse(Employee.objects.filter(employee_code__startswith='E').exists())
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.test import TestCase
+
+from wxcloudrun.importers import import_salaries
+from wxcloudrun.models import Employee, Salary
+
+
+class SalaryImportTests(TestCase):
+
+    def setUp(self):
+        Employee.objects.create(username='E001', employee_code='E001', name='张三')
+
+    def rows(self, *rows):
+        return [(i, row, None) for i, row in enumerate(rows, start=2)]
+
+    def test_pay_date_is_optional(self):
+        report = import_salaries(self.rows(
+            {'employee_code': 'E001', 'period': '2024-01', 'base_salary': '1000'},
+            {'employee_code': 'E001', 'period': '2024-02', 'base_salary': '1000', 'pay_date': '2024-03-10'},
+        ))
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            list(Salary.objects.order_by('period').values_list('period', 'pay_date')),
+            [('2024-01', None), ('2024-02', date(2024, 3, 10))],
+        )
+
+    def test_invalid_pay_date_is_rejected(self):
+        report = import_salaries(self.rows({'employee_code': 'E001', 'period': '2024-01', 'pay_date': '2024/01/10'}))
+        self.assertEqual(report.created, 0)
+        self.assertEqual(report.errors[0]['errors'], {'pay_date': '日期格式应为YYYY-MM-DD'})
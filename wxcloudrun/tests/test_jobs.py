@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from wxcloudrun import jobs
+from wxcloudrun.jobs import JOB_KINDS, claim_job, execute_job, submit_job
+from wxcloudrun.models import Job
+
+
+def skip_locked(supported):
+    return mock.patch.object(connection.features, 'has_select_for_update_skip_locked', supported)
+
+
+class ClaimJobTests(TestCase):
+
+    def setUp(self):
+        self.jobs = [Job.objects.create(kind='payroll', params={'period': '2024-01'}) for _ in range(3)]
+
+    def test_each_job_is_claimed_once(self):
+        for supported in (True, False):
+            with self.subTest(skip_locked=supported), skip_locked(supported):
+                Job.objects.update(status=Job.PENDING, worker='', attempts=0)
+                claimed = []
+                for worker in ('a', 'b', 'a', 'b'):
+                    job = claim_job(worker)
+                    if job is not None:
+                        claimed.append(job.pk)
+                        self.assertEqual((job.status, job.worker, job.attempts), (Job.RUNNING, worker, 1))
+                self.assertEqual(claimed, [job.pk for job in self.jobs])
+
+    def test_candidate_is_locked_with_skip_locked(self):
+        with skip_locked(True), \
+                mock.patch.object(Job.objects, 'select_for_update', wraps=Job.objects.select_for_update) as lock:
+            self.assertEqual(claim_job('a').pk, self.jobs[0].pk)
+        lock.assert_called_once_with(skip_locked=True)
+
+    def test_conditional_claim_skips_job_taken_by_another_worker(self):
+        real = jobs._mark_running
+        raced = []
+
+        def mark_running(queryset, worker):
+            # 读取待执行任务之后、更新之前，另一个 worker 领取了第一个任务
+            if not raced:
+                raced.append(real(Job.objects.filter(pk=self.jobs[0].pk), 'a'))
+            return real(queryset, worker)
+
+        with skip_locked(False), mock.patch('wxcloudrun.jobs._mark_running', side_effect=mark_running):
+            job = claim_job('b')
+        self.assertEqual(job.pk, self.jobs[1].pk)
+        first = Job.objects.get(pk=self.jobs[0].pk)
+        self.assertEqual((first.worker, first.attempts), ('a', 1))
+
+
+class ExecuteJobTests(TestCase):
+
+    def submit(self, run):
+        with mock.patch.dict(JOB_KINDS, {'test': (lambda data, upload: {}, run)}):
+            submit_job('test', {})
+            job = claim_job('a')
+            return job, execute_job(job)
+
+    def test_result_is_saved(self):
+        job, ok = self.submit(lambda job, progress: {'count': 1})
+        self.assertTrue(ok)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error), (Job.SUCCEEDED, {'count': 1}, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_is_marked_failed(self):
+        def run(job, progress):
+            raise ValueError('文件格式错误')
+
+        with self.assertLogs('log', 'ERROR'):
+            job, ok = self.submit(run)
+        self.assertFalse(ok)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.result), (Job.FAILED, '文件格式错误', None))
+        self.assertIsNone(job.payload)
+        self.assertIsNotNone(job.finished_at)
@@ -0,0 +1,51 @@
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+from wxcloudrun.logutils import TRUNCATED, DailyFileHandler, JsonFormatter
+
+
+def _write_records(filename, worker, count):
+    handler = DailyFileHandler(filename)
+    handler.setFormatter(JsonFormatter(max_bytes=4096))
+    for i in range(count):
+        record = logging.LogRecord('log', logging.INFO, __file__, 1, '%s-%s %s', (worker, i, '日志' * 600), None)
+        handler.handle(record)
+    handler.close()
+
+
+class DailyFileHandlerTests(TestCase):
+
+    def test_processes_appending_to_one_file_write_whole_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'all.log')
+            processes = [
+                multiprocessing.Process(target=_write_records, args=(filename, worker, 300))
+                for worker in range(4)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+
+            handler = DailyFileHandler(filename)
+            with open(handler.baseFilename, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1200)
+        messages = {json.loads(line)['message'].split(' ')[0] for line in lines}
+        self.assertEqual(len(messages), 1200)
+
+    def test_formatter_truncates_to_max_bytes(self):
+        try:
+            raise ValueError('失败' * 2000)
+        except ValueError:
+            exc_info = sys.exc_info()
+        record = logging.LogRecord('log', logging.ERROR, __file__, 1, '出错了 %s', ('原因' * 2000,), exc_info)
+        text = JsonFormatter(max_bytes=4096).format(record)
+        self.assertLessEqual(len(text.encode('utf-8')) + 1, 4096)
+        data = json.loads(text)
+        self.assertTrue(data['exception'].endswith(TRUNCATED))
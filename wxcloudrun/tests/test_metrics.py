@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from wxcloudrun.metrics import (
+    _read_snapshots, _snapshot_path, clear_snapshots, db_pool_connections, http_requests, mark_process_dead, registry,
+)
+
+
+class MetricsSnapshotTests(SimpleTestCase):
+
+    def write(self, directory, pid, requests, connections):
+        snapshot = {
+            http_requests.name: [[['notice-list', 'GET', '200'], requests]],
+            db_pool_connections.name: [[['default', 'open'], connections]],
+        }
+        with open(_snapshot_path(directory, pid), 'w') as f:
+            json.dump(snapshot, f)
+
+    def test_dead_process_keeps_counters_but_drops_gauges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.write(directory, 101, 5, 3)
+            self.write(directory, 102, 7, 4)
+            mark_process_dead(directory, 101)
+            text = registry.render(_read_snapshots(directory))
+        self.assertIn('http_requests_total{route="notice-list",method="GET",status="200"} 12', text)
+        self.assertIn('db_pool_connections{alias="default",state="open"} 4', text)
+
+    def test_clear_snapshots_removes_previous_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.write(directory, 101, 5, 3)
+            clear_snapshots(directory)
+            self.assertEqual(os.listdir(directory), [])
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    @override_settings(METRICS_TOKEN='')
+    def test_not_exposed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_requires_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_requests_total', response.content)
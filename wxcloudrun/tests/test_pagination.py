@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from wxcloudrun.models import Employee, Salary
+from wxcloudrun.pagination import SalaryPagination
+
+
+def encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+class PositionFilterTests(TestCase):
+
+    def test_seek_predicate_is_or_expanded(self):
+        created_at = datetime(2024, 1, 1, 12, 0)
+        condition = SalaryPagination().get_position_filter([created_at, 7])
+        self.assertEqual(condition, Q(created_at__lt=created_at) | (Q(id__lt=7) & Q(created_at=created_at)))
+
+
+class SalaryKeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Employee.objects.create(username='admin', employee_code='admin', name='管理员', role='admin')
+        employee = Employee.objects.create(username='E001', employee_code='E001', name='张三')
+        Salary.objects.bulk_create(Salary(employee=employee, period='2024-%02d' % m) for m in range(1, 8))
+        # 多条工资单的创建时间相同，需要按 id 区分先后
+        times = [datetime(2024, 1, 3), datetime(2024, 1, 2), datetime(2024, 1, 2), datetime(2024, 1, 2),
+                 datetime(2024, 1, 2), datetime(2024, 1, 1), datetime(2024, 1, 1)]
+        for salary, created_at in zip(Salary.objects.order_by('id'), times):
+            Salary.objects.filter(pk=salary.pk).update(created_at=created_at)
+
+    def get(self, url, params=None):
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        return self.client.get(url, params, HTTP_AUTHORIZATION='Bearer ' + token)
+
+    def test_pages_follow_created_at_then_id_without_gaps(self):
+        expected = list(Salary.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen = []
+        response = self.get('/api/salaries/', {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(set(data), {'next', 'results'})
+            seen.extend(item['id'] for item in data['results'])
+            if data['next'] is None:
+                break
+            response = self.get(data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursor_returns_404(self):
+        for cursor in ('!!!', encode({'a': 1}), encode(['2024-01-01 00:00:00']), encode(['not a date', '1']),
+                       encode(['2024-01-01 00:00:00', 'x'])):
+            with self.subTest(cursor=cursor):
+                response = self.get('/api/salaries/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], '无效的游标')
@@ -0,0 +1,110 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from wxcloudrun import payroll
+from wxcloudrun.models import Employee, PayProfile, PayrollAggregate, Salary
+from wxcloudrun.payroll import AMOUNT_FIELDS, MAX_AMOUNT, compute_batch, run_payroll, update_salaries
+
+
+class ComputeBatchTests(TestCase):
+
+    def test_numpy_and_python_paths_agree(self):
+        columns = {f: [i * 100 + 1, -i, 0] for i, f in enumerate(AMOUNT_FIELDS)}
+        expected = {
+            'total_income': [1 + 101 + 201 + 301 + 401, -10, 0],
+            'total_deduction': [501 + 601 + 701 + 801, -26, 0],
+        }
+        expected['net_salary'] = [i - d for i, d in zip(expected['total_income'], expected['total_deduction'])]
+        with mock.patch('wxcloudrun.payroll.load_numpy', return_value=None):
+            self.assertEqual(compute_batch(columns), expected)
+        if payroll.load_numpy() is not None:
+            self.assertEqual(compute_batch(columns), expected)
+
+
+class RunPayrollTests(TestCase):
+
+    def setUp(self):
+        self.employees = [
+            Employee.objects.create(username='E%03d' % i, employee_code='E%03d' % i, name='员工%d' % i, department='研发部')
+            for i in range(3)
+        ]
+        for employee in self.employees[:2]:
+            PayProfile.objects.create(
+                employee=employee, base_salary=Decimal('8000.00'), allowance=Decimal('500.50'),
+                social_security=Decimal('800.00'), income_tax=Decimal('120.25'),
+            )
+
+    def test_creates_slips_from_profiles(self):
+        result = run_payroll('2024-01', batch_size=1)
+        self.assertEqual((result.created, result.updated, result.skipped, result.rejected), (2, 0, 1, 0))
+        salary = Salary.objects.get(employee=self.employees[0], period='2024-01')
+        self.assertEqual(salary.total_income, Decimal('8500.50'))
+        self.assertEqual(salary.total_deduction, Decimal('920.25'))
+        self.assertEqual(salary.net_salary, Decimal('7580.25'))
+        self.assertEqual(PayrollAggregate.objects.get(period='2024-01').net_salary, Decimal('15160.50'))
+
+    def test_update_keeps_variable_fields(self):
+        Salary.objects.create(
+            employee=self.employees[0], period='2024-01', base_salary=Decimal('1.00'),
+            overtime_pay=Decimal('300.00'), bonus=Decimal('1000.00'), net_salary=Decimal('1301.00'),
+        )
+        result = run_payroll('2024-01')
+        self.assertEqual((result.created, result.updated), (1, 1))
+        salary = Salary.objects.get(employee=self.employees[0], period='2024-01')
+        self.assertEqual(salary.base_salary, Decimal('8000.00'))
+        self.assertEqual(salary.overtime_pay, Decimal('300.00'))
+        self.assertEqual(salary.bonus, Decimal('1000.00'))
+        self.assertEqual(salary.total_income, Decimal('9800.50'))
+        self.assertEqual(salary.net_salary, Decimal('8880.25'))
+
+    def test_overflowing_totals_are_rejected(self):
+        PayProfile.objects.filter(employee=self.employees[1]).update(base_salary=MAX_AMOUNT)
+        with self.assertLogs('log', 'WARNING'):
+            result = run_payroll('2024-01')
+        self.assertEqual((result.created, result.rejected), (1, 1))
+        self.assertFalse(Salary.objects.filter(employee=self.employees[1]).exists())
+
+    def test_conflicting_insert_reruns_the_period(self):
+        # 第一次读取已有工资单时漏掉了核算期间插入的工资单，写入时唯一键冲突
+        Salary.objects.create(employee=self.employees[0], period='2024-01', bonus=Decimal('50.00'))
+        calls = []
+        real = payroll._existing_slips
+
+        def existing(period):
+            calls.append(period)
+            return {} if len(calls) == 1 else real(period)
+
+        with mock.patch('wxcloudrun.payroll._existing_slips', side_effect=existing), self.assertLogs('log', 'WARNING'):
+            result = run_payroll('2024-01')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Salary.objects.get(employee=self.employees[0], period='2024-01').bonus, Decimal('50.00'))
+
+
+class UpdateSalariesTests(TestCase):
+
+    def setUp(self):
+        employee = Employee.objects.create(username='E001', employee_code='E001', name='张三')
+        self.salaries = [Salary.objects.create(employee=employee, period='2024-%02d' % m) for m in range(1, 6)]
+
+    def update(self):
+        for i, salary in enumerate(self.salaries):
+            salary.base_salary = Decimal('1000.10') * (i + 1)
+            salary.net_salary = -Decimal('0.01') * i
+        update_salaries(self.salaries, ['base_salary', 'net_salary'], batch_size=2)
+        return list(Salary.objects.order_by('period').values_list('base_salary', 'net_salary'))
+
+    def expected(self):
+        return [(Decimal('1000.10') * (i + 1), -Decimal('0.01') * i) for i in range(5)]
+
+    def test_raw_case_update_on_sqlite(self):
+        self.assertEqual(connection.vendor, 'sqlite')
+        with mock.patch.object(Salary.objects, 'bulk_update', side_effect=AssertionError):
+            self.assertEqual(self.update(), self.expected())
+
+    def test_other_databases_fall_back_to_bulk_update(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(self.update(), self.expected())
@@ -0,0 +1,17 @@
+from django.test import TestCase
+
+from wxcloudrun.management.commands.check_query_plans import explain_full_scans, query_shapes, seed
+
+
+class QueryPlanTests(TestCase):
+    """各接口的查询在按迁移建出的表上都命中索引（与 check_query_plans 命令相同的检查）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sample = seed(employee_count=500, months=6, notice_count=50)
+
+    def test_endpoint_queries_do_not_scan_tables(self):
+        for name, queryset in query_shapes(*self.sample).items():
+            with self.subTest(query=name):
+                scans, plan = explain_full_scans(queryset)
+                self.assertEqual(scans, [], plan)
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from wxcloudrun.models import Employee
+from wxcloudrun.search import EmployeeIndex
+from wxcloudrun.versioning import EMPLOYEES, bump_versions
+
+
+class EmployeeIndexSyncTests(TestCase):
+    """其他进程的写入（不经过本进程的信号）在搜索时同步"""
+
+    def setUp(self):
+        self.employees = [
+            Employee.objects.create(username='E%03d' % i, employee_code='E%03d' % i, name='员工%d' % i)
+            for i in range(5)
+        ]
+        self.index = EmployeeIndex()
+        self.index.ensure_fresh()
+
+    def codes(self, query):
+        ids = self.index.search(query).ids
+        return sorted(Employee.objects.filter(pk__in=ids).values_list('employee_code', flat=True))
+
+    def test_sync_applies_updates_deletes_and_late_rows(self):
+        Employee.objects.filter(pk=self.employees[0].pk).update(name='张三', updated_at=timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM employees WHERE id = %s', [self.employees[1].pk])
+        # 提交较晚、updated_at 早于上次同步的员工
+        late = Employee.objects.create(username='E100', employee_code='E100', name='迟到')
+        Employee.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        bump_versions(EMPLOYEES)
+
+        self.index.ensure_fresh()
+        self.assertEqual(self.codes('张三'), ['E000'])
+        self.assertEqual(self.codes('E001'), [])
+        self.assertEqual(self.codes('迟到'), ['E100'])
+        self.assertNotIn(self.employees[1].pk, self.index.docs)
+
+    def test_sync_reads_database_without_holding_index_lock(self):
+        held = []
+
+        def record(execute, sql, params, many, context):
+            held.append(self.index._lock._is_owned())
+            return execute(sql, params, many, context)
+
+        Employee.objects.filter(pk=self.employees[0].pk).update(name='李四', updated_at=timezone.now())
+        bump_versions(EMPLOYEES)
+        with connection.execute_wrapper(record):
+            self.index.ensure_fresh()
+        self.assertTrue(held)
+        self.assertFalse(any(held))
+        self.assertEqual(self.codes('李四'), ['E000'])
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from wxcloudrun.authentication import load_user_data, user_cache
+from wxcloudrun.models import DepartmentHeadcount, Employee, PayrollAggregate, ResourceVersion, Salary
+from wxcloudrun.wechat import find_employee, openid_cache
+
+
+class SignalReceiverTests(TestCase):
+    """各模块在 AppConfig.ready 中连接的信号处理函数"""
+
+    def setUp(self):
+        self.employee = Employee.objects.create(
+            username='E001', employee_code='E001', name='张三', department='研发部', wechat_openid='openid-1'
+        )
+
+    def version(self, scope):
+        return ResourceVersion.objects.filter(scope=scope).values_list('version', flat=True).first() or 0
+
+    def test_salary_changes_update_aggregates_and_versions(self):
+        salary = Salary.objects.create(employee=self.employee, period='2024-01', net_salary=100)
+        aggregate = PayrollAggregate.objects.get(period='2024-01', department='研发部')
+        self.assertEqual((aggregate.slip_count, aggregate.net_salary), (1, Decimal('100')))
+
+        salary.period = '2024-02'
+        salary.save()
+        self.assertEqual(PayrollAggregate.objects.get(period='2024-01', department='研发部').slip_count, 0)
+        self.assertEqual(PayrollAggregate.objects.get(period='2024-02', department='研发部').slip_count, 1)
+        self.assertEqual(self.version('salaries:period:2024-01'), 2)
+        self.assertEqual(self.version('salaries:period:2024-02'), 1)
+
+    def test_department_change_moves_headcount(self):
+        self.employee.department = '市场部'
+        self.employee.save()
+        headcounts = dict(DepartmentHeadcount.objects.values_list('department', 'headcount'))
+        self.assertEqual(headcounts, {'研发部': 0, '市场部': 1})
+
+    def test_employee_save_clears_process_caches(self):
+        load_user_data(self.employee.pk)
+        find_employee('openid-1')
+        self.employee.wechat_openid = 'openid-2'
+        self.employee.save()
+        self.assertIsNone(user_cache.get(self.employee.pk))
+        self.assertIsNone(openid_cache.get('openid-1'))
+        self.assertIsNone(find_employee('openid-1'))
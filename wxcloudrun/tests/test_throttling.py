@@ -0,0 +1,77 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from wxcloudrun.passwords import HashingBusy, HashingPool
+from wxcloudrun.throttling import TokenBucketLimiter
+
+
+class TokenBucketLimiterTests(SimpleTestCase):
+
+    def test_zero_rate_is_unthrottled(self):
+        limiter = TokenBucketLimiter(0, 0)
+        self.assertEqual([limiter.consume('key') for _ in range(100)], [0] * 100)
+
+    def test_buckets_are_per_key(self):
+        limiter = TokenBucketLimiter(2, 1 / 60.0)
+        self.assertEqual([limiter.consume('a'), limiter.consume('a')], [0, 0])
+        wait = limiter.consume('a')
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 60)
+        self.assertEqual(limiter.consume('b'), 0)
+
+
+@override_settings(TRUSTED_PROXY_COUNT=1)
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        for name in ('login_ip_limiter', 'login_code_limiter'):
+            patcher = mock.patch('wxcloudrun.views.%s' % name, TokenBucketLimiter(3, 1 / 60.0))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def login(self, code, ip):
+        return self.client.post(
+            '/api/employees/login/', {'employee_code': code, 'password': 'wrong'},
+            content_type='application/json', HTTP_X_FORWARDED_FOR='1.1.1.1, %s' % ip,
+        ).status_code
+
+    def test_limit_applies_per_code(self):
+        statuses = [self.login('E001', '10.0.0.%d' % i) for i in range(4)]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertEqual(self.login('E002', '10.0.0.9'), 401)
+
+    def test_limit_applies_per_ip(self):
+        # 只有可信代理追加的最后一个地址用于识别客户端，伪造的左侧地址不影响计数
+        statuses = [self.login('E%03d' % i, '10.0.0.1') for i in range(4)]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertEqual(self.login('E100', '10.0.0.2'), 401)
+
+    @mock.patch('wxcloudrun.views.login_code_limiter', TokenBucketLimiter(0, 0))
+    @mock.patch('wxcloudrun.views.login_ip_limiter', TokenBucketLimiter(0, 0))
+    def test_zero_rate_disables_login_throttling(self):
+        self.assertEqual({self.login('E001', '10.0.0.1') for _ in range(10)}, {401})
+
+
+class HashingPoolTests(SimpleTestCase):
+
+    def test_full_pool_fails_fast(self):
+        pool = HashingPool(workers=1, max_pending=0, wait_timeout=0.05)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return True
+
+        thread = threading.Thread(target=pool.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingBusy):
+                pool.run(lambda: True)
+        finally:
+            release.set()
+            thread.join()
+        self.assertTrue(pool.run(lambda: True))
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import SimpleTestCase, TestCase
+
+from wxcloudrun.models import Employee
+from wxcloudrun.wechat import WechatClient, WechatError, WechatUnavailable, find_employee, openid_cache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按路径依次返回预设的 (状态码, 响应体)，最后一个响应重复使用"""
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        server = self.server
+        with server.lock:
+            server.calls.append((parts.path, parse_qs(parts.query), body))
+            responses = server.responses[parts.path]
+            status, payload = responses.pop(0) if len(responses) > 1 else responses[0]
+        if callable(payload):
+            payload = payload(parse_qs(parts.query))
+        time.sleep(server.delay)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WechatClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.responses = {}
+        self.server.delay = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.client = WechatClient(
+            'appid', 'secret', 'http://127.0.0.1:%s' % self.server.server_port,
+            pool_size=20, timeout=5, max_retries=2, refresh_ahead=300,
+        )
+
+    def tearDown(self):
+        self.client.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def calls(self, path):
+        return [call for call in self.server.calls if call[0] == path]
+
+    def test_code2session_retries_server_errors(self):
+        self.server.responses['/sns/jscode2session'] = [
+            (502, {}), (503, {}), (200, {'openid': 'o1', 'session_key': 'k'}),
+        ]
+        self.assertEqual(self.client.code2session('c1')['openid'], 'o1')
+        calls = self.calls('/sns/jscode2session')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0][1]['js_code'], ['c1'])
+
+    def test_code2session_gives_up_after_max_retries(self):
+        self.server.responses['/sns/jscode2session'] = [(500, {})]
+        with self.assertRaises(WechatUnavailable):
+            self.client.code2session('c1')
+        self.assertEqual(len(self.calls('/sns/jscode2session')), 3)
+
+    def test_errcode_raises_without_retry(self):
+        self.server.responses['/sns/jscode2session'] = [(200, {'errcode': 40029, 'errmsg': 'invalid code'})]
+        with self.assertRaises(WechatError) as cm:
+            self.client.code2session('bad')
+        self.assertEqual(cm.exception.errcode, 40029)
+        self.assertEqual(len(self.calls('/sns/jscode2session')), 1)
+
+    def test_concurrent_callers_share_one_refresh(self):
+        self.server.responses['/cgi-bin/stable_token'] = [(200, {'access_token': 't1', 'expires_in': 7200})]
+        self.server.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.client.get_access_token())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['t1'] * 10)
+        calls = self.calls('/cgi-bin/stable_token')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][2]['force_refresh'], False)
+
+    def test_token_errcode_refreshes_token_once(self):
+        self.server.responses['/cgi-bin/stable_token'] = [
+            (200, {'access_token': 't1', 'expires_in': 7200}),
+            (200, {'access_token': 't2', 'expires_in': 7200}),
+        ]
+        self.server.responses['/cgi-bin/get_api_domain_ip'] = [(200, lambda query: (
+            {'ip_list': ['1.1.1.1']} if query['access_token'] == ['t2'] else {'errcode': 40001, 'errmsg': 'invalid'}
+        ))]
+        self.assertEqual(self.client.get_api_domain_ip(), ['1.1.1.1'])
+        self.assertEqual(len(self.calls('/cgi-bin/stable_token')), 2)
+        self.assertEqual(self.client.get_access_token(), 't2')
+
+    def test_token_errcode_is_not_retried_twice(self):
+        self.server.responses['/cgi-bin/stable_token'] = [(200, {'access_token': 't1', 'expires_in': 7200})]
+        self.server.responses['/cgi-bin/get_api_domain_ip'] = [(200, {'errcode': 42001, 'errmsg': 'expired'})]
+        with self.assertRaises(WechatError):
+            self.client.get_api_domain_ip()
+        self.assertEqual(len(self.calls('/cgi-bin/get_api_domain_ip')), 2)
+
+
+class FindEmployeeTests(TestCase):
+
+    def setUp(self):
+        openid_cache.clear()
+        self.employee = Employee.objects.create(
+            username='E001', employee_code='E001', name='张三', wechat_openid='o1')
+
+    def test_cache_hit_confirms_binding(self):
+        self.assertEqual(find_employee('o1')[0], self.employee.id)
+        # 其他进程改绑（不经过本进程的信号）
+        Employee.objects.filter(pk=self.employee.pk).update(wechat_openid='o2')
+        self.assertIsNone(find_employee('o1'))
+        self.assertEqual(find_employee('o2')[0], self.employee.id)
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class TokenBucketLimiter:
+    """进程内令牌桶限流
+
+    每个 key 一个桶，容量为 capacity，每秒补充 rate 个令牌。
+    桶按 LRU 淘汰，最多保留 max_keys 个，内存占用有上限。
+    rate 不大于 0 时不限流。
+    """
+
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, tokens=1):
+        """尝试取出令牌，成功返回 0，否则返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            available, updated = self._buckets.pop(key, (self.capacity, now))
+            available = min(self.capacity, available + (now - updated) * self.rate)
+            if available >= tokens:
+                available -= tokens
+                wait = 0
+            else:
+                wait = (tokens - available) / self.rate
+            self._buckets[key] = (available, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def get_client_ip(request):
+    """获取客户端IP
+
+    X-Forwarded-For 左侧的地址可由客户端任意伪造，只有可信代理追加的地址可信：
+    经过 TRUSTED_PROXY_COUNT 层代理时取右数第 TRUSTED_PROXY_COUNT 个地址，
+    为 0 或地址数不足时取 REMOTE_ADDR。
+    """
+    count = settings.TRUSTED_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if count > 0 and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        if len(hops) >= count:
+            return hops[-count]
+    return request.META.get('REMOTE_ADDR', '')
@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import (
     EmployeeViewSet, SalaryViewSet, 
-    NoticeViewSet, AdminViewSet
+    NoticeViewSet, AdminViewSet, JobViewSet
 )
+from .views import health_view, metrics_view
 
 # 创建路由器
 router = DefaultRouter()
@@ -12,6 +13,7 @@ router.register(r'employees', EmployeeViewSet, basename='employee')
 router.register(r'salaries', SalaryViewSet, basename='salary')
 router.register(r'notices', NoticeViewSet, basename='notice')
 router.register(r'admin', AdminViewSet, basename='admin')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     # API路由
@@ -21,6 +23,10 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
-    # 健康检查
-    path('health/', lambda request: {'status': 'OK', 'message': '服务器运行正常'}),
+    # Prometheus 指标
+    path('metrics', metrics_view, name='metrics'),
+
+    # 就绪检查
+    path('health/', health_view, name='health'),
 ]
+
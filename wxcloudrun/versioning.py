@@ -0,0 +1,98 @@
+"""资源版本号
+
+每个资源范围（scope）在 resource_versions 表中有一个递增的版本号，
+数据变更时递增，读取时只需一次主键级别的查询，用于生成 ETag。
+版本号保存在数据库中，多进程、多实例部署时同样一致。
+
+工资单使用的范围：
+- salaries:bulk：批量导入、批量核算等不经过信号的写入；
+- salaries:employee:<id>：单个员工的工资单变更；
+- salaries:period:<月份>：某个月份的工资单变更（含员工调整部门），用于分析快照。
+员工查看自己的工资单时，版本由 salaries:bulk 和自己的范围共同决定；管理员查看
+全部工资单时取所有月份范围的版本号之和（get_prefix_version），不设全局范围，
+避免每次保存工资单都更新同一行。
+公告不使用版本号，由 notices_version 从 notices 表聚合；employee:<id> 在员工信息变更时递增；
+employees 在任意员工的搜索字段变更或批量新增员工时递增，用于同步搜索索引。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Employee, Notice, ResourceVersion, Salary
+
+SALARIES_BULK = 'salaries:bulk'
+EMPLOYEES = 'employees'
+PERIOD_SCOPE_PREFIX = 'salaries:period:'
+
+
+def employee_salaries_scope(employee_id):
+    return 'salaries:employee:%s' % employee_id
+
+
+def period_scope(period):
+    return PERIOD_SCOPE_PREFIX + period
+
+
+def employee_scope(employee_id):
+    return 'employee:%s' % employee_id
+
+
+def bump_versions(*scopes):
+    """递增版本号，不存在的范围自动创建"""
+    now = timezone.now()
+    for scope in scopes:
+        updated = ResourceVersion.objects.filter(scope=scope).update(version=F('version') + 1, updated_at=now)
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(scope=scope, version=1)
+        except IntegrityError:
+            # 并发创建，对方已插入
+            ResourceVersion.objects.filter(scope=scope).update(version=F('version') + 1, updated_at=now)
+
+
+def get_versions(scopes):
+    """返回 {scope: (version, updated_at)}，不存在的范围不在结果中"""
+    return {
+        scope: (version, updated_at)
+        for scope, version, updated_at in ResourceVersion.objects.filter(
+            scope__in=scopes).values_list('scope', 'version', 'updated_at')
+    }
+
+
+def notices_version():
+    """公告的版本：最新创建时间和条数，直接由 notices 表聚合得到
+
+    批量插入、原生 SQL 等不触发信号的写入同样会改变它；按创建时间倒序的索引取最大值。
+    """
+    row = Notice.objects.aggregate(latest=Max('created_at'), count=Count('id'))
+    return row['latest'].isoformat() if row['latest'] else '', row['count']
+
+
+def get_prefix_version(prefix):
+    """前缀下所有范围的版本号之和；版本号只增不减，任一范围递增时总和随之增大"""
+    return ResourceVersion.objects.filter(scope__startswith=prefix).aggregate(total=Sum('version'))['total'] or 0
+
+
+# 单条写入时递增版本号（信号在 AppConfig.ready 中连接）
+
+def bump_employee_version(sender, instance, **kwargs):
+    bump_versions(employee_scope(instance.pk))
+
+
+def bump_salary_versions(sender, instance, **kwargs):
+    """工资单变更后递增本人和所在月份的版本号；改了月份时原月份也递增"""
+    scopes = {employee_salaries_scope(instance.employee_id), period_scope(instance.period)}
+    # 保存前的月份由 aggregates.remember_salary_totals 记录
+    previous = getattr(instance, '_previous_totals', None)
+    if previous is not None:
+        scopes.add(period_scope(previous['period']))
+    bump_versions(*scopes)
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(bump_employee_version, sender=Employee, dispatch_uid='versioning_employee')
+        signal.connect(bump_salary_versions, sender=Salary, dispatch_uid='versioning_salary')
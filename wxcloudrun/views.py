@@ -1,11 +1,43 @@
+from itertools import islice
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.utils.urls import replace_query_param
+from django.utils.crypto import constant_time_compare
 from django.utils import timezone
 from django.db.models import Count, Sum, Q
-from .models import Employee, Salary, Notice
+from .models import Employee, Salary, Notice, Job
+from .aggregates import period_totals, recent_periods, total_headcount
+from .analytics import (
+    get_snapshots, group_by_department, histogram, parse_field, parse_percentiles, parse_periods,
+    select_values, summarize
+)
+from .conditional import conditional, employee_stats_state, notices_state, salaries_state
+from .dashboard import get_dashboard
+from .departments import get_rollup, member_salaries
+from .fastlist import FastListMixin
+from .fieldsets import SparseFieldsMixin
+from .jobs import serialize_job, submit_job
+from .payroll import AMOUNT_FIELDS, compute_totals, is_valid_period, to_amount
+from .permissions import IsAdminRole
+from .search import search_employees
+from .startup import migrations_applied
+from .pagination import EmployeePagination, KeysetPagination, SalaryPagination
+from .passwords import HashingBusy, get_hashing_pool, needs_rehash
+from .throttling import TokenBucketLimiter, get_client_ip
+from .wechat import WechatError, WechatUnavailable, find_employee, get_wechat_client
+from .metrics import render_metrics
+from .importers import detect_file_type, iter_rows, import_employees, import_salaries
+from .exporters import (
+    EXPORT_TYPES, SALARY_EXPORT_FIELDS, content_disposition, iter_keyset, stream_csv, stream_xlsx
+)
 from .serializers import (
     EmployeeSerializer, EmployeeDetailSerializer, SalarySerializer, 
     NoticeSerializer, LoginSerializer, 
@@ -13,10 +45,77 @@ from .serializers import (
 )
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+def filter_salaries(queryset, user, query_params):
+    """工资单列表的权限过滤和筛选条件"""
+    # 只能查看自己的工资单（除非是管理员）
+    if not user.role == 'admin':
+        queryset = queryset.filter(employee_id=user.id)
+
+    # 支持按月份筛选
+    employeeId = query_params.get('employeeId')
+    period = query_params.get('period')
+
+    if employeeId:
+        queryset = queryset.filter(employee_id=employeeId)
+    if period:
+        queryset = queryset.filter(period=period)
+
+    return queryset.order_by('-created_at')
+
+
+def current_month_salary(employee_id):
+    """员工本月实发工资"""
+    current_month = timezone.now().strftime('%Y-%m')
+    try:
+        salary = Salary.objects.get(employee_id=employee_id, period=current_month)
+        return float(salary.net_salary)
+    except Salary.DoesNotExist:
+        return 0
+
+
+def openid_from_code(code):
+    """小程序登录凭证换取 openid，返回 (openid, 错误响应)"""
+    client = get_wechat_client()
+    if not client.configured:
+        return None, Response(
+            {'success': False, 'message': '未配置微信小程序'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    try:
+        session = client.code2session(code)
+    except WechatError:
+        return None, Response(
+            {'success': False, 'message': '微信登录凭证无效或已过期'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except WechatUnavailable:
+        return None, Response(
+            {'success': False, 'message': '微信服务暂时不可用，请稍后再试'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return session['openid'], None
+
+
+def latest_notices():
+    """最新的5条公告"""
+    return Notice.objects.all().order_by('-created_at')[:5]
+
+
+# 登录限流：按工号和按IP分别计数
+login_code_limiter = TokenBucketLimiter(
+    settings.LOGIN_THROTTLE_CODE_BURST, settings.LOGIN_THROTTLE_CODE_PER_MINUTE / 60.0
+)
+login_ip_limiter = TokenBucketLimiter(
+    settings.LOGIN_THROTTLE_IP_BURST, settings.LOGIN_THROTTLE_IP_PER_MINUTE / 60.0
+)
+
+
+class EmployeeViewSet(SparseFieldsMixin, FastListMixin, viewsets.ModelViewSet):
     """员工视图集"""
     queryset = Employee.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = EmployeePagination
+    fieldset_actions = ('list', 'retrieve', 'search')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update']:
@@ -43,6 +142,18 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         employee_code = serializer.validated_data['employee_code']
         password = serializer.validated_data['password']
 
+        wait = max(
+            login_ip_limiter.consume(get_client_ip(request)),
+            login_code_limiter.consume(employee_code),
+        )
+        if wait:
+            response = Response(
+                {'success': False, 'message': '登录尝试过于频繁，请稍后再试'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(int(wait) + 1)
+            return response
+
         try:
             employee = Employee.objects.get(employee_code=employee_code)
         except Employee.DoesNotExist:
@@ -51,12 +162,29 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        if not employee.check_password(password):
+        pool = get_hashing_pool()
+        try:
+            valid = pool.run(employee.check_password, password)
+        except HashingBusy:
+            return Response(
+                {'success': False, 'message': '服务繁忙，请稍后再试'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if not valid:
             return Response(
                 {'success': False, 'message': '工号或密码错误'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
+        # bcrypt cost 调整后，在登录成功时按新 cost 重新哈希
+        if needs_rehash(employee.password):
+            try:
+                pool.run(employee.set_password, password)
+                employee.save(update_fields=['password'])
+            except HashingBusy:
+                pass
+
         # 生成JWT token
         refresh = RefreshToken.for_user(employee)
         
@@ -77,28 +205,27 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        code = serializer.validated_data['code']
-        # 这里应该调用微信API获取openid
-        # 简化处理，使用mock数据
-        mock_openid = f'mock_openid_{timezone.now().timestamp()}'
+        openid, error = openid_from_code(serializer.validated_data['code'])
+        if error is not None:
+            return error
 
-        try:
-            employee = Employee.objects.get(wechat_openid=mock_openid)
-        except Employee.DoesNotExist:
+        found = find_employee(openid)
+        if found is None:
             # 新用户需要绑定账号
             return Response({
                 'success': False,
                 'message': '请先使用工号和密码登录，然后在个人中心绑定微信'
             })
+        employee_id, profile = found
 
         # 生成JWT token
-        refresh = RefreshToken.for_user(employee)
+        refresh = RefreshToken.for_user(Employee(id=employee_id))
         
         return Response({
             'success': True,
             'token': str(refresh.access_token),
             'refresh_token': str(refresh),
-            'employee': EmployeeSerializer(employee).data
+            'employee': profile
         })
 
     @action(detail=False, methods=['post'])
@@ -111,11 +238,24 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        user_info = serializer.validated_data.get('userInfo', {})
-        mock_openid = f'mock_openid_{timezone.now().timestamp()}'
+        code = serializer.validated_data.get('code')
+        if not code:
+            return Response(
+                {'success': False, 'message': '缺少微信登录凭证code'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        openid, error = openid_from_code(code)
+        if error is not None:
+            return error
+        if Employee.objects.filter(wechat_openid=openid).exclude(pk=request.user.id).exists():
+            return Response(
+                {'success': False, 'message': '该微信已绑定其他账号'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        employee = request.user
-        employee.wechat_openid = mock_openid
+        user_info = serializer.validated_data.get('userInfo', {})
+        employee = Employee.objects.get(pk=request.user.id)
+        employee.wechat_openid = openid
         if user_info.get('avatarUrl'):
             employee.avatar_url = user_info.get('avatarUrl')
         employee.save()
@@ -123,47 +263,103 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         return Response({'success': True, 'message': '绑定成功'})
 
     @action(detail=False, methods=['get'])
-    def stats(self, request):
-        """获取统计数据"""
-        employee = request.user
-        
-        # 获取本月工资
-        current_month = timezone.now().strftime('%Y-%m')
+    def dashboard(self, request):
+        """首页数据：个人信息、本月工资、最近工资单、年度累计和最新公告
+
+        可选参数 recent 指定返回的最近工资单数。
+        """
+        try:
+            recent = int(request.query_params.get('recent', settings.DASHBOARD_RECENT_SALARIES))
+        except ValueError:
+            return Response(
+                {'success': False, 'message': 'recent 参数必须为整数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recent = min(max(recent, 1), settings.DASHBOARD_MAX_RECENT_SALARIES)
+
+        data = get_dashboard(request.user.id, timezone.now().strftime('%Y-%m'), recent)
+        if data is None:
+            return Response(
+                {'success': False, 'message': '员工不存在'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """搜索员工（仅管理员）
+
+        q 按姓名、工号、部门、职位、手机号做前缀和子串匹配，结果按匹配程度排序，
+        page / page_size 分页，支持 fields / omit。
+        """
+        if not request.user.role == 'admin':
+            return Response(
+                {'success': False, 'message': '权限不足'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        query = (request.query_params.get('q') or '').strip()
+        if not query or len(query) > settings.SEARCH_MAX_QUERY_LENGTH:
+            return Response(
+                {'success': False, 'message': '搜索关键词长度应为1-%d个字符' % settings.SEARCH_MAX_QUERY_LENGTH},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            salary = Salary.objects.get(employee=employee, period=current_month)
-            total_salary = float(salary.net_salary)
-        except Salary.DoesNotExist:
-            total_salary = 0
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            return Response(
+                {'success': False, 'message': 'page 参数必须为整数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = self.paginator.get_page_size(request)
+
+        result = search_employees(query)
+        ids = result.ids[(page - 1) * page_size:page * page_size]
+        # 当前页的员工从数据库读取，保证内容最新
+        position = {pk: i for i, pk in enumerate(ids)}
+        queryset = self.get_queryset().filter(id__in=ids)
+        if settings.FAST_LIST_SERIALIZATION:
+            values_serializer = self.get_values_serializer()
+            rows = sorted(values_serializer.values(queryset), key=lambda row: position[row['id']])
+            results = values_serializer.serialize(rows)
+        else:
+            employees = sorted(queryset, key=lambda employee: position[employee.id])
+            results = self.get_serializer(employees, many=True).data
+
+        next_link = None
+        if page * page_size < result.count:
+            next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return Response({
+            'success': True,
+            'count': result.count,
+            'truncated': result.truncated,
+            'next': next_link,
+            'results': results,
+        })
 
+    @action(detail=False, methods=['get'])
+    @conditional(employee_stats_state)
+    def stats(self, request):
+        """获取统计数据"""
         return Response({
             'success': True,
-            'totalSalary': total_salary
+            'totalSalary': current_month_salary(request.user.id)
         })
 
 
-class SalaryViewSet(viewsets.ModelViewSet):
+class SalaryViewSet(SparseFieldsMixin, FastListMixin, viewsets.ModelViewSet):
     """工资单视图集"""
     queryset = Salary.objects.all()
     serializer_class = SalarySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SalaryPagination
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # 只能查看自己的工资单（除非是管理员）
-        if not self.request.user.role == 'admin':
-            queryset = queryset.filter(employee=self.request.user)
-        
-        # 支持按月份筛选
-        employeeId = self.request.query_params.get('employeeId')
-        period = self.request.query_params.get('period')
-        
-        if employeeId:
-            queryset = queryset.filter(employee_id=employeeId)
-        if period:
-            queryset = queryset.filter(period=period)
-        
-        return queryset.order_by('-created_at')
+        return filter_salaries(super().get_queryset(), self.request.user, self.request.query_params)
+
+    @conditional(salaries_state)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         """生成工资单（仅管理员）"""
@@ -174,20 +370,18 @@ class SalaryViewSet(viewsets.ModelViewSet):
             )
 
         data = request.data.copy()
-        # 计算总收入和总扣除
-        total_income = (float(data.get('base_salary', 0)) + 
-                       float(data.get('performance_salary', 0)) + 
-                       float(data.get('overtime_pay', 0)) + 
-                       float(data.get('bonus', 0)) + 
-                       float(data.get('allowance', 0)))
-        total_deduction = (float(data.get('social_security', 0)) + 
-                          float(data.get('housing_fund', 0)) + 
-                          float(data.get('income_tax', 0)) + 
-                          float(data.get('other_deduction', 0)))
-        
-        data['total_income'] = total_income
-        data['total_deduction'] = total_deduction
-        data['net_salary'] = total_income - total_deduction
+        # 计算总收入和总扣除（Decimal精确计算）
+        amounts = {}
+        for field in AMOUNT_FIELDS:
+            try:
+                amounts[field] = to_amount(data.get(field, 0))
+            except ValueError as e:
+                return Response(
+                    {'success': False, 'message': '数据验证失败', 'errors': {field: [str(e)]}},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        for field, value in compute_totals(amounts).items():
+            data[field] = value
 
         serializer = self.get_serializer(data=data)
         if not serializer.is_valid():
@@ -203,48 +397,243 @@ class SalaryViewSet(viewsets.ModelViewSet):
             'salaryId': serializer.data['id']
         }, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """流式导出工资单，支持CSV和XLSX"""
+        file_type = (request.query_params.get('type') or 'csv').lower()
+        if file_type not in EXPORT_TYPES:
+            return Response(
+                {'success': False, 'message': '不支持的文件类型: %s' % file_type},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        period = request.query_params.get('period')
+        if period and not is_valid_period(period):
+            return Response(
+                {'success': False, 'message': '月份格式应为YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fields = [f for f, _ in SALARY_EXPORT_FIELDS]
+        header = [label for _, label in SALARY_EXPORT_FIELDS]
+        rows = iter_keyset(self.get_queryset(), fields, settings.SALARY_EXPORT_CHUNK_SIZE)
+
+        if file_type == 'xlsx':
+            content = stream_xlsx(header, rows)
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            content = stream_csv(header, rows)
+            content_type = 'text/csv; charset=utf-8'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = content_disposition('salaries-%s.%s' % (period or 'all', file_type))
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """批量导入工资单（仅管理员），支持CSV和JSON Lines"""
+        if not request.user.role == 'admin':
+            return Response(
+                {'success': False, 'message': '权限不足'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'success': False, 'message': '请上传文件'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            rows = iter_rows(upload, detect_file_type(upload, request.query_params.get('type')))
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = import_salaries(
+            rows,
+            chunk_size=settings.SALARY_IMPORT_CHUNK_SIZE,
+            batch_size=settings.SALARY_IMPORT_BATCH_SIZE,
+            max_errors=settings.SALARY_IMPORT_MAX_ERRORS,
+        )
+        return Response({
+            'success': True,
+            'message': '导入完成',
+            **report.to_dict()
+        })
+
 
-class NoticeViewSet(viewsets.ReadOnlyModelViewSet):
+class NoticeViewSet(SparseFieldsMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     """公告视图集"""
     queryset = Notice.objects.all().order_by('-created_at')
     serializer_class = NoticeSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        return queryset[:5]
+        # 列表只返回最新5条；详情需要按主键过滤，不能使用切片后的查询集
+        if self.action == 'list':
+            return latest_notices()
+        return super().get_queryset()
+
+    @conditional(notices_state)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
 
 class AdminViewSet(viewsets.ViewSet):
     """管理员视图集"""
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """获取全局统计
 
-    def initial(self, request, *args, **kwargs):
-        """检查管理员权限"""
-        if request.user.role != 'admin':
+        数据读取自汇总表，不扫描工资单明细。可选参数：
+        months 返回最近 N 个月的趋势，department 只统计指定部门。
+        """
+        department = request.query_params.get('department')
+        try:
+            months = int(request.query_params.get('months', 1))
+        except ValueError:
             return Response(
-                {'success': False, 'message': '权限不足'},
-                status=status.HTTP_403_FORBIDDEN
+                {'success': False, 'message': 'months 参数必须为整数'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        return super().initial(request, *args, **kwargs)
+        months = min(max(months, 1), settings.STATS_MAX_MONTHS)
+
+        periods = recent_periods(months, timezone.now())
+        totals = period_totals(periods, department)
+        current = totals.get(periods[-1], {})
+        data = {
+            'success': True,
+            'stats': {
+                'totalEmployees': total_headcount(department),
+                'totalSalary': int(current.get('net_salary') or 0)
+            }
+        }
+        if 'months' in request.query_params:
+            data['trend'] = []
+            for period in periods:
+                row = totals.get(period, {})
+                data['trend'].append({
+                    'period': period,
+                    'slipCount': row.get('slip_count') or 0,
+                    'totalIncome': int(row.get('total_income') or 0),
+                    'totalDeduction': int(row.get('total_deduction') or 0),
+                    'totalSalary': int(row.get('net_salary') or 0),
+                })
+        return Response(data)
 
     @action(detail=False, methods=['get'])
-    def stats(self, request):
-        """获取全局统计"""
-        total_employees = Employee.objects.count()
+    def departments(self, request):
+        """各部门的发薪人数、工资合计和人均
+
+        period 指定月份（默认当月），结果按月份版本号缓存。
+        """
+        period = request.query_params.get('period') or timezone.now().strftime('%Y-%m')
+        if not is_valid_period(period):
+            return Response(
+                {'success': False, 'message': '月份格式应为YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'success': True, 'period': period, **get_rollup(period)})
+
+    @action(detail=False, methods=['get'], url_path='departments/members')
+    def department_members(self, request):
+        """部门员工及其当月工资，按员工 id 游标分页
+
+        department 必填（空字符串表示未分配部门），period 默认当月，
+        当月没有工资单的员工 salary 为 null。
+        """
+        period = request.query_params.get('period') or timezone.now().strftime('%Y-%m')
+        department = request.query_params.get('department')
+        if department is None:
+            return Response(
+                {'success': False, 'message': '请指定部门'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not is_valid_period(period):
+            return Response(
+                {'success': False, 'message': '月份格式应为YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        current_month = timezone.now().strftime('%Y-%m')
-        salary_result = Salary.objects.filter(period=current_month).aggregate(
-            total=Sum('net_salary')
+        paginator = EmployeePagination()
+        members = paginator.paginate_queryset(
+            Employee.objects.filter(department=department).values('id', 'employee_code', 'name', 'position'),
+            request, view=self
         )
-        total_salary = int(salary_result['total'] or 0)
+        salaries = member_salaries(period, [member['id'] for member in members])
+        return Response({
+            'success': True,
+            'period': period,
+            'department': department,
+            'next': paginator.get_next_link(),
+            'results': [
+                {
+                    'id': member['id'],
+                    'employeeCode': member['employee_code'],
+                    'name': member['name'],
+                    'position': member['position'],
+                    'salary': salaries.get(member['id']),
+                }
+                for member in members
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """工资分布统计
+
+        在按月份生成的列式快照上计算，不扫描工资单明细。可选参数：
+        period 或 year 指定月份（默认当月），field 指定金额字段（默认 net_salary），
+        department 只统计指定部门，percentiles 指定百分位（默认 25,50,75,90），
+        groupBy=department 同时返回各部门的统计。
+        """
+        try:
+            periods = parse_periods(request.query_params, timezone.now())
+            field = parse_field(request.query_params)
+            percentiles = parse_percentiles(request.query_params)
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        snapshots = get_snapshots(periods)
+        values = select_values(snapshots, field, request.query_params.get('department'))
+        data = {
+            'success': True,
+            'periods': periods,
+            'field': field,
+            'stats': summarize(values, percentiles),
+        }
+        if request.query_params.get('groupBy') == 'department':
+            data['departments'] = group_by_department(snapshots, field, percentiles)
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='analytics/histogram')
+    def analytics_histogram(self, request):
+        """工资分布直方图，参数同 analytics，bins 指定区间数（默认20）"""
+        try:
+            periods = parse_periods(request.query_params, timezone.now())
+            field = parse_field(request.query_params)
+            bins = int(request.query_params.get('bins', 20))
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        bins = min(max(bins, 1), settings.ANALYTICS_MAX_BINS)
 
+        values = select_values(get_snapshots(periods), field, request.query_params.get('department'))
         return Response({
             'success': True,
-            'stats': {
-                'totalEmployees': total_employees,
-                'totalSalary': total_salary
-            }
+            'periods': periods,
+            'field': field,
+            'histogram': histogram(values, bins),
         })
 
     @action(detail=False, methods=['post'])
@@ -272,3 +661,149 @@ class AdminViewSet(viewsets.ViewSet):
             'message': '添加成功',
             'employeeId': employee.id
         }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='employees/import', parser_classes=[MultiPartParser])
+    def employees_import(self, request):
+        """批量导入员工，支持CSV和JSON Lines；?dryRun=true 时只校验不写入
+
+        初始密码的 bcrypt 哈希每人约数百毫秒，接口只在请求线程内同步导入不超过
+        EMPLOYEE_IMPORT_MAX_ROWS 人的文件，更大的文件提交为 import_employees 后台任务。
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'success': False, 'message': '请上传文件'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_type = request.query_params.get('type')
+        try:
+            reader = iter_rows(upload, detect_file_type(upload, file_type))
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = request.query_params.get('dryRun', '').lower() in ('1', 'true')
+        rows = reader
+        if not dry_run:
+            # 先读入至多 EMPLOYEE_IMPORT_MAX_ROWS + 1 行；reader 持有上传文件，提交任务前不能释放
+            rows = list(islice(reader, settings.EMPLOYEE_IMPORT_MAX_ROWS + 1))
+            if len(rows) > settings.EMPLOYEE_IMPORT_MAX_ROWS:
+                try:
+                    job = submit_job('import_employees', {'type': file_type}, upload, request.user)
+                except ValueError as e:
+                    return Response(
+                        {'success': False, 'message': str(e)},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                return Response({
+                    'success': True,
+                    'message': '员工较多，已提交后台导入任务',
+                    'job': serialize_job(job),
+                }, status=status.HTTP_202_ACCEPTED)
+
+        # 不在 Web 进程中创建哈希进程池
+        report = import_employees(
+            rows,
+            dry_run=dry_run,
+            chunk_size=settings.EMPLOYEE_IMPORT_CHUNK_SIZE,
+            batch_size=settings.EMPLOYEE_IMPORT_BATCH_SIZE,
+            max_errors=settings.EMPLOYEE_IMPORT_MAX_ERRORS,
+        )
+        return Response({
+            'success': True,
+            'message': '校验完成' if dry_run else '导入完成',
+            **report.to_dict()
+        })
+
+    @action(detail=False, methods=['post'])
+    def payroll(self, request):
+        """批量生成指定月份的全员工资单：提交后台任务后立即返回，结果通过任务详情接口查询"""
+        try:
+            job = submit_job('payroll', request.data, user=request.user)
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'success': True,
+            'message': '工资核算任务已提交',
+            'job': serialize_job(job),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class JobViewSet(viewsets.ViewSet):
+    """后台任务视图集（仅管理员）：提交后由 run_worker 执行，通过详情接口轮询进度和结果"""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    def list(self, request):
+        """任务列表，按 id 倒序游标分页，支持 kind、status 筛选"""
+        queryset = Job.objects.defer('payload', 'result')
+        for field in ('kind', 'status'):
+            if request.query_params.get(field):
+                queryset = queryset.filter(**{field: request.query_params[field]})
+        paginator = KeysetPagination()
+        jobs = paginator.paginate_queryset(queryset, request, view=self)
+        return Response({
+            'success': True,
+            'next': paginator.get_next_link(),
+            'results': [serialize_job(job, with_result=False) for job in jobs],
+        })
+
+    def retrieve(self, request, pk=None):
+        job = Job.objects.defer('payload').filter(pk=pk).first() if str(pk).isdigit() else None
+        if job is None:
+            return Response(
+                {'success': False, 'message': '任务不存在'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'success': True, 'job': serialize_job(job)})
+
+    def create(self, request):
+        """提交任务：kind 为 payroll、import_salaries 或 import_employees，其余字段为任务参数，
+        导入任务以 multipart 上传 file"""
+        try:
+            job = submit_job(
+                request.data.get('kind'), request.data, request.FILES.get('file'), request.user
+            )
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'success': True,
+            'message': '任务已提交',
+            'job': serialize_job(job),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def metrics_view(request):
+    """Prometheus 指标（文本格式），需携带 METRICS_TOKEN 对应的 Bearer token；未设置 token 时不开放"""
+    if not settings.METRICS_TOKEN:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    expected = 'Bearer ' + settings.METRICS_TOKEN
+    if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def health_view(request):
+    """就绪检查：主库能执行查询且迁移均已执行时返回 200，否则返回 503，负载均衡据此摘除实例
+
+    bootstrap 中迁移失败时照常启动，未执行迁移的实例不能接收请求。
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        ready = migrations_applied(connection)
+    except DatabaseError:
+        return JsonResponse({'status': 'ERROR', 'message': '数据库不可用'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if not ready:
+        return JsonResponse({'status': 'ERROR', 'message': '数据库迁移未完成'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return JsonResponse({'status': 'OK', 'message': '服务器运行正常'})
@@ -0,0 +1,299 @@
+"""微信服务端接口客户端
+
+- code2session：小程序登录凭证换取 openid；
+- access_token：使用稳定版接口（/cgi-bin/stable_token），多个进程、多个实例
+  各自获取时得到的是同一个令牌，不会互相挤掉。
+
+请求通过进程内的保持连接池发出（http.client，最多 WECHAT_POOL_SIZE 个连接），
+连接超时和读取超时均为 WECHAT_TIMEOUT；连接被对端关闭、网络错误和 5xx 响应
+最多重试 WECHAT_MAX_RETRIES 次。接口地址由 WECHAT_API_BASE 指定，测试时可指向
+本地桩服务。
+
+access_token 缓存在进程内，距过期不足 WECHAT_TOKEN_REFRESH_AHEAD 秒时由第一个
+调用方刷新，其他调用方继续使用旧令牌，不会同时发出多个刷新请求；没有可用
+令牌时所有调用方等待同一次刷新。需要令牌的接口通过 call_with_token 调用，
+返回令牌失效（TOKEN_ERRCODES）时作废本地令牌，重新获取后再调用一次。
+"""
+import http.client
+import json
+import logging
+import queue
+import ssl
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .cache import LRUCache
+from .metrics import wechat_api_time
+from .models import Employee
+from .serializers import EmployeeSerializer
+
+logger = logging.getLogger('log')
+
+# access_token 失效，需要重新获取
+TOKEN_ERRCODES = {40001, 40014, 42001}
+# 两次提前刷新之间的最短间隔（秒）
+MIN_REFRESH_INTERVAL = 30
+
+
+class WechatError(Exception):
+    """微信接口返回错误码"""
+
+    def __init__(self, errcode, errmsg):
+        super().__init__('微信接口错误 %s: %s' % (errcode, errmsg))
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+
+class WechatUnavailable(Exception):
+    """微信接口网络错误、超时或 5xx，重试后仍失败"""
+
+
+class ConnectionPool:
+    """单个主机的保持连接池，连接数上限为 maxsize"""
+
+    def __init__(self, base_url, maxsize, timeout):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._ssl_context = ssl.create_default_context() if self.https else None
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求并读完响应，返回 (状态码, 响应体)；网络异常上的 reused_connection 表示是否复用了空闲连接"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise WechatUnavailable('等待微信接口连接超时')
+        try:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except BaseException as exc:
+                conn.close()
+                exc.reused_connection = reused
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, data
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class AccessToken:
+    __slots__ = ('value', 'expires_at', 'refresh_at')
+
+    def __init__(self, value, expires_in, refresh_ahead):
+        now = time.monotonic()
+        self.value = value
+        self.expires_at = now + expires_in
+        # 稳定版接口在令牌临近过期时仍返回原令牌，此时不要每次调用都刷新
+        self.refresh_at = max(self.expires_at - refresh_ahead, now + min(expires_in / 2, MIN_REFRESH_INTERVAL))
+
+
+class WechatClient:
+
+    def __init__(self, appid, secret, base_url, pool_size, timeout, max_retries, refresh_ahead):
+        self.appid = appid
+        self.secret = secret
+        self.max_retries = max_retries
+        self.refresh_ahead = refresh_ahead
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self._token = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.appid and self.secret)
+
+    def _call(self, api, method, path, params=None, payload=None):
+        """调用接口并解析 JSON，errcode 非 0 时抛出 WechatError"""
+        if params:
+            path += '?' + urlencode(params)
+        body, headers = None, {}
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        outcome = 'unavailable'
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    status, data = self.pool.request(method, path, body, headers)
+                except (http.client.HTTPException, OSError) as exc:
+                    error = exc
+                    # 空闲连接已被对端关闭时立即重试，其他网络错误退避后重试
+                    if not getattr(exc, 'reused_connection', False) and attempt < self.max_retries:
+                        time.sleep(0.1 * 2 ** attempt)
+                    continue
+                if status >= 500:
+                    error = '状态码 %s' % status
+                    if attempt < self.max_retries:
+                        time.sleep(0.1 * 2 ** attempt)
+                    continue
+                try:
+                    result = json.loads(data)
+                except ValueError:
+                    raise WechatUnavailable('%s 返回了无法解析的响应（状态码 %s）' % (api, status))
+                if result.get('errcode'):
+                    outcome = 'error'
+                    raise WechatError(result['errcode'], result.get('errmsg', ''))
+                outcome = 'ok'
+                return result
+            raise WechatUnavailable('%s 调用失败: %s' % (api, error))
+        finally:
+            wechat_api_time.observe((api, outcome), time.perf_counter() - start)
+
+    def code2session(self, code):
+        """小程序 wx.login 的 code 换取 openid、session_key（和 unionid）"""
+        return self._call('code2session', 'GET', '/sns/jscode2session', {
+            'appid': self.appid,
+            'secret': self.secret,
+            'js_code': code,
+            'grant_type': 'authorization_code',
+        })
+
+    def _refresh_token(self):
+        result = self._call('stable_token', 'POST', '/cgi-bin/stable_token', payload={
+            'grant_type': 'client_credential',
+            'appid': self.appid,
+            'secret': self.secret,
+            'force_refresh': False,
+        })
+        self._token = AccessToken(result['access_token'], int(result['expires_in']), self.refresh_ahead)
+        return self._token
+
+    def get_access_token(self):
+        token = self._token
+        now = time.monotonic()
+        if token is not None and now < token.refresh_at:
+            return token.value
+        if token is not None and now < token.expires_at:
+            # 即将过期：只有拿到锁的调用方刷新，其他调用方继续使用旧令牌
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    if self._token is token:
+                        token = self._refresh_token()
+                except (WechatError, WechatUnavailable):
+                    logger.exception('刷新 access_token 失败，继续使用旧令牌')
+                    token.refresh_at = time.monotonic() + MIN_REFRESH_INTERVAL
+                finally:
+                    self._refresh_lock.release()
+            return token.value
+        with self._refresh_lock:
+            token = self._token
+            if token is not None and time.monotonic() < token.expires_at:
+                return token.value
+            return self._refresh_token().value
+
+    def invalidate_access_token(self, value):
+        """接口返回令牌失效（TOKEN_ERRCODES）时调用，下次获取时重新请求"""
+        token = self._token
+        if token is not None and token.value == value:
+            self._token = None
+
+    def call_with_token(self, api, method, path, params=None, payload=None):
+        """调用需要 access_token 的接口；令牌失效时重新获取令牌，只重试一次"""
+        for attempt in range(2):
+            value = self.get_access_token()
+            try:
+                return self._call(api, method, path, dict(params or {}, access_token=value), payload)
+            except WechatError as exc:
+                if exc.errcode not in TOKEN_ERRCODES or attempt:
+                    raise
+                logger.warning('%s 返回令牌失效（%s），重新获取 access_token', api, exc.errcode)
+                self.invalidate_access_token(value)
+
+    def get_api_domain_ip(self):
+        """微信接口服务器 IP 列表，用于检查配置和网络连通性"""
+        return self.call_with_token('get_api_domain_ip', 'GET', '/cgi-bin/get_api_domain_ip')['ip_list']
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_wechat_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WechatClient(
+                    settings.WECHAT_APPID,
+                    settings.WECHAT_SECRET,
+                    settings.WECHAT_API_BASE,
+                    settings.WECHAT_POOL_SIZE,
+                    settings.WECHAT_TIMEOUT,
+                    settings.WECHAT_MAX_RETRIES,
+                    settings.WECHAT_TOKEN_REFRESH_AHEAD,
+                )
+    return _client
+
+
+# openid -> (员工 id, 员工资料)。本进程的绑定变更由信号清除；其他进程可能已改绑，
+# 命中时按主键确认绑定关系，资料的变更在 ttl 后生效
+openid_cache = LRUCache(settings.WECHAT_OPENID_CACHE_SIZE, settings.WECHAT_OPENID_CACHE_TTL)
+
+
+def find_employee(openid):
+    """openid 绑定的员工，返回 (员工 id, EmployeeSerializer 输出)，未绑定时返回 None"""
+    cached = openid_cache.get(openid)
+    if cached is not None:
+        if Employee.objects.filter(pk=cached[0], wechat_openid=openid).exists():
+            return cached
+        openid_cache.delete(openid)
+    employee = Employee.objects.filter(wechat_openid=openid).first()
+    if employee is None:
+        return None
+    cached = (employee.id, EmployeeSerializer(employee).data)
+    openid_cache.set(openid, cached)
+    return cached
+
+
+def forget_openids(*openids):
+    for openid in openids:
+        if openid:
+            openid_cache.delete(openid)
+
+
+def remember_openid(sender, instance, update_fields=None, **kwargs):
+    """记录保存前的 openid，改绑后清除旧 openid 的缓存"""
+    instance._previous_openid = None
+    if instance.pk and (update_fields is None or 'wechat_openid' in update_fields):
+        instance._previous_openid = sender.objects.filter(pk=instance.pk).values_list(
+            'wechat_openid', flat=True).first()
+
+
+def _employee_changed(sender, instance, **kwargs):
+    forget_openids(instance.wechat_openid, getattr(instance, '_previous_openid', None))
+
+
+def connect_signals():
+    pre_save.connect(remember_openid, sender=Employee, dispatch_uid='wechat_employee_pre_save')
+    for signal in (post_save, post_delete):
+        signal.connect(_employee_changed, sender=Employee, dispatch_uid='wechat_employee')